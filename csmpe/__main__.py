@@ -35,12 +35,16 @@ except ImportError:
 
 import logging
 import os
+import sys
 import textwrap
 import urlparse
 
 from csmpe.context import InstallContext
 from csmpe.csm_pm import CSMPluginManager
 from csmpe.csm_pm import install_phases
+from csmpe.storage import get_storage
+from csmpe.fleet import FleetRunner, load_inventory, summary, InventoryError
+from csmpe.server import Server, start_status_server, submit_job, IDLE_TIMEOUT
 
 _PLATFORMS = ["ASR9K", "NCS6K", "CRS", "ASR900", "XRV9K"]
 _OS = ["IOS", "XR", "eXR", "XE"]
@@ -64,7 +68,10 @@ def print_plugin_info(pm, detail=False, brief=False):
             click.echo(description)
 
             if detail:
-                click.echo("  UUID: {}".format(plugin))
+                click.echo("  ID: {}".format(details['id']))
+                if details['entry_point'] != details['id']:
+                    click.echo("  Entry Point: {}".format(details['entry_point']))
+                click.echo("  Read-only: {}".format("Yes" if details['read_only'] else "No"))
                 package_name = details['package_name']
                 click.echo("  Package Name: {}".format(package_name))
                 pkginfo = pm.get_package_metadata(package_name)
@@ -82,6 +89,17 @@ def validate_phase(ctx, param, value):
     return value
 
 
+def validate_phases(ctx, param, value):
+    if value:
+        phases = [phase.strip() for phase in value.split(",") if phase.strip()]
+        for phase in phases:
+            if phase not in install_phases:
+                raise click.BadParameter("Unknown phase '{}'. The supported plugin phases are: {}".format(
+                    phase, ", ".join(install_phases)))
+        return phases
+    return value
+
+
 class URL(click.ParamType):
     name = 'url'
 
@@ -111,12 +129,14 @@ def cli():
               help="Display detailed information about installed plugins.")
 @click.option("--brief", is_flag=True,
               help="Display brief information about installed plugins.")
-def plugin_list(platform, phase, os, detail, brief):
+@click.option("--refresh", is_flag=True,
+              help="Rebuild the plugin manifest before listing the plugins.")
+def plugin_list(platform, phase, os, detail, brief, refresh):
     pm = CSMPluginManager(None, invoke_on_load=False)
     pm.set_phase_filter(phase)
     pm.set_platform_filter(platform)
     pm.set_os_filter(os)
-    pm.load(invoke_on_load=False)
+    pm.load(invoke_on_load=False, rebuild_manifest=refresh)
 
     click.echo("List of installed plugins:\n")
     if platform:
@@ -136,6 +156,10 @@ def plugin_list(platform, phase, os, detail, brief):
                    'If no --url option provided the CSMPLUGIN_URLS environment variable is used.')
 @click.option("--phase", required=False, type=click.Choice(install_phases),
               help="An install phase to run the plugin for.")
+@click.option("--phases", required=False, callback=validate_phases,
+              help="The comma separated list of the install phases to run in order over the same connection "
+                   "(i.e. Pre-Upgrade,Add,Activate,Commit,Post-Upgrade). "
+                   "The execution stops on the first failing phase.")
 @click.option("--cmd", multiple=True, default=[],
               help='The command to be passed to the plugin in ')
 @click.option("--log_dir", default="/tmp", type=click.Path(),
@@ -144,15 +168,37 @@ def plugin_list(platform, phase, os, detail, brief):
               help="Package for install operations. This package option can be repeated to provide multiple packages.")
 @click.option("--repository_url", default=None,
               help="The package repository URL. (i.e. tftp://server/dir")
+@click.option("--command_cache", is_flag=True,
+              help="Reuse the outputs of the read-only commands until the device state changes.")
+@click.option("--artifact_store", default="plain", type=click.Choice(["plain", "compressed", "gzip", "zstd"]),
+              help="The way the captured outputs are stored in the log directory.")
+@click.option("--storage", default=None, type=click.Path(),
+              help="The SQLite database file keeping the plugin data between the runs. "
+                   "If not provided the data is kept in memory.")
+@click.option("--max_sessions", default=1, type=click.IntRange(1, None),
+              help="The maximum number of sessions to the device used to run the read-only plugins concurrently.")
+@click.option("--admin_session/--no_admin_session", default=True,
+              help="Keep the separate session in the admin mode for the admin commands.")
+@click.option("--discovery_cache", default=0, type=click.IntRange(0, None),
+              help="The number of seconds the device discovery results are reused by the consecutive runs. "
+                   "The cache is disabled by default.")
+@click.option("--resume", is_flag=True,
+              help="Watch the install operation started by the previous run until it is finished "
+                   "instead of starting it again. Requires the --storage option.")
 @click.argument("plugin_name", required=False, default=None)
-def plugin_run(url, phase, cmd, log_dir, package, repository_url, plugin_name):
-
-    ctx = InstallContext()
-    ctx.hostname = "Hostname"
+def plugin_run(url, phase, phases, cmd, log_dir, package, repository_url, command_cache, artifact_store, storage,
+               max_sessions, admin_session, discovery_cache, resume, plugin_name):
+    if phase and phases:
+        raise click.BadParameter("The --phase and --phases options are mutually exclusive.")
+    if resume and not storage:
+        raise click.BadParameter("The --resume option requires the --storage option.")
+
+    ctx = InstallContext(get_storage(storage))
+    ctx.hostname = urlparse.urlparse(url[-1]).hostname or "Hostname"
     ctx.host_urls = list(url)
     ctx.success = False
 
-    ctx.requested_action = phase
+    ctx.requested_action = phases[0] if phases else phase
     ctx.log_directory = log_dir
     session_filename = os.path.join(log_dir, "session.log")
     plugins_filename = os.path.join(log_dir, "plugins.log")
@@ -168,20 +214,33 @@ def plugin_run(url, phase, cmd, log_dir, package, repository_url, plugin_name):
     ctx.log_level = logging.DEBUG
     ctx.software_packages = list(package)
     ctx.server_repository_url = repository_url
+    ctx.command_cache = command_cache
+    ctx.artifact_store = artifact_store
+    ctx.max_sessions = max_sessions
+    ctx.admin_session = admin_session
+    ctx.discovery_cache_ttl = discovery_cache
+    ctx.resume = resume
 
     if cmd:
         ctx.custom_commands = list(cmd)
 
     pm = CSMPluginManager(ctx)
     pm.set_name_filter(plugin_name)
-    results = pm.dispatch("run")
+    if phases:
+        results = pm.dispatch_phases("run", phases)
+    else:
+        results = pm.dispatch("run")
 
     click.echo("\n Plugin execution finished.\n")
     click.echo("Log files dir: {}".format(log_dir))
     click.echo(" {} - device session log".format(session_filename))
     click.echo(" {} - plugin execution log".format(plugins_filename))
     click.echo(" {} - device connection debug log".format(condoor_filename))
-    click.echo("Results: {}".format(" ".join(map(str, results))))
+    if phases and results:
+        for phase, phase_results in zip(phases, results):
+            click.echo("{} results: {}".format(phase, " ".join(map(str, phase_results))))
+    else:
+        click.echo("Results: {}".format(" ".join(map(str, results))))
 
 
 @cli.command("sanity", help="Run sanity plugin on the device.", short_help="Run sanity")
@@ -203,11 +262,26 @@ def plugin_run(url, phase, cmd, log_dir, package, repository_url, plugin_name):
               help="The parent package for the packages")
 @click.option("--repository_url", default=None,
               help="The package repository URL. (i.e. tftp://server/dir")
+@click.option("--command_cache", is_flag=True,
+              help="Reuse the outputs of the read-only commands until the device state changes.")
+@click.option("--artifact_store", default="plain", type=click.Choice(["plain", "compressed", "gzip", "zstd"]),
+              help="The way the captured outputs are stored in the log directory.")
+@click.option("--storage", default=None, type=click.Path(),
+              help="The SQLite database file keeping the plugin data between the runs. "
+                   "If not provided the data is kept in memory.")
+@click.option("--max_sessions", default=1, type=click.IntRange(1, None),
+              help="The maximum number of sessions to the device used to run the read-only plugins concurrently.")
+@click.option("--admin_session/--no_admin_session", default=True,
+              help="Keep the separate session in the admin mode for the admin commands.")
+@click.option("--discovery_cache", default=0, type=click.IntRange(0, None),
+              help="The number of seconds the device discovery results are reused by the consecutive runs. "
+                   "The cache is disabled by default.")
 @click.argument("plugin_name", required=False, default=None)
-def plugin_sanity(url, phase, cmd, log_dir, admin, package, parent, repository_url, plugin_name):
+def plugin_sanity(url, phase, cmd, log_dir, admin, package, parent, repository_url, command_cache,
+                  artifact_store, storage, max_sessions, admin_session, discovery_cache, plugin_name):
 
-    ctx = InstallContext()
-    ctx.hostname = "Hostname"
+    ctx = InstallContext(get_storage(storage))
+    ctx.hostname = urlparse.urlparse(url[-1]).hostname or "Hostname"
     ctx.host_urls = list(url)
     ctx.success = False
 
@@ -227,6 +301,11 @@ def plugin_sanity(url, phase, cmd, log_dir, admin, package, parent, repository_u
     ctx.log_level = logging.DEBUG
     ctx.software_packages = list(package)
     ctx.server_repository_url = repository_url
+    ctx.command_cache = command_cache
+    ctx.artifact_store = artifact_store
+    ctx.max_sessions = max_sessions
+    ctx.admin_session = admin_session
+    ctx.discovery_cache_ttl = discovery_cache
     ctx.admin_mode = admin
     ctx.parent_pkg = parent
     if cmd:
@@ -243,5 +322,123 @@ def plugin_sanity(url, phase, cmd, log_dir, admin, package, parent, repository_u
     click.echo(" {} - device connection debug log".format(condoor_filename))
     click.echo("Results: {}".format(" ".join(map(str, results))))
 
+
+@cli.command("fleet", help="Run the plugins on the devices from the inventory file.", short_help="Run on many devices")
+@click.option("--phase", required=False, type=click.Choice(install_phases),
+              help="An install phase for the devices with no phase defined in the inventory.")
+@click.option("--log_dir", default="/tmp/csmpe", type=click.Path(),
+              help="The log directory. The logs of each device are stored in the subdirectory named by hostname.")
+@click.option("--workers", default=8, type=click.IntRange(1, None),
+              help="The maximum number of devices processed at the same time.")
+@click.option("--per_jumphost", default=4, type=click.IntRange(1, None),
+              help="The maximum number of devices processed at the same time over the same jumphost.")
+@click.option("--command_cache", is_flag=True,
+              help="Reuse the outputs of the read-only commands until the device state changes.")
+@click.option("--artifact_store", default="plain", type=click.Choice(["plain", "compressed", "gzip", "zstd"]),
+              help="The way the captured outputs are stored in the log directory.")
+@click.option("--storage", default=None, type=click.Path(),
+              help="The SQLite database file keeping the plugin data between the runs. "
+                   "If not provided the data is kept in memory.")
+@click.option("--threads", is_flag=True,
+              help="Process the devices in the threads of the single process instead of the worker processes. "
+                   "Allows much more workers with less memory.")
+@click.option("--max_sessions", default=1, type=click.IntRange(1, None),
+              help="The maximum number of sessions to the device used to run the read-only plugins concurrently.")
+@click.argument("inventory", type=click.Path(exists=True, dir_okay=False))
+def plugin_fleet(phase, log_dir, workers, per_jumphost, command_cache, artifact_store, storage, threads,
+                 max_sessions, inventory):
+    try:
+        hosts = load_inventory(inventory, phase)
+    except InventoryError as e:
+        raise click.BadParameter(str(e))
+
+    def finished(result):
+        status = "OK" if result['success'] else "FAILED"
+        click.echo("[{}] {} ({:.0f}s) {}".format(status, result['hostname'], result['duration'],
+                                                 result['error'] or ""))
+
+    options = {
+        'command_cache': command_cache,
+        'artifact_store': artifact_store,
+        'storage': os.path.abspath(storage) if storage else None,
+        'max_sessions': max_sessions,
+    }
+    runner = FleetRunner(log_dir, workers=workers, per_jumphost=per_jumphost, options=options, threads=threads)
+    click.echo("Running {} device(s) with {} worker {}\n".format(len(hosts), workers,
+                                                                 "thread(s)" if threads else "process(es)"))
+    results = runner.run(hosts, callback=finished)
+
+    succeeded, failed = summary(results)
+    click.echo("\nFleet execution finished.\n")
+    click.echo("Log files dir: {}".format(log_dir))
+    click.echo("Succeeded: {}".format(len(succeeded)))
+    click.echo("Failed: {}".format(len(failed)))
+    for result in failed:
+        click.echo(" {} - {}".format(result['hostname'], result['error'] or "plugin execution failed"))
+    sys.exit(1 if failed else 0)
+
+
+@cli.command("serve", help="Run the resident worker executing the jobs from the spool directory.",
+             short_help="Run worker")
+@click.option("--spool", default="/tmp/csmpe/spool", type=click.Path(),
+              help="The spool directory with the jobs.")
+@click.option("--log_dir", default="/tmp/csmpe", type=click.Path(),
+              help="The log directory. The logs of each device are stored in the subdirectory named by hostname.")
+@click.option("--workers", default=4, type=click.IntRange(1, None),
+              help="The maximum number of jobs executed at the same time.")
+@click.option("--idle_timeout", default=IDLE_TIMEOUT, type=click.IntRange(0, None),
+              help="The number of seconds the device connection is kept open after the job. "
+                   "Set 0 to disconnect after each job.")
+@click.option("--http_port", default=None, type=click.IntRange(1, 65535),
+              help="The local port of the HTTP status endpoint. Disabled if not provided.")
+@click.option("--command_cache", is_flag=True,
+              help="Reuse the outputs of the read-only commands until the device state changes.")
+@click.option("--artifact_store", default="plain", type=click.Choice(["plain", "compressed", "gzip", "zstd"]),
+              help="The way the captured outputs are stored in the log directory.")
+@click.option("--storage", default=None, type=click.Path(),
+              help="The SQLite database file keeping the plugin data between the runs. "
+                   "If not provided the data is kept in memory.")
+@click.option("--max_sessions", default=1, type=click.IntRange(1, None),
+              help="The maximum number of sessions to the device used to run the read-only plugins concurrently.")
+def plugin_serve(spool, log_dir, workers, idle_timeout, http_port, command_cache, artifact_store, storage,
+                 max_sessions):
+    options = {
+        'command_cache': command_cache,
+        'artifact_store': artifact_store,
+        'storage': os.path.abspath(storage) if storage else None,
+        'max_sessions': max_sessions,
+    }
+    server = Server(spool, log_dir, workers=workers, idle_timeout=idle_timeout, options=options)
+    if http_port:
+        start_status_server(server, http_port)
+        click.echo("Status endpoint: http://127.0.0.1:{}/status".format(http_port))
+    click.echo("Waiting for the jobs in {} with {} worker thread(s)".format(spool, workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("\nWorker stopped.")
+
+
+@cli.command("submit", help="Submit the devices from the inventory file as the jobs for the worker.",
+             short_help="Submit jobs")
+@click.option("--spool", default="/tmp/csmpe/spool", type=click.Path(),
+              help="The spool directory with the jobs.")
+@click.option("--phase", required=False, type=click.Choice(install_phases),
+              help="An install phase for the devices with no phase defined in the inventory.")
+@click.argument("inventory", type=click.Path(exists=True, dir_okay=False))
+def plugin_submit(spool, phase, inventory):
+    try:
+        hosts = load_inventory(inventory, phase)
+    except InventoryError as e:
+        raise click.BadParameter(str(e))
+
+    for host in hosts:
+        if not host['phase']:
+            raise click.BadParameter("No phase defined for {}".format(host['hostname']))
+
+    for host in hosts:
+        click.echo("{} {}".format(submit_job(spool, host), host['hostname']))
+
+
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,269 @@
+# =============================================================================
+# Artifact Store
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The artifact stores used by PluginContext.save_to_file and load_from_file. The plain store writes
+the files as they are. The compressed stores keep a single compressed object for each distinct content
+in the shared object directory and hard link it into the log directory, so the identical outputs
+captured in many phases and jobs occupy the disk space only once.
+Every store maintains the JSON manifest of the artifacts saved in the log directory.
+"""
+
+import abc
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+from StringIO import StringIO
+
+import six
+
+from utils import get_cache_dir, make_dirs, read_json, write_json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARTIFACTS_MANIFEST = "artifacts.json"
+OBJECTS_DIR = os.path.join("artifacts", "objects")
+CHUNK_SIZE = 65536
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def gzip_compress(data):
+    buf = StringIO()
+    # no timestamp, so the identical data gives the identical object
+    with gzip.GzipFile(fileobj=buf, mode="wb", mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def gzip_compress_file(source, target):
+    with gzip.GzipFile(fileobj=target, mode="wb", mtime=0) as f:
+        shutil.copyfileobj(source, f, CHUNK_SIZE)
+
+
+def gzip_decompress(data):
+    with gzip.GzipFile(fileobj=StringIO(data), mode="rb") as f:
+        return f.read()
+
+
+def zstd_compress(data):
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def zstd_compress_file(source, target):
+    zstandard.ZstdCompressor().copy_stream(source, target)
+
+
+def zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+# extension -> decompress function
+DECOMPRESSORS = {
+    ".gz": gzip_decompress,
+    ".zst": zstd_decompress,
+}
+
+
+def load_artifact(path):
+    """
+    Returns the data of the artifact. The path is either the stored file or the original file name
+    in which case the compressed file is looked up.
+    """
+    for extension in [""] + sorted(DECOMPRESSORS):
+        stored_path = path + extension
+        if os.path.exists(stored_path):
+            with open(stored_path, "rb") as f:
+                data = f.read()
+            decompress = DECOMPRESSORS.get(os.path.splitext(stored_path)[1])
+            return decompress(data) if decompress else data
+    raise IOError("Artifact not found: {}".format(path))
+
+
+class PlainStore(object):
+    """
+    Stores the artifacts as the plain files.
+    """
+    name = "plain"
+    extension = ""
+
+    # The plugins running concurrently over separate sessions share the manifest
+    _manifest_lock = threading.Lock()
+
+    def _write_object(self, path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _move_object(self, path, source_path, sha256):
+        os.rename(source_path, path)
+
+    def save(self, directory, file_name, data):
+        """
+        Stores data as file_name in the directory and records it in the directory manifest.
+        Returns the name of the stored file.
+        """
+        path = self._prepare(directory, file_name)
+        self._write_object(path, data)
+        return self._record(directory, file_name, path, len(data), hashlib.sha256(data).hexdigest())
+
+    def save_file(self, directory, file_name, source_path, sha256=None):
+        """
+        Stores the file already written in the directory (i.e. the streamed command output) as file_name
+        and records it in the directory manifest. The source file is removed.
+        Returns the name of the stored file.
+        """
+        size = os.path.getsize(source_path)
+        sha256 = sha256 or file_sha256(source_path)
+        path = self._prepare(directory, file_name)
+        self._move_object(path, source_path, sha256)
+        return self._record(directory, file_name, path, size, sha256)
+
+    def _prepare(self, directory, file_name):
+        path = os.path.join(directory, file_name + self.extension)
+        # never write through the hard link to the shared object
+        if os.path.exists(path):
+            os.remove(path)
+        return path
+
+    def _record(self, directory, file_name, path, size, sha256):
+        stored_name = os.path.basename(path)
+        self._update_manifest(directory, file_name, {
+            'file': stored_name,
+            'size': size,
+            'stored_size': os.path.getsize(path),
+            'sha256': sha256,
+            'compression': self.name,
+        })
+        return stored_name
+
+    def _update_manifest(self, directory, file_name, record):
+        path = os.path.join(directory, ARTIFACTS_MANIFEST)
+        with self._manifest_lock:
+            manifest = read_json(path) or {}
+            manifest[file_name] = record
+            write_json(path, manifest)
+
+
+@six.add_metaclass(abc.ABCMeta)
+class CompressedStore(PlainStore):
+    """
+    Stores the compressed artifacts deduplicated by the content hash.
+    """
+    def __init__(self, objects_dir=None):
+        self._objects_dir = objects_dir or os.path.join(get_cache_dir(), OBJECTS_DIR)
+
+    @abc.abstractmethod
+    def compress(self, data):
+        """Returns the compressed data."""
+
+    @abc.abstractmethod
+    def compress_file(self, source, target):
+        """Writes the compressed content of the source file object to the target file object."""
+
+    def _write_object(self, path, data):
+        self._store_object(path, hashlib.sha256(data).hexdigest(), lambda f: f.write(self.compress(data)))
+
+    def _move_object(self, path, source_path, sha256):
+        def write(f):
+            with open(source_path, "rb") as source:
+                self.compress_file(source, f)
+
+        self._store_object(path, sha256, write)
+        os.remove(source_path)
+
+    def _store_object(self, path, sha256, write):
+        """
+        Links the object with the sha256 content hash to path. The object is written
+        by write(file object) if not stored yet.
+        """
+        object_dir = os.path.join(self._objects_dir, sha256[:2])
+        object_path = os.path.join(object_dir, sha256[2:] + self.extension)
+        if not os.path.exists(object_path):
+            if not make_dirs(object_dir):
+                with open(path, "wb") as f:
+                    write(f)
+                return
+            tmp_path = "{}.{}.{}.tmp".format(object_path, os.getpid(), threading.current_thread().ident)
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.rename(tmp_path, object_path)
+        try:
+            os.link(object_path, path)
+        except OSError:
+            # the object directory on the different file system
+            shutil.copyfile(object_path, path)
+
+
+class GzipStore(CompressedStore):
+    name = "gzip"
+    extension = ".gz"
+
+    def compress(self, data):
+        return gzip_compress(data)
+
+    def compress_file(self, source, target):
+        gzip_compress_file(source, target)
+
+
+class ZstdStore(CompressedStore):
+    name = "zstd"
+    extension = ".zst"
+
+    def compress(self, data):
+        return zstd_compress(data)
+
+    def compress_file(self, source, target):
+        zstd_compress_file(source, target)
+
+
+def get_artifact_store(name=None, objects_dir=None):
+    """
+    Returns the artifact store. The 'compressed' name selects zstd if available otherwise gzip.
+
+    :param name: plain, compressed, gzip or zstd. None is plain.
+    :param objects_dir: The directory of the shared compressed objects
+    """
+    if name == "compressed":
+        name = ZstdStore.name if zstandard is not None else GzipStore.name
+    if name in (None, PlainStore.name):
+        return PlainStore()
+    if name == GzipStore.name:
+        return GzipStore(objects_dir)
+    if name == ZstdStore.name and zstandard is not None:
+        return ZstdStore(objects_dir)
+    raise ValueError("Artifact store not supported: {}".format(name))
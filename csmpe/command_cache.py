@@ -0,0 +1,89 @@
+# =============================================================================
+# Command Cache
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The cache of the read-only command outputs. The device state can change only when a command outside
+of the read-only whitelist is sent, so such command invalidates the whole cache.
+"""
+
+import re
+
+# The read-only commands which output does not change unless the device configuration
+# or software is changed
+CACHEABLE_COMMANDS = [
+    r"^(admin )?show version",
+    r"^(admin )?show platform",
+    r"^(admin )?show inventory",
+    r"^(admin )?show install (active|inactive|committed)",
+    r"^(admin )?show running-config",
+    r"^dir ",
+]
+
+
+def normalize_command(cmd):
+    return " ".join(cmd.split())
+
+
+class CommandCache(object):
+    """
+    The command -> output dictionary used by the PluginContext.send.
+    """
+    def __init__(self, patterns=None):
+        self._patterns = [re.compile(pattern) for pattern in patterns or CACHEABLE_COMMANDS]
+        self._outputs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._outputs)
+
+    def is_cacheable(self, cmd):
+        cmd = normalize_command(cmd)
+        return any(pattern.match(cmd) for pattern in self._patterns)
+
+    def get(self, cmd):
+        """
+        Returns the cached command output or None if not cached.
+        """
+        output = self._outputs.get(normalize_command(cmd))
+        if output is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return output
+
+    def put(self, cmd, output):
+        """
+        Caches the output of the read-only command. Any other command invalidates the cache.
+        """
+        if self.is_cacheable(cmd):
+            self._outputs[normalize_command(cmd)] = output
+        else:
+            self.invalidate()
+
+    def invalidate(self):
+        self._outputs.clear()
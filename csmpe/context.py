@@ -27,14 +27,34 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
 
+import copy
 import logging
 import os
 import re
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
 from time import time
 
-import condoor
+import six
+
+# condoor is imported only when the device connection is used, so the commands not connecting
+# to the device (i.e. csmpe list) do not pay for loading the connection library.
 
 from decorators import delegate
+from command_cache import CommandCache
+from artifacts import get_artifact_store, load_artifact
+from session_pool import SessionPool, AdminSession
+from storage import MemoryStorage
+from stats import StepStats, get_stats_path
+from stream import stream_output, StreamingSession, OutputWriter, OutputSyntaxError, OutputStartError
+from discovery import get_discovery_path, load_discovery, save_discovery, invalidate_discovery, \
+    get_connection_info, restore_connection, connection_matches, matches_show_version
+
+# The condoor driver internals needed to stream the command output to the file
+STREAMING_DRIVER_ATTRIBUTES = ['_send_command', 'ctrl', 'compiled_prompts', 'more', 'command_syntax_re']
+STREAMING_DEVICE_ATTRIBUTES = ['ctrl', 'prompt_re', 'driver', 'connected']
 
 
 class PluginError(Exception):
@@ -42,28 +62,42 @@ class PluginError(Exception):
 
 
 class InstallContext(object):
-    _storage = {}
+    # The storage shared by all contexts in the process. The data is namespaced by the hostname.
+    storage = MemoryStorage()
 
-    def __init__(self):
+    def __init__(self, storage=None):
         self.hostname = "Hostname"
         self.admin_mode = False
         self.parent_pkg = ""
+        if storage is not None:
+            self.storage = storage
 
     def post_status(self, message):
         print("[CSM Status] {}".format(message))
 
     def save_data(self, key, value):
         #  print("Saving [{}]={}".format(key, str(value[0])))
-        self._storage[key] = value
+        self.storage.put(self.hostname, key, value)
 
     def load_data(self, key):
         #  print("Loading [{}]".format(key))
-        return self._storage.get(key, (None, None))
+        return self.storage.get(self.hostname, key, (None, None))
+
+    def save_data_many(self, items):
+        self.storage.put_many(self.hostname, items)
+
+    def load_data_many(self, keys=None):
+        return self.storage.get_many(self.hostname, keys)
 
     @property
     def custom_commands(self):
-        return ["show isis neighbor", "show ospf neighbor", "show bgp summary", "show install inactive summary",
-                "show install active summary"]
+        return getattr(self, "_custom_commands", None) or [
+            "show isis neighbor", "show ospf neighbor", "show bgp summary", "show install inactive summary",
+            "show install active summary"]
+
+    @custom_commands.setter
+    def custom_commands(self, commands):
+        self._custom_commands = commands
 
 
 class Host(object):
@@ -72,9 +106,8 @@ class Host(object):
 
 @delegate("_csm", ("post_status",), ("custom_commands", "success", "operation_id", "server_repository_url", "admin_mode", "parent_pkg",
                                      "software_packages", "hostname", "log_directory", "migration_directory",
-                                     "get_server", "get_host"))
-@delegate("_connection", ("connect", "disconnect", "reconnect", "discovery", "send", "run_fsm", "reload"),
-          ("family", "prompt", "os_type", "os_version"))
+                                     "get_server", "get_host", "host_urls"))
+@delegate("_connection", ("discovery",))
 class PluginContext(object):
     """ This is a class passed to the constructor during plugin instantiation.
     Thi class provides the API for the plugins to allow the communication with the CMS Server and device.
@@ -82,19 +115,41 @@ class PluginContext(object):
     def __init__(self, csm=None):
         self._csm = csm
         self.current_plugin = ""
-        self.admin_mode = csm.admin_mode
-        self.parent_pkg = csm.parent_pkg
+        # The command output cache is opt-in
+        self._command_cache = CommandCache() if getattr(csm, "command_cache", False) else None
+        self._cancelled = threading.Event()
+        # The log records kept while the plugin runs concurrently with the others
+        self._log_records = None
+        self._session_pool = None
+        self._admin_session = AdminSession(self, enabled=getattr(csm, "admin_session", True))
+        # The data loaded from and not yet written to the CSM storage
+        self._loaded_data = None
+        self._pending_data = {}
+        self._artifact_store = get_artifact_store(getattr(csm, "artifact_store", None),
+                                                  getattr(csm, "artifacts_directory", None))
+        self._step_stats = None
 
         if csm is not None:
+            import condoor
+            self.admin_mode = csm.admin_mode
+            self.parent_pkg = csm.parent_pkg
             self._connection = condoor.Connection(
                 self._csm.hostname,
                 self._csm.host_urls,
                 log_dir=self._csm.log_directory
             )
             self._set_logging(hostname=self._csm.hostname, log_dir=self._csm.log_directory, log_level=logging.DEBUG)
-            self._device_detect()
+            # the device discovery and login run in the background, so the plugins can be loaded in the meantime
+            self._discovery_done = threading.Event()
+            self._discovery_error = None
+            thread = threading.Thread(target=self._background_detect, name="discovery-{}".format(self._csm.hostname))
+            thread.daemon = True
+            thread.start()
         else:
             self._connection = None
+            self._discovery_done = threading.Event()
+            self._discovery_done.set()
+            self._discovery_error = None
             self._set_logging()
 
     def _set_logging(self, hostname="host", log_dir=None, log_level=logging.NOTSET):
@@ -115,15 +170,403 @@ class PluginContext(object):
         handler.setFormatter(formatter)
         self._logger.addHandler(handler)
         self._logger.setLevel(log_level)
+        self._log_handler = handler
+
+    def _close_logging(self):
+        """
+        Closes the log file. Must be called when the context is discarded by the long running process.
+        """
+        if self._log_handler is not None:
+            self._logger.removeHandler(self._log_handler)
+            self._log_handler.close()
+            self._log_handler = None
+
+    def rebind(self, csm):
+        """
+        Binds the connected context to the next run for the same device. The device connection
+        and the discovery results are kept, and the state of the previous run is dropped.
+        """
+        self.wait_for_discovery()
+        self.close_sessions()
+        self._csm = csm
+        self.admin_mode = csm.admin_mode
+        self.parent_pkg = csm.parent_pkg
+        self.current_plugin = ""
+        self._command_cache = CommandCache() if getattr(csm, "command_cache", False) else None
+        self._cancelled = threading.Event()
+        self._log_records = None
+        self._session_pool = None
+        self._admin_session = AdminSession(self, enabled=getattr(csm, "admin_session", True))
+        self._loaded_data = None
+        self._pending_data = {}
+        self._artifact_store = get_artifact_store(getattr(csm, "artifact_store", None),
+                                                  getattr(csm, "artifacts_directory", None))
+        self._close_logging()
+        self._set_logging(hostname=self._csm.hostname, log_dir=self._csm.log_directory, log_level=logging.DEBUG)
+        self.info("Reusing the connection to the device")
+        self._csm.save_data("device_info", self._connection.device_info)
+        self._csm.save_data("udi", self._connection.udi)
+
+    @property
+    def max_sessions(self):
+        """
+        The maximum number of the concurrent sessions to the device.
+        """
+        return max(getattr(self._csm, "max_sessions", 1) or 1, 1)
+
+    def clone(self, session_id):
+        """
+        Returns the plugin context with the new session to the same device. The device discovery is not repeated.
+        The clone shares the storage buffer, the command cache and the cancellation with this context.
+        The session log is stored in the subdirectory of the log directory named by session_id.
+        """
+        import condoor
+        if self._loaded_data is None:
+            self.prefetch_data()
+
+        ctx = copy.copy(self)
+        ctx.current_plugin = ""
+        ctx._pending_data = {}
+        ctx._log_records = None
+        ctx._connection = condoor.Connection(
+            self._csm.hostname,
+            self._csm.host_urls,
+            log_dir=os.path.join(self._csm.log_directory, "session{}".format(session_id))
+        )
+        restore_connection(ctx._connection, get_connection_info(self._connection))
+        # the device state does not change, so the shared command cache stays valid
+        ctx._connection.connect()
+        return ctx
+
+    def start_log_buffer(self):
+        """
+        Keeps the log records in memory until stop_log_buffer is called.
+        Returns the records kept so far, so the buffers can be nested.
+        """
+        previous, self._log_records = self._log_records, []
+        return previous
+
+    def stop_log_buffer(self, previous=None):
+        """
+        Returns the log records kept since start_log_buffer and restores the previous buffer.
+        """
+        records, self._log_records = self._log_records or [], previous
+        return records
+
+    def replay_log(self, records):
+        """
+        Writes the log records kept by the context with the original timestamps.
+        """
+        if self._log_records is not None:
+            self._log_records.extend(records)
+            return
+
+        for level, message, created in records:
+            if not self._logger.isEnabledFor(level):
+                continue
+            record = self._logger.makeRecord(self._logger.name, level, __file__, 0, message, None, None)
+            record.created = created
+            record.msecs = (created - int(created)) * 1000
+            self._logger.handle(record)
+
+    @property
+    def sessions(self):
+        """
+        The pool of the sessions to the device. The pool size is limited by max_sessions.
+        """
+        if self._session_pool is None:
+            self._session_pool = SessionPool(self, self.max_sessions)
+        return self._session_pool
+
+    def map_sessions(self, func, items):
+        """
+        Calls func(session, item) for each item concurrently over this and the idle pool sessions.
+        Returns the list of the results in the item order.
+        """
+        return self.sessions.map(self, func, items)
+
+    def close_sessions(self):
+        if self._session_pool is not None:
+            self._session_pool.close()
+        self._admin_session.close()
+
+    def send_admin(self, cmd, timeout=300, wait_for_string=None, cache=True, **kwargs):
+        """
+        Sends the command in the admin mode and returns the output. The command is sent over the dedicated
+        session staying in the admin mode, so no mode switching is needed. The output of the read-only command
+        is cached as the output of 'admin <cmd>' if the command cache is enabled.
+        """
+        key = "admin {}".format(cmd)
+        if self._command_cache is None:
+            return self._admin_session.send(self, cmd, timeout=timeout, wait_for_string=wait_for_string, **kwargs)
+
+        if wait_for_string is not None or kwargs or not self._command_cache.is_cacheable(key):
+            self._command_cache.invalidate()
+            return self._admin_session.send(self, cmd, timeout=timeout, wait_for_string=wait_for_string, **kwargs)
+
+        if cache:
+            output = self._command_cache.get(key)
+            if output is not None:
+                self.info("Command output returned from cache: '{}'".format(key))
+                return output
+
+        output = self._admin_session.send(self, cmd, timeout=timeout)
+        self._command_cache.put(key, output)
+        return output
+
+    def connect(self, *args, **kwargs):
+        self.invalidate_command_cache()
+        return self._connection.connect(*args, **kwargs)
+
+    def disconnect(self):
+        self.invalidate_command_cache()
+        return self._connection.disconnect()
+
+    def reconnect(self, *args, **kwargs):
+        self.invalidate_command_cache()
+        # the device could be reloaded in the meantime
+        self._admin_session.close()
+        return self._connection.reconnect(*args, **kwargs)
+
+    def reload(self, *args, **kwargs):
+        self.invalidate_command_cache()
+        self._admin_session.close()
+        return self._connection.reload(*args, **kwargs)
+
+    def run_fsm(self, *args, **kwargs):
+        self.invalidate_command_cache()
+        return self._connection.run_fsm(*args, **kwargs)
+
+    def send(self, cmd="", timeout=300, wait_for_string=None, cache=True, **kwargs):
+        """
+        Sends the command to the device and returns the output. If the command cache is enabled the output
+        of the read-only command is returned from the cache if available. Any other command invalidates
+        the cache. The polling loops must pass cache=False to always get the current output.
+        The other keyword arguments (i.e. password) are passed to the connection.
+        """
+        if self._command_cache is None:
+            return self._connection.send(cmd, timeout=timeout, wait_for_string=wait_for_string, **kwargs)
+
+        if wait_for_string is not None or kwargs:
+            self._command_cache.invalidate()
+            return self._connection.send(cmd, timeout=timeout, wait_for_string=wait_for_string, **kwargs)
+
+        if cache and self._command_cache.is_cacheable(cmd):
+            output = self._command_cache.get(cmd)
+            if output is not None:
+                self.info("Command output returned from cache: '{}'".format(cmd))
+                return output
+
+        # invalidate before sending, as the mutating command could fail in the middle
+        if not self._command_cache.is_cacheable(cmd):
+            self._command_cache.invalidate()
+        output = self._connection.send(cmd, timeout=timeout)
+        self._command_cache.put(cmd, output)
+        return output
+
+    def _streaming_session(self):
+        """
+        Returns the StreamingSession of the connected device if it allows reading the command output
+        as it arrives otherwise None. Both the condoor 0.x driver and the condoor 1.x target device are supported.
+        """
+        driver = getattr(self._connection, "_driver", None)
+        if driver is not None:
+            # condoor 0.x
+            if not all(hasattr(driver, attribute) for attribute in STREAMING_DRIVER_ATTRIBUTES) or \
+                    not driver.is_connected:
+                return None
+            return StreamingSession(driver.ctrl, driver._send_command, driver.compiled_prompts[-1], driver.more,
+                                    driver.command_syntax_re, driver.disconnect)
+
+        # condoor 1.x
+        try:
+            device = self._connection._chain.target_device
+        except Exception:
+            return None
+        if device is None or not all(hasattr(device, attribute) for attribute in STREAMING_DEVICE_ATTRIBUTES) or \
+                not device.connected or device.ctrl is None or device.prompt_re is None:
+            return None
+        # the command is echoed back and stripped from the output
+        return StreamingSession(device.ctrl, device.ctrl.sendline, device.prompt_re, device.driver.more_re,
+                                device.driver.syntax_error_re, device.disconnect)
+
+    def send_to_file(self, cmd, path, timeout=60, start_at=None):
+        """
+        Sends the command to the device and writes the output to the file as it arrives.
+        The output is written after it is received if the driver does not support the streaming.
+        The relative path is created in the log directory provided by CSM and stored by the artifact store.
+
+        :param cmd: The command string
+        :param path: The file path
+        :param timeout: The maximum time in seconds for the whole output
+        :param start_at: If provided the output starts from the first line containing this string
+        :return: The dictionary with the path, size, number of lines and sha256 hash of the output
+        """
+        if self._command_cache is not None and not self._command_cache.is_cacheable(cmd):
+            self._command_cache.invalidate()
+
+        directory = self._csm.log_directory
+        full_path = os.path.join(directory, path)
+        # the outputs captured in the log directory are artifacts, the other files are written as they are
+        stored = os.path.dirname(os.path.abspath(full_path)) == os.path.abspath(directory)
+        target = full_path
+        if stored:
+            target = "{}.{}.{}.tmp".format(full_path, os.getpid(), threading.current_thread().ident)
+
+        try:
+            summary = self._write_output(cmd, target, timeout, start_at)
+            if stored:
+                stored_name = self._artifact_store.save_file(directory, os.path.basename(full_path), target,
+                                                             summary['sha256'])
+                full_path = os.path.join(directory, stored_name)
+        except Exception:
+            if stored and os.path.exists(target):
+                os.remove(target)
+            raise
+
+        summary['path'] = full_path
+        self.info("Output of '{}' saved to '{}' ({} bytes, {} lines)".format(
+            cmd, os.path.basename(full_path), summary['size'], summary['lines']))
+        return summary
+
+    def _write_output(self, cmd, target, timeout, start_at):
+        """
+        Writes the command output to the target file. Returns the output summary.
+        """
+        import condoor
+        import pexpect
+        session = self._streaming_session()
+        try:
+            if session is None:
+                return self._send_and_write(cmd, target, timeout, start_at)
+            with open(target, "w") as f:
+                session.send_command(cmd)
+                return stream_output(session.ctrl, f, session.prompt_re, timeout=timeout,
+                                     more_re=session.more_re, syntax_re=session.syntax_re,
+                                     start_at=start_at, cmd=cmd)
+        except OutputStartError:
+            if os.path.exists(target):
+                os.remove(target)
+            raise condoor.CommandError("Output start '{}' not found".format(start_at), self._connection.hostname,
+                                       command=cmd)
+        except OutputSyntaxError:
+            raise condoor.CommandSyntaxError("Command unknown", self._connection.hostname, command=cmd)
+        except pexpect.TIMEOUT:
+            raise condoor.CommandTimeoutError("Command timeout", self._connection.hostname, command=cmd)
+        except pexpect.EOF:
+            session.disconnect()
+            raise condoor.ConnectionError("Unexpected session disconnect", self._connection.hostname)
+
+    def _send_and_write(self, cmd, full_path, timeout, start_at):
+        """
+        Sends the command and writes the whole output to the file.
+        """
+        output = self.send(cmd, timeout=timeout)
+        if start_at is not None:
+            index = output.find(start_at)
+            if index < 0:
+                raise OutputStartError(start_at)
+            output = output[output.rfind("\n", 0, index) + 1:]
+        with open(full_path, "w") as f:
+            writer = OutputWriter(f)
+            writer.write(output)
+        return writer.summary
+
+    def invalidate_command_cache(self):
+        if self._command_cache is not None:
+            self._command_cache.invalidate()
+
+    @property
+    def _stats(self):
+        """
+        The durations of the steps recorded by the previous runs or None if disabled.
+        """
+        if self._step_stats is None:
+            self._step_stats = False
+            if getattr(self._csm, "step_stats", True):
+                path = getattr(self._csm, "step_stats_path", None) or \
+                    get_stats_path(getattr(self._csm, "cache_directory", None))
+                try:
+                    self._step_stats = StepStats(path)
+                except sqlite3.Error as e:
+                    self.warning("Step statistics not available: {}".format(e))
+        return self._step_stats or None
+
+    def step_timeout(self, step, default):
+        """
+        Returns the timeout of the step learned from the previous runs on the same platform and release.
+        The default is returned until enough durations are recorded.
+        """
+        stats = self._stats
+        if stats is None:
+            return default
+        timeout = stats.timeout(step, self.family, self.os_version, default)
+        if timeout != default:
+            self.info("Timeout of '{}' learned from the previous runs: {} seconds".format(step, timeout))
+        return timeout
+
+    def step_poll_delay(self, step, default):
+        """
+        Returns the time after which the step is likely finished learned from the previous runs
+        on the same platform and release. The default is returned until enough durations are recorded.
+        """
+        stats = self._stats
+        if stats is None:
+            return default
+        return stats.poll_delay(step, self.family, self.os_version, default)
+
+    def record_step(self, step, duration):
+        stats = self._stats
+        if stats is None:
+            return
+        try:
+            stats.record(step, self.family, self.os_version, duration)
+        except sqlite3.Error as e:
+            self.warning("Unable to record the duration of '{}': {}".format(step, e))
+
+    @contextmanager
+    def timed_step(self, step):
+        """
+        Records the duration of the step if it finishes with no exception.
+        """
+        start = time()
+        yield
+        self.record_step(step, time() - start)
+
+    def sleep(self, seconds):
+        """
+        Waits for the number of seconds. Unlike time.sleep the wait is interrupted
+        and PluginError is raised when the plugin execution is cancelled.
+        """
+        if self._cancelled.wait(seconds):
+            raise PluginError("Plugin execution cancelled")
+
+    def cancel(self):
+        """
+        Cancels the plugin execution. This method can be called from the other thread.
+        The plugin is stopped in the next sleep.
+        """
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
 
     @property
     def TIMEOUT(self):
+        import condoor
         return condoor.TIMEOUT
 
     @property
     def CommandTimeoutError(self):
+        import condoor
         return condoor.CommandTimeoutError
 
+    @property
+    def CommandError(self):
+        import condoor
+        return condoor.CommandError
+
     @property
     def phase(self):
         """
@@ -135,11 +578,84 @@ class PluginContext(object):
             pass
             # raise AssertionError("Requested action not provided")
 
+    @phase.setter
+    def phase(self, phase):
+        self._csm.requested_action = phase
+
+    @property
+    def resume(self):
+        """
+        True if the install operation started by the previous run should be watched instead of started again.
+        """
+        return getattr(self._csm, "resume", False)
+
+    def _background_detect(self):
+        import condoor
+        try:
+            self._device_detect()
+            if not self.is_connected:
+                try:
+                    self.connect()
+                except condoor.ConnectionError as e:
+                    # the plugin manager connects again and reports the error
+                    self.warning("Unable to connect after the device discovery: {}".format(e))
+        except Exception:
+            self._discovery_error = sys.exc_info()
+        finally:
+            self._discovery_done.set()
+
+    def wait_for_discovery(self):
+        """
+        Waits until the background device discovery is finished. The discovery exception is re-raised.
+        """
+        # the timeout keeps the waiting thread responsive to KeyboardInterrupt
+        while not self._discovery_done.wait(1):
+            pass
+        if self._discovery_error is not None:
+            six.reraise(*self._discovery_error)
+
+    @property
+    def is_connected(self):
+        import condoor
+        try:
+            return self._connection.is_connected
+        except condoor.ConnectionError:
+            # the newer condoor versions raise if the connection was never established
+            return False
+
+    @property
+    def family(self):
+        self.wait_for_discovery()
+        return self._connection.family
+
+    @property
+    def prompt(self):
+        self.wait_for_discovery()
+        return self._connection.prompt
+
+    @property
+    def os_type(self):
+        self.wait_for_discovery()
+        return self._connection.os_type
+
+    @property
+    def os_version(self):
+        self.wait_for_discovery()
+        return self._connection.os_version
+
+    @property
+    def is_console(self):
+        self.wait_for_discovery()
+        return self._connection.is_console
+
     def _device_detect(self):
         """Connect to device using condoor"""
         self.info("Phase: Device Discovery")
         self.post_status("Device Discovery")
-        self.discovery()
+        if not self._cached_discovery():
+            self.discovery()
+            if self._discovery_ttl > 0:
+                self._save_discovery()
         self.info("Hostname: {}".format(self._connection.hostname))
         self.info("Hardware family: {}".format(self._connection.family))
         self.info("Hardware platform: {}".format(self._connection.platform))
@@ -150,37 +666,111 @@ class PluginContext(object):
         self._csm.save_data("device_info", self._connection.device_info)
         self._csm.save_data("udi", self._connection.udi)
 
+    @property
+    def _discovery_ttl(self):
+        # the discovery cache is disabled by default
+        return getattr(self._csm, "discovery_cache_ttl", 0)
+
+    @property
+    def _discovery_path(self):
+        return get_discovery_path(self._csm.hostname, self._csm.host_urls,
+                                  cache_dir=getattr(self._csm, "cache_directory", None))
+
+    def _save_discovery(self):
+        try:
+            save_discovery(self._discovery_path, get_connection_info(self._connection))
+        except Exception as e:
+            # the cache is an optimization only
+            self.warning("Unable to save the device information in the discovery cache: {}".format(e))
+
+    def _cached_discovery(self):
+        """
+        Restores the device information from the discovery cache. The cached information is used only
+        if the operating system type and version reported by the device did not change.
+        Returns True if the device information was restored. Any error falls back to the discovery.
+        """
+        import condoor
+        if self._discovery_ttl <= 0:
+            return False
+
+        path = self._discovery_path
+        info = load_discovery(path, self._discovery_ttl)
+        if info is None:
+            return False
+
+        try:
+            if not restore_connection(self._connection, info):
+                self.info("Discovery cache not supported by the installed condoor version")
+                return False
+            self.connect()
+            try:
+                show_version = self.send("show version brief", timeout=120)
+            except condoor.CommandError:
+                show_version = self.send("show version", timeout=120)
+            if not connection_matches(self._connection, info):
+                show_version = ""
+        except Exception as e:
+            self.warning("Device fingerprint check failed: {}".format(e))
+            show_version = ""
+
+        if matches_show_version(info, show_version):
+            # the session stays connected for the plugins
+            self.info("Device information loaded from the discovery cache")
+            return True
+
+        try:
+            self.disconnect()
+        except Exception:
+            pass
+        self.info("Device information changed. Discovering the device again.")
+        invalidate_discovery(path)
+        return False
+
     def _format_log(self, message):
         return "[{}] {}".format(self.current_plugin, message) if self.current_plugin else "{}".format(message)
 
+    def _log(self, level, message):
+        message = self._format_log(message)
+        if self._log_records is not None:
+            self._log_records.append((level, message, time()))
+        else:
+            self._logger.log(level, message)
+
     def info(self, message):
         """Log INFO message"""
-        self._logger.info(self._format_log(message))
+        self._log(logging.INFO, message)
 
     def error(self, message):
         """Log ERROR message"""
-        self._logger.error(self._format_log(message))
+        self._log(logging.ERROR, message)
         self._connection.disconnect()
         raise PluginError
         pass
 
     def warning(self, message):
         """Log WARNING message"""
-        self._logger.warning(self._format_log(message))
+        self._log(logging.WARNING, message)
 
     # Storage API
     def save_data(self, key, data):
         """
-        Stores (data, timestamp) tuple for key adding timestamp
+        Stores (data, timestamp) tuple for key adding timestamp. The data is buffered
+        and written to the CSM storage by flush_data.
         """
-        self._csm.save_data(key, [data, time()])
-        self.info("Key '{}' saved in CSM storage".format(key))
+        value = [data, time()]
+        self._pending_data[key] = value
+        if self._loaded_data is not None:
+            self._loaded_data[key] = value
 
     def load_data(self, key):
         """
         Loads (data, timestamp) tuple for the key
         """
-        result = self._csm.load_data(key)
+        if self._loaded_data is None:
+            self.prefetch_data()
+        if key not in self._loaded_data:
+            self._loaded_data[key] = self._csm.load_data(key)
+        result = self._loaded_data[key]
         if result:
             self.info("Key '{}' loaded from CSM storage".format(key))
             if isinstance(result, list):
@@ -189,32 +779,54 @@ class PluginContext(object):
                 return result, None
         return None, None
 
-    def normalize_filename(self, name):
+    def prefetch_data(self):
+        """
+        Loads all the keys stored for the host in a single call if supported by CSM.
+        """
+        self._loaded_data = {}
+        load_data_many = getattr(self._csm, "load_data_many", None)
+        if load_data_many is not None:
+            self._loaded_data.update(load_data_many())
+            self.info("{} key(s) prefetched from CSM storage".format(len(self._loaded_data)))
+        self._loaded_data.update(self._pending_data)
+
+    def flush_data(self):
+        """
+        Writes the buffered data to the CSM storage in a single call if supported by CSM.
+        """
+        if not self._pending_data:
+            return
+        pending, self._pending_data = self._pending_data, {}
+        save_data_many = getattr(self._csm, "save_data_many", None)
+        if save_data_many is not None:
+            save_data_many(pending)
+        else:
+            for key, value in pending.items():
+                self._csm.save_data(key, value)
+        self.info("Key(s) '{}' saved in CSM storage".format("', '".join(sorted(pending))))
+
+    def normalize_filename(self, name, extension=".txt"):
         filename = re.sub(r"\W+", '-', name)
-        filename += ".txt"
+        filename += extension
         return filename
 
-    def save_to_file(self, name, data):
+    def save_to_file(self, name, data, extension=".txt"):
         """
-        Save data to filename in the log_directory provided by CSM
+        Save data to filename in the log_directory provided by CSM using the artifact store.
+        The extension is appended to the normalized name. Returns the name of the stored file.
         """
 
         store_dir = self._csm.log_directory
-        file_name = self.normalize_filename(name)
-        full_path = os.path.join(store_dir, file_name)
-        with open(full_path, "w") as f:
-            f.write(data)
-            self.info("File '{}' saved in CSM log directory".format(file_name))
-            return file_name
-        return None
+        file_name = self.normalize_filename(name, extension)
+        file_name = self._artifact_store.save(store_dir, file_name, data)
+        self.info("File '{}' saved in CSM log directory".format(file_name))
+        return file_name
 
     def load_from_file(self, file_name):
         """
-        Load data from file where full path is provided as file_name
+        Load data from file where full path is provided as file_name. The compressed file is loaded
+        if the file was saved by the compressed artifact store.
         """
-        full_path = file_name
-        with open(full_path, "r") as f:
-            data = f.read()
-            self.info("File '{}' loaded from CSM directory".format(os.path.basename(file_name)))
-            return data
-        return None
+        data = load_artifact(file_name)
+        self.info("File '{}' loaded from CSM directory".format(os.path.basename(file_name)))
+        return data
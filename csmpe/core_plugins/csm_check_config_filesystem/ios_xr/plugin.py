@@ -35,6 +35,7 @@ class Plugin(CSMPlugin):
     name = "Config Filesystem Check Plugin"
     platforms = {'ASR9K', 'CRS', 'NCS1K', 'NCS5K', 'NCS5500', 'NCS6K'}
     phases = {'Pre-Upgrade', "Pre-Activate", "Pre-Deactivate"}
+    read_only = False
 
     def run(self):
         """
@@ -35,6 +35,8 @@ class Plugin(CSMPlugin):
     name = "ISIS Neighbor Check Plugin"
     platforms = {'ASR9K', 'CRS', 'NCS1K', 'NCS5K', 'NCS5500', 'NCS6K'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
+    read_only = True
+    provides = {'isis_neighbors', 'show isis neighbor summary'}
 
     def run(self):
         """
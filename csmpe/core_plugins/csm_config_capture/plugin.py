@@ -35,11 +35,13 @@ class Plugin(CSMPlugin):
     name = "Config Capture Plugin"
     platforms = {'ASR9K', 'CRS', 'NCS1K', 'NCS5K', 'NCS5500', 'NCS6K', 'ASR900', 'N6K'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
+    read_only = True
 
     def run(self):
         cmd = "show running-config"
-        output = self.ctx.send(cmd, timeout=2200)
-        file_name = self.ctx.save_to_file(cmd, output)
-        if file_name is None:
-            self.ctx.error("Unable to save device configuration to file: {}".format(file_name))
+        file_name = self.ctx.normalize_filename(cmd)
+        try:
+            self.ctx.send_to_file(cmd, file_name, timeout=2200)
+        except IOError as e:
+            self.ctx.error("Unable to save device configuration to file: {}: {}".format(file_name, e))
             return False
@@ -35,20 +35,26 @@ class Plugin(CSMPlugin):
     name = "Custom Commands Capture Plugin"
     platforms = {'ASR9K', 'CRS', 'NCS1K', 'NCS5K', 'NCS5500', 'NCS6K', 'ASR900', 'N6K'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
+    read_only = True
+
+    def _capture(self, session, cmd):
+        session.info("Capturing output of '{}'".format(cmd))
+        file_name = session.normalize_filename(cmd)
+        try:
+            session.send_to_file(cmd, file_name, timeout=2200)
+        except IOError as e:
+            return "Unable to save '{}' output to file: {}: {}".format(cmd, file_name, e)
+        except CommandSyntaxError:
+            return "Command Syntax Error: '" + cmd + "'"
 
     def run(self):
         command_list = self.ctx.custom_commands
         if command_list:
-            for cmd in command_list:
-                self.ctx.info("Capturing output of '{}'".format(cmd))
-                try:
-                    output = self.ctx.send(cmd, timeout=2200)
-                    file_name = self.ctx.save_to_file(cmd, output)
-                    if file_name is None:
-                        self.ctx.error("Unable to save '{}' output to file: {}".format(cmd, file_name))
-                        return False
-                except CommandSyntaxError:
-                    self.ctx.error("Command Syntax Error: '" + cmd + "'")
+            # the commands are captured concurrently if the device session pool allows
+            errors = self.ctx.map_sessions(self._capture, command_list)
+            for error in errors:
+                if error:
+                    self.ctx.error(error)
 
         else:
             self.ctx.info("No custom commands provided.")
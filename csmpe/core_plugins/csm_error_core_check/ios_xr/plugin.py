@@ -33,6 +33,7 @@ class Plugin(CSMPlugin):
     name = "Core Error Check Plugin"
     platforms = {'ASR9K', 'CRS', 'NCS1K', 'NCS5K', 'NCS5500', 'NCS6K'}
     phases = {'Post-Upgrade'}
+    read_only = True
 
     # matching any errors, core and traceback
     _string_to_check_re = re.compile(
@@ -38,6 +38,7 @@ class Plugin(CSMPlugin):
     platforms = {'ASR9K', 'CRS'}
     phases = {'Pre-Upgrade'}
     os = {'XR'}
+    read_only = False
 
     def _can_create_dir(self, filesystem):
 
@@ -25,9 +25,10 @@
 # =============================================================================
 
 from csmpe.plugins import CSMPlugin
-from install import observe_install_add_remove
+from install import observe_install_add_remove, attach_operation
 from install import check_ncs6k_release
 from csmpe.core_plugins.csm_get_inventory.exr.plugin import get_package, get_inventory
+from csmpe.core_plugins.csm_install_operations.utils import resume_install_operation
 
 
 class Plugin(CSMPlugin):
@@ -73,7 +74,7 @@ class Plugin(CSMPlugin):
             cmd = "install add source {} {}".format(server_repository_url, s_packages)
             output = self.ctx.send(cmd, timeout=100)
 
-        observe_install_add_remove(self.ctx, output, has_tar=has_tar)
+        observe_install_add_remove(self.ctx, output, has_tar=has_tar, cmd=cmd)
 
     def run(self):
         check_ncs6k_release(self.ctx)
@@ -106,7 +107,12 @@ class Plugin(CSMPlugin):
         self.ctx.info("Add Package(s) Pending")
         self.ctx.post_status("Add Package(s) Pending")
 
-        self.install_add(server_repository_url, s_packages, has_tar=has_tar)
+        operation = resume_install_operation(self.ctx, attach_operation)
+        if operation is None:
+            self.install_add(server_repository_url, s_packages, has_tar=has_tar)
+        elif has_tar:
+            self.ctx.operation_id = operation['op_id']
+            self.ctx.info("The operation {} stored".format(operation['op_id']))
 
         self.ctx.info("Package(s) Added Successfully")
 
@@ -24,14 +24,22 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
+import json
 import re
-import time
+from time import time
+
 from condoor import ConnectionError
 from csmpe.core_plugins.csm_node_status_check.exr.plugin_lib import parse_show_platform
+from csmpe.core_plugins.csm_install_operations.reload_lib import wait_for_device_reload
+from csmpe.core_plugins.csm_install_operations.utils import install_operation, save_install_operation, \
+    resume_install_operation
 
 install_error_pattern = re.compile("Error:    (.*)$", re.MULTILINE)
 
-plugin_ctx = None
+# The minimum and maximum time in seconds of waiting for the install completion message
+# between the install progress polls
+WATCH_MIN_WAIT = 5
+WATCH_MAX_WAIT = 60
 
 
 def log_install_errors(ctx, output):
@@ -54,6 +62,28 @@ def check_ncs6k_release(ctx):
                         ctx.error('Abort: Software package earlier than release 5.2.5 for NCS6K is not supported.')
 
 
+def next_watch_wait(timeline, wait, changed):
+    """
+    Returns the time to wait for the install completion message before the next progress poll.
+    The wait is doubled while the progress does not change. Otherwise it is estimated from
+    the progress rate, so the progress is polled about twice until the expected completion.
+
+    :param timeline: The list of (seconds since start, percent) progress changes
+    :param wait: The previous wait time
+    :param changed: True if the progress changed since the previous poll
+    """
+    if not changed:
+        return min(wait * 2, WATCH_MAX_WAIT)
+    if len(timeline) < 2:
+        return wait
+
+    (first_time, first_percent), (last_time, last_percent) = timeline[0], timeline[-1]
+    if last_percent <= first_percent:
+        return wait
+    remaining = (100 - last_percent) * (last_time - first_time) / float(last_percent - first_percent)
+    return max(WATCH_MIN_WAIT, min(WATCH_MAX_WAIT, remaining / 2))
+
+
 def watch_operation(ctx, op_id=0):
     """
     Watch for the non-reload situation.  Upon issuing add/activate/commit/remove/deactivate, the install operation
@@ -61,11 +91,13 @@ def watch_operation(ctx, op_id=0):
 
     Install operation will continue in the background
 
-    will be displayed.  After some time elapses, a successful or abort message will be displayed.
+    will be displayed.  After some time elapses, a successful or abort message will be displayed.  The watcher
+    waits for this unsolicited message, so the completion is detected as soon as it is reported.
 
-    The CLI command, 'show install request' is used in the loop to report the progress percentages.  Upon
+    The CLI command, 'show install request' is used between the waits to report the progress percentages.  Upon
     completion, 'show install request' returns 'No install operation in progress'.  The watch_operation will be
-    done at that point.
+    done at that point.  The wait grows while the progress does not change and follows the progress rate
+    otherwise, see next_watch_wait.  The progress timeline is saved in the log directory.
 
     As an example,
 
@@ -100,46 +132,53 @@ def watch_operation(ctx, op_id=0):
     # In ASR9K eXR, the output to show install request may be "The install prepare operation 9 is 40% complete"
     # or "The install service operation 9 is 40% complete" or "The install add operation 9 is 40% complete" and etc.
     op_progress = r"The install \w*?\s?operation {} is (\d+)% complete".format(op_id)
-    success = "Install operation {} finished successfully".format(op_id)
+    completed = r"Install operation {} (?:finished successfully|aborted)".format(op_id)
 
     cmd_show_install_request = "show install request"
     ctx.info("Watching the operation {} to complete".format(op_id))
 
-    last_status = None
-    finish = False
+    start = time()
+    timeline = []
+    wait = WATCH_MIN_WAIT
     time_tried = 0
-    while not finish:
+    while True:
         try:
             try:
-                # this is to catch the successful operation as soon as possible
-                ctx.send("", wait_for_string=success, timeout=20)
-                finish = True
+                # the device reports the completion as soon as the operation is finished
+                ctx.send("", wait_for_string=completed, timeout=wait)
+                break
             except ctx.CommandTimeoutError:
                 pass
 
-            message = ""
-            output = ctx.send(cmd_show_install_request, timeout=300)
-            if op_id in output:
-                result = re.search(op_progress, output)
-                if result:
-                    status = result.group(0)
-                    message = "{}".format(status)
-
-                if message != last_status:
-                    ctx.post_status(message)
-                    last_status = message
+            output = ctx.send(cmd_show_install_request, timeout=300, cache=False)
         except (ConnectionError, ctx.CommandTimeoutError) as e:
             if time_tried > 2:
                 raise e
 
             time_tried += 1
             ctx.disconnect()
-            time.sleep(60)
+            ctx.sleep(60)
             ctx.reconnect()
+            continue
 
         if no_install in output:
             break
 
+        changed = False
+        result = re.search(op_progress, output)
+        if result:
+            percent = int(result.group(1))
+            if not timeline or timeline[-1][1] != percent:
+                timeline.append((round(time() - start, 1), percent))
+                ctx.post_status(result.group(0))
+                changed = True
+        wait = next_watch_wait(timeline, wait, changed)
+
+    if timeline:
+        progress = {'op_id': op_id, 'duration': round(time() - start, 1), 'timeline': timeline}
+        ctx.save_to_file("install_operation_{}_progress".format(op_id), json.dumps(progress, indent=1),
+                         extension=".json")
+
     report_install_status(ctx, op_id)
 
 
@@ -174,42 +213,20 @@ def wait_for_reload(ctx):
     """
     ctx.info("Device or sdr is reloading.")
     ctx.post_status("Device or sdr is reloading...")
-    ctx.disconnect()
-    time.sleep(60)
-    ctx.reconnect(max_timeout=1500)  # 25 * 60 = 1500
-
-    timeout = 3600
-    poll_time = 30
-    time_waited = 0
-    xr_run = "IOS XR RUN"
+    return wait_for_device_reload(ctx, nodes_ready)
 
-    cmd = "show platform"
-    ctx.info("Waiting for all nodes to come up")
-    ctx.post_status("Waiting for all nodes to come up")
-
-    time.sleep(100)
-
-    while 1:
-        # Wait till all nodes are in XR run state
-        time_waited += poll_time
-        if time_waited >= timeout:
-            break
 
-        time.sleep(poll_time)
-        output = ctx.send(cmd)
-        if xr_run in output:
-            inventory = parse_show_platform(output)
-            if validate_node_state(inventory):
-                ctx.info("All nodes in desired state")
-                return True
-
-    # Some nodes did not come to run state
-    ctx.error("Not all nodes have came up: {}".format(output))
-    # this will never be executed
-    return False
+def nodes_ready(ctx):
+    """
+    Returns the (ready, output) tuple. Ready is True if all nodes are in the valid state.
+    """
+    output = ctx.send("show platform", cache=False)
+    if "IOS XR RUN" not in output:
+        return False, output
+    return validate_node_state(parse_show_platform(output)), output
 
 
-def observe_install_add_remove(ctx, output, has_tar=False):
+def observe_install_add_remove(ctx, output, has_tar=False, cmd=None):
     """
     Success Condition:
     ADD:
@@ -252,7 +269,9 @@ def observe_install_add_remove(ctx, output, has_tar=False):
     op_success = "Install operation will continue in the background"
 
     if op_success in output:
-        watch_operation(ctx, op_id)
+        save_install_operation(ctx, op_id, cmd)
+        with install_operation(ctx):
+            watch_operation(ctx, op_id)
     else:
         log_install_errors(ctx, output)
         ctx.error("Operation {} failed".format(op_id))
@@ -284,65 +303,118 @@ def report_install_status(ctx, op_id):
     ctx.info("Operation {} finished successfully".format(op_id))
 
 
-def handle_aborted(fsm_ctx):
+class ActivateDeactivateOperation(object):
     """
-    :param ctx: FSM Context
-    :return: True if successful other False
+    The install activate or deactivate operation on the single device. The FSM callbacks are bound
+    to the operation object, so the operations running concurrently on many devices in the same
+    process do not share any state.
     """
-    global plugin_ctx
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.cmd = None
+
+    def handle_aborted(self, fsm_ctx):
+        """
+        :param fsm_ctx: FSM Context
+        :return: True if successful other False
+        """
+        report_install_status(ctx=self.ctx, op_id=get_op_id(fsm_ctx.ctrl.before))
+
+        # Indicates the failure
+        return False
 
-    report_install_status(ctx=plugin_ctx, op_id=get_op_id(fsm_ctx.ctrl.before))
+    def handle_non_reload_activate_deactivate(self, fsm_ctx):
+        """
+        :param fsm_ctx: FSM Context
+        :return: True if successful other False
+        """
+        op_id = get_op_id(fsm_ctx.ctrl.before)
+        if op_id == -1:
+            return False
 
-    # Indicates the failure
-    return False
+        save_install_operation(self.ctx, op_id, self.cmd)
+        watch_operation(self.ctx, op_id)
 
+        return True
 
-def handle_non_reload_activate_deactivate(fsm_ctx):
-    """
-    :param ctx: FSM Context
-    :return: True if successful other False
-    """
-    global plugin_ctx
+    def handle_reload_activate_deactivate(self, fsm_ctx):
+        """
+        :param fsm_ctx: FSM Context
+        :return: True if successful other False
+        """
+        op_id = get_op_id(fsm_ctx.ctrl.before)
+        if op_id == -1:
+            return False
 
-    op_id = get_op_id(fsm_ctx.ctrl.before)
-    if op_id == -1:
-        return False
+        save_install_operation(self.ctx, op_id, self.cmd, reload=True)
+        watch_reload_operation(self.ctx, op_id)
 
-    watch_operation(plugin_ctx, op_id)
+        return True
 
-    return True
+    def no_impact_warning(self, fsm_ctx):
+        self.ctx.warning("This was a NO IMPACT OPERATION. Packages are already active on device.")
+        return True
 
+    def run(self, cmd):
+        ABORTED = re.compile("aborted")
 
-def handle_reload_activate_deactivate(fsm_ctx):
-    """
-    :param ctx: FSM Context
-    :return: True if successful other False
-    """
-    global plugin_ctx
+        # Seeing this message without the reboot prompt indicates a non-reload situation
+        CONTINUE_IN_BACKGROUND = re.compile("Install operation will continue in the background")
+
+        REBOOT_PROMPT = re.compile("This install operation will (?:reboot|reload) the sdr, continue")
+
+        RUN_PROMPT = re.compile("#")
+
+        NO_IMPACT = re.compile("NO IMPACT OPERATION")
+
+        events = [CONTINUE_IN_BACKGROUND, REBOOT_PROMPT, ABORTED, NO_IMPACT, RUN_PROMPT]
+        transitions = [
+            (CONTINUE_IN_BACKGROUND, [0], -1, self.handle_non_reload_activate_deactivate, 100),
+            (REBOOT_PROMPT, [0], -1, self.handle_reload_activate_deactivate, 100),
+            (NO_IMPACT, [0], -1, self.no_impact_warning, 20),
+            (RUN_PROMPT, [0], -1, self.handle_non_reload_activate_deactivate, 100),
+            (ABORTED, [0], -1, self.handle_aborted, 100),
+        ]
+
+        self.cmd = cmd
+        with install_operation(self.ctx):
+            if not self.ctx.run_fsm("activate or deactivate", cmd, events, transitions, timeout=100):
+                self.ctx.error("Failed: {}".format(cmd))
 
-    op_id = get_op_id(fsm_ctx.ctrl.before)
-    if op_id == -1:
-        return False
 
+def watch_reload_operation(ctx, op_id):
+    """
+    Watches the operation which reloads the device and waits for the device to come up.
+    """
     try:
-        watch_operation(plugin_ctx, op_id)
-    except plugin_ctx.CommandTimeoutError:
+        watch_operation(ctx, op_id)
+    except ctx.CommandTimeoutError:
         # The device already started the reload
         pass
 
-    success = wait_for_reload(plugin_ctx)
+    success = wait_for_reload(ctx)
     if not success:
-        plugin_ctx.error("Reload or boot failure")
+        ctx.error("Reload or boot failure")
         return
 
-    plugin_ctx.info("Operation {} finished successfully".format(op_id))
-
-    return True
+    ctx.info("Operation {} finished successfully".format(op_id))
 
 
-def no_impact_warning(fsm_ctx):
-    plugin_ctx.warning("This was a NO IMPACT OPERATION. Packages are already active on device.")
-    return True
+def attach_operation(ctx, operation):
+    """
+    Watches the install operation started by the previous run until it is finished.
+    The operation could be finished already and the device could be reloaded in the meantime.
+    """
+    op_id = operation['op_id']
+    output = ctx.send("show install request", cache=False)
+    in_progress = re.search(r"operation {} is \d+% complete".format(op_id), output) is not None
+    if not in_progress:
+        ctx.info("Operation {} is not in progress".format(op_id))
+        report_install_status(ctx, op_id)
+    elif operation.get('reload'):
+        watch_reload_operation(ctx, op_id)
+    else:
+        watch_operation(ctx, op_id)
 
 
 def install_activate_deactivate(ctx, cmd):
@@ -418,36 +490,9 @@ def install_activate_deactivate(ctx, cmd):
 
 
     """
-    global plugin_ctx
-    plugin_ctx = ctx
-
-    ABORTED = re.compile("aborted")
-
-    # Seeing this message without the reboot prompt indicates a non-reload situation
-    CONTINUE_IN_BACKGROUND = re.compile("Install operation will continue in the background")
-
-    REBOOT_PROMPT = re.compile("This install operation will (?:reboot|reload) the sdr, continue")
-
-    RUN_PROMPT = re.compile("#")
-
-    NO_IMPACT = re.compile("NO IMPACT OPERATION")
-
-    events = [CONTINUE_IN_BACKGROUND, REBOOT_PROMPT, ABORTED, NO_IMPACT, RUN_PROMPT]
-    transitions = [
-        (CONTINUE_IN_BACKGROUND, [0], -1, handle_non_reload_activate_deactivate, 100),
-        (REBOOT_PROMPT, [0], -1, handle_reload_activate_deactivate, 100),
-        (NO_IMPACT, [0], -1, no_impact_warning, 20),
-        (RUN_PROMPT, [0], -1, handle_non_reload_activate_deactivate, 100),
-        (ABORTED, [0], -1, handle_aborted, 100),
-    ]
-
-    if not ctx.run_fsm("activate or deactivate", cmd, events, transitions, timeout=100):
-        ctx.error("Failed: {}".format(cmd))
+    if resume_install_operation(ctx, attach_operation) is None:
+        ActivateDeactivateOperation(ctx).run(cmd)
 
 
 def send_admin_cmd(ctx, cmd):
-    ctx.send("admin")
-    output = ctx.send(cmd)
-    ctx.send("exit")
-
-    return output
+    return ctx.send_admin(cmd)
@@ -26,9 +26,10 @@
 
 from package_lib import SoftwarePackage
 from csmpe.plugins import CSMPlugin
-from install import observe_install_add_remove
+from install import observe_install_add_remove, attach_operation
 from install import send_admin_cmd
 from csmpe.core_plugins.csm_get_inventory.exr.plugin import get_package, get_inventory
+from csmpe.core_plugins.csm_install_operations.utils import resume_install_operation
 
 
 class Plugin(CSMPlugin):
@@ -63,8 +64,9 @@ class Plugin(CSMPlugin):
         self.ctx.info("Remove Package(s) Pending")
         self.ctx.post_status("Remove Package(s) Pending")
 
-        output = self.ctx.send(cmd, timeout=600)
-        observe_install_add_remove(self.ctx, output)
+        if resume_install_operation(self.ctx, attach_operation) is None:
+            output = self.ctx.send(cmd, timeout=600)
+            observe_install_add_remove(self.ctx, output, cmd=cmd)
 
         self.ctx.info("Package(s) Removed Successfully")
 
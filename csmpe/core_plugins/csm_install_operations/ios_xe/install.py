@@ -24,13 +24,11 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
 import re
-import time
 
 from csmpe.core_plugins.csm_node_status_check.ios_xe.plugin_lib import parse_show_platform
+from csmpe.core_plugins.csm_install_operations.reload_lib import wait_for_device_reload
 from utils import install_add_remove
 
-plugin_ctx = None
-
 
 def send_newline(fsm_ctx):
     fsm_ctx.ctrl.sendline('\r\n')
@@ -39,9 +37,16 @@ def send_newline(fsm_ctx):
     return True
 
 
-def issu_error_state(fsm_ctx):
-    plugin_ctx.warning("Error in ISSU. Please see session.log for details")
-    return False
+class IssuOperation(object):
+    """
+    The FSM callbacks of the ISSU operation bound to the plugin context of the device.
+    """
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def issu_error_state(self, fsm_ctx):
+        self.ctx.warning("Error in ISSU. Please see session.log for details")
+        return False
 
 
 def validate_node_state(inventory):
@@ -66,47 +71,15 @@ def wait_for_reload(ctx):
      Wait for system to come up with max timeout as 25 Minutes
 
     """
-    ctx.disconnect()
-    time.sleep(180)
-
-    ctx.reconnect(max_timeout=1500)  # 25 * 60 = 1500
-    timeout = 3600
-    poll_time = 30
-    time_waited = 0
-
-    ctx.info("Waiting for all nodes to come up")
-    ctx.post_status("Waiting for all nodes to come up")
-    time.sleep(30)
-
-    output = None
-
-    ncnt = 0
-    while 1:
-
-        ncnt += 1
-        if ncnt > 20:
-            break
-
-        # Wait till all nodes are in XR run state
-        time_waited += poll_time
-        if time_waited >= timeout:
-            break
-
-        time.sleep(poll_time)
-
-        output = ctx.send('show platform')
-
-        ctx.info("output = {}".format(output))
+    return wait_for_device_reload(ctx, nodes_ready)
 
-        inventory = parse_show_platform(ctx, output)
-        if validate_node_state(inventory):
-            ctx.info("All nodes in desired state")
-            return True
 
-    # Some nodes did not come to run state
-    ctx.error("Not all nodes have came up: {}".format(output))
-    # this will never be executed
-    return False
+def nodes_ready(ctx):
+    """
+    Returns the (ready, output) tuple. Ready is True if all nodes are in the valid state.
+    """
+    output = ctx.send('show platform', cache=False)
+    return validate_node_state(parse_show_platform(ctx, output)), output
 
 
 def install_activate_write_memory(ctx, cmd, hostname):
@@ -123,9 +96,6 @@ def install_activate_write_memory(ctx, cmd, hostname):
     Overwrite the previous NVRAM configuration?[confirm]
 
     """
-    global plugin_ctx
-    plugin_ctx = ctx
-
     # Seeing this message without the reboot prompt indicates a non-reload situation
     Build_config = re.compile("[OK]")
 
@@ -239,9 +209,7 @@ def install_activate_issu(ctx, cmd):
     :param hostname
     :return: nothing
     """
-
-    global plugin_ctx
-    plugin_ctx = ctx
+    operation = IssuOperation(ctx)
 
     # Seeing a message without STAGE 4 is an error
     Stage_one = re.compile("STAGE 1: Installing software on standby RP")
@@ -259,14 +227,14 @@ def install_activate_issu(ctx, cmd):
         (Stage_three, [2], 3, None, 1800),
         (Stage_four, [3], 4, None, 1800),
         (Load_on_reboot, [4], -1, None, 1800),
-        (Missing_conf, [0, 1, 2, 3, 4], -1, issu_error_state, 1800),
-        (Failed, [0, 1, 2, 3, 4], -1, issu_error_state, 1800),
+        (Missing_conf, [0, 1, 2, 3, 4], -1, operation.issu_error_state, 1800),
+        (Failed, [0, 1, 2, 3, 4], -1, operation.issu_error_state, 1800),
     ]
 
     if not ctx.run_fsm("ISSU", cmd, events, transitions, timeout=3600):
         ctx.error("Failed: {}".format(cmd))
 
-    time.sleep(300)
+    ctx.sleep(300)
 
     success = wait_for_reload(ctx)
 
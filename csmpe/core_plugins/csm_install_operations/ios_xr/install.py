@@ -26,10 +26,13 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
 import re
-import time
 import itertools
+from time import time
 from condoor import ConnectionError
 from csmpe.core_plugins.csm_node_status_check.ios_xr.plugin_lib import parse_show_platform
+from csmpe.core_plugins.csm_install_operations.reload_lib import wait_for_device_reload
+from csmpe.core_plugins.csm_install_operations.utils import install_operation, save_install_operation, \
+    resume_install_operation
 
 install_error_pattern = re.compile("Error:    (.*)$", re.MULTILINE)
 
@@ -40,10 +43,11 @@ def log_install_errors(ctx, output):
         ctx.warning(line)
 
 
-def watch_operation(ctx, op_id=0):
+def watch_operation(ctx, op_id=0, timeout=None):
     """
     Function to keep watch on progress of operation
-    and report KB downloaded.
+    and report KB downloaded. If timeout is set, ctx.error is called
+    when the operation does not finish in time.
 
     """
     no_install = r"There are no install requests in operation"
@@ -61,6 +65,7 @@ def watch_operation(ctx, op_id=0):
     last_status = None
     finish = False
     time_tried = 0
+    deadline = time() + timeout if timeout else None
     while not finish:
         try:
             try:
@@ -94,15 +99,29 @@ def watch_operation(ctx, op_id=0):
 
             time_tried += 1
             ctx.disconnect()
-            time.sleep(60)
+            ctx.sleep(60)
             ctx.reconnect()
 
         if no_install in output:
             break
 
+        if deadline is not None and time() > deadline:
+            ctx.error("Operation {} not finished in {} seconds".format(op_id, timeout))
+
     return output
 
 
+def watch_step(ctx, op_id, step=None):
+    """
+    Watches the operation. The duration of the operation started by this run is recorded as the step
+    and the watch is limited by the timeout learned from the previous runs. The resumed operation is not timed.
+    """
+    if step is None:
+        return watch_operation(ctx, op_id)
+    with ctx.timed_step(step):
+        return watch_operation(ctx, op_id, timeout=ctx.step_timeout(step, None))
+
+
 def validate_node_state(inventory):
     valid_state = [
         'IOS XR RUN',
@@ -129,44 +148,20 @@ def wait_for_reload(ctx):
      Wait for system to come up with max timeout as 25 Minutes
 
     """
-    ctx.disconnect()
-    time.sleep(60)
-
-    ctx.reconnect(max_timeout=1500)  # 25 * 60 = 1500
-    timeout = 3600
-    poll_time = 30
-    time_waited = 0
-    xr_run = "IOS XR RUN"
-
-    cmd = "admin show platform"
-    ctx.info("Waiting for all nodes to come up")
-    ctx.post_status("Waiting for all nodes to come up")
-    time.sleep(100)
-
-    output = None
-
-    while 1:
-        # Wait till all nodes are in XR run state
-        time_waited += poll_time
-        if time_waited >= timeout:
-            break
-
-        time.sleep(poll_time)
+    return wait_for_device_reload(ctx, nodes_ready)
 
-        output = ctx.send(cmd)
-        if xr_run in output:
-            inventory = parse_show_platform(ctx, output)
-            if validate_node_state(inventory):
-                ctx.info("All nodes in desired state")
-                return True
 
-    # Some nodes did not come to run state
-    ctx.error("Not all nodes have came up: {}".format(output))
-    # this will never be executed
-    return False
+def nodes_ready(ctx):
+    """
+    Returns the (ready, output) tuple. Ready is True if all nodes are in the valid state.
+    """
+    output = ctx.send("admin show platform", cache=False)
+    if "IOS XR RUN" not in output:
+        return False, output
+    return validate_node_state(parse_show_platform(ctx, output)), output
 
 
-def watch_install(ctx, cmd, op_id=0):
+def watch_install(ctx, cmd, op_id=0, step=None):
     success_oper = r'Install operation (\d+) completed successfully'
     completed_with_failure = 'Install operation (\d+) completed with failure'
     failed_oper = r'Install operation (\d+) failed'
@@ -175,7 +170,7 @@ def watch_install(ctx, cmd, op_id=0):
     install_method = r'Install [M|m]ethod: (.*)'
     op_success = "The install operation will continue asynchronously"
 
-    watch_operation(ctx, op_id)
+    watch_step(ctx, op_id, step)
 
     output = ctx.send("admin show install log {} detail".format(op_id))
     if re.search(failed_oper, output):
@@ -215,7 +210,22 @@ def watch_install(ctx, cmd, op_id=0):
     return False
 
 
+def install_step(cmd):
+    """
+    Returns the step name of the operation started by the install command used to learn its duration,
+    i.e. 'admin install add operation'.
+    """
+    return "{} operation".format(" ".join(cmd.split()[:3]))
+
+
 def install_add_remove(ctx, cmd, has_tar=False):
+    operation = resume_install_operation(ctx, attach_operation)
+    if operation is not None:
+        if has_tar is True:
+            ctx.operation_id = operation['op_id']
+            ctx.info("The operation {} stored".format(operation['op_id']))
+        return
+
     message = "Waiting the operation to continue asynchronously"
     ctx.info(message)
     ctx.post_status(message)
@@ -233,23 +243,32 @@ def install_add_remove(ctx, cmd, has_tar=False):
         return  # for sake of clarity
 
     op_success = "The install operation will continue asynchronously"
-    failed_oper = r'Install operation {} failed'.format(op_id)
     if op_success in output:
-        watch_operation(ctx, op_id=op_id)
-        output = ctx.send("admin show install log {} detail".format(op_id))
-        if re.search(failed_oper, output):
-            log_install_errors(ctx, output)
-            ctx.error("Operation {} failed".format(op_id))
-            return  # for same of clarity
-
-        ctx.info("Operation {} finished successfully".format(op_id))
+        save_install_operation(ctx, op_id, cmd)
+        with install_operation(ctx):
+            finish_add_remove(ctx, op_id, step=install_step(cmd))
         return  # for sake of clarity
     else:
         log_install_errors(ctx, output)
         ctx.error("Operation {} failed".format(op_id))
 
 
+def finish_add_remove(ctx, op_id, step=None):
+    failed_oper = r'Install operation {} failed'.format(op_id)
+    watch_step(ctx, op_id, step)
+    output = ctx.send("admin show install log {} detail".format(op_id))
+    if re.search(failed_oper, output):
+        log_install_errors(ctx, output)
+        ctx.error("Operation {} failed".format(op_id))
+        return  # for same of clarity
+
+    ctx.info("Operation {} finished successfully".format(op_id))
+
+
 def install_activate_deactivate(ctx, cmd):
+    if resume_install_operation(ctx, attach_operation) is not None:
+        return
+
     message = "Waiting the operation to continue asynchronously"
     ctx.info(message)
     ctx.post_status(message)
@@ -265,14 +284,31 @@ def install_activate_deactivate(ctx, cmd):
         return
 
     if op_success in output:
-        success = watch_install(ctx, cmd, op_id)
-        if not success:
-            ctx.error("Reload or boot failure")
-            return
-
-        ctx.info("Operation {} finished successfully".format(op_id))
+        save_install_operation(ctx, op_id, cmd)
+        with install_operation(ctx):
+            finish_activate_deactivate(ctx, cmd, op_id, step=install_step(cmd))
         return
     else:
         ctx.log_install_errors(output)
         ctx.error("Operation {} failed".format(op_id))
         return
+
+
+def finish_activate_deactivate(ctx, cmd, op_id, step=None):
+    success = watch_install(ctx, cmd, op_id, step)
+    if not success:
+        ctx.error("Reload or boot failure")
+        return
+
+    ctx.info("Operation {} finished successfully".format(op_id))
+
+
+def attach_operation(ctx, operation):
+    """
+    Watches the install operation started by the previous run until it is finished.
+    The operation could be finished already and the device could be reloaded in the meantime.
+    """
+    if re.search(r"\b(?:de)?activate\b", operation['command']):
+        finish_activate_deactivate(ctx, operation['command'], operation['op_id'])
+    else:
+        finish_add_remove(ctx, operation['op_id'])
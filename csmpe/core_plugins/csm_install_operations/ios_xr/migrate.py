@@ -192,7 +192,8 @@ class Plugin(CSMPlugin):
 
     def _reload_all(self, host):
         """Reload all nodes to boot eXR image."""
-        self.ctx.reload(reload_timeout=MIGRATION_TIME_OUT)
+        with self.ctx.timed_step("migration reload"):
+            self.ctx.reload(reload_timeout=self.ctx.step_timeout("migration reload", MIGRATION_TIME_OUT))
 
         return self._wait_for_reload(host)
 
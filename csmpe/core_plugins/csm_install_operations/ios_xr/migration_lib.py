@@ -1,12 +1,14 @@
-import time
 import re
 import json
+from time import time
 
 SUPPORTED_HW_JSON = "./asr9k_64bit/migration_supported_hw.json"
 
 ADMIN_RP = "\d+/RS?P\d+"
 ADMIN_LC = "\d+/\d+"
 
+MD5SUM_RE = re.compile(r"^([0-9a-f]{32})\s", re.MULTILINE)
+
 
 def log_and_post_status(ctx, msg):
     ctx.info(msg)
@@ -65,8 +67,7 @@ def parse_admin_show_platform(output):
 def get_all_supported_nodes(ctx, supported_cards):
     """Get the list of string node names(all available RSP/RP/LC) that are supported for migration."""
     supported_nodes = []
-    ctx.send("admin")
-    output = ctx.send("show platform")
+    output = ctx.send_admin("show platform")
     inventory = parse_exr_admin_show_platform(output)
 
     rp_pattern = re.compile(ADMIN_RP)
@@ -90,10 +91,15 @@ def get_all_supported_nodes(ctx, supported_cards):
                 if lc in node_type:
                     supported_nodes.append(node)
                     break
-    ctx.send("exit")
     return supported_nodes
 
 
+def parse_md5sum(output):
+    """Returns the checksum from the output of 'md5sum <file>' or None if the file is missing."""
+    result = MD5SUM_RE.search(output)
+    return result.group(1) if result else None
+
+
 def get_version(ctx):
     output = ctx.send("show version | include Version")
     version = re.search("Version\s*?(\d+\.\d+\.\d+)(?:\.\d+I)?", output)
@@ -112,21 +118,26 @@ def wait_for_final_band(ctx):
 
     supported_nodes = get_all_supported_nodes(ctx, supported_hw.get(exr_version))
     # Wait for all nodes to Final Band
-    timeout = 1500
+    timeout = ctx.step_timeout("final band", 1500)
     poll_time = 20
     time_waited = 0
+    # the first poll when the nodes are likely in FINAL Band
+    delay = ctx.step_poll_delay("final band", poll_time)
+    start = time()
 
     cmd = "show platform vm"
     # ctx.send("admin")
     # cmd = "show platform"
     while 1:
         # Wait till all nodes are in FINAL Band
-        time_waited += poll_time
+        time_waited += delay
         if time_waited >= timeout:
             break
-        time.sleep(poll_time)
-        output = ctx.send(cmd)
+        ctx.sleep(delay)
+        delay = poll_time
+        output = ctx.send(cmd, cache=False)
         if check_show_plat_vm(output, supported_nodes):
+            ctx.record_step("final band", time() - start)
             return True
 
         """
@@ -26,11 +26,12 @@
 # =============================================================================
 
 import re
-import time
+from time import time
 
 from csmpe.plugins import CSMPlugin
 from csmpe.context import PluginError
-from migration_lib import wait_for_final_band, log_and_post_status
+from csmpe.journal import StepJournal
+from migration_lib import wait_for_final_band, log_and_post_status, parse_md5sum
 from csmpe.core_plugins.csm_custom_commands_capture.plugin import Plugin as CmdCapturePlugin
 from csmpe.core_plugins.csm_get_inventory.exr.plugin import get_package, get_inventory
 from pre_migrate import FINAL_CAL_CONFIG
@@ -73,6 +74,15 @@ class Plugin(CSMPlugin):
 
         return True
 
+    def _eusb_file_checksum(self, filename):
+        """
+        Returns the md5 checksum of the file in /eusbb/backup_config/ or None if the file is missing.
+        """
+        self.ctx.send("run", wait_for_string=r"\]\$")
+        output = self.ctx.send("md5sum /eusbb/backup_config/{}".format(filename), wait_for_string=r"\]\$")
+        self.ctx.send("exit")
+        return parse_md5sum(output)
+
     def _quit_config(self):
         """Quit the config mode without committing any changes."""
         def send_no(ctx):
@@ -124,22 +134,18 @@ class Plugin(CSMPlugin):
     def _check_fpds_for_upgrade(self):
         """Check if any FPD's need upgrade, if so, upgrade all FPD's on all locations."""
 
-        self.ctx.send("admin")
-
-        fpdtable = self.ctx.send("show hw-module fpd")
+        fpdtable = self.ctx.send_admin("show hw-module fpd")
 
         match = re.search("\d+/\w+.+\d+.\d+\s+[-\w]+\s+(NEED UPGD)", fpdtable)
 
         if match:
             total_num = len(re.findall("NEED UPGD", fpdtable)) + len(re.findall("CURRENT", fpdtable))
             if not self._upgrade_all_fpds(total_num):
-                self.ctx.send("exit")
                 self.ctx.error("FPD upgrade in eXR is not finished. Please check session.log.")
                 return False
             else:
                 return True
 
-        self.ctx.send("exit")
         return True
 
     def _upgrade_all_fpds(self, num_fpds):
@@ -153,28 +159,29 @@ class Plugin(CSMPlugin):
                  False if some FPD's did not upgrade successfully in 9600 seconds.
         """
         log_and_post_status(self.ctx, "Upgrading all FPD's.")
-        self.ctx.send("upgrade hw-module location all fpd all")
+        start = time()
+        self.ctx.send_admin("upgrade hw-module location all fpd all")
 
-        timeout = 9600
+        timeout = self.ctx.step_timeout("fpd upgrade", 9600)
         poll_time = 30
         time_waited = 0
 
-        time.sleep(60)
+        # the first poll when the upgrade is likely finished
+        self.ctx.sleep(max(self.ctx.step_poll_delay("fpd upgrade", 60 + poll_time) - poll_time, 0))
         while 1:
             # Wait till all FPDs finish upgrade
             time_waited += poll_time
             if time_waited >= timeout:
                 break
-            time.sleep(poll_time)
-            output = self.ctx.send("show hw-module fpd")
+            self.ctx.sleep(poll_time)
+            output = self.ctx.send_admin("show hw-module fpd", cache=False)
             num_need_reload = len(re.findall("RLOAD REQ", output))
             if len(re.findall("CURRENT", output)) + num_need_reload >= num_fpds:
+                self.ctx.record_step("fpd upgrade", time() - start)
                 if num_need_reload > 0:
                     log_and_post_status(self.ctx,
                                         "Finished upgrading FPD(s). Now reloading the device to complete the upgrade.")
-                    self.ctx.send("exit")
                     return self._reload_all()
-                self.ctx.send("exit")
                 return True
 
         # Some FPDs didn't finish upgrade
@@ -212,10 +219,18 @@ class Plugin(CSMPlugin):
             log_and_post_status(self.ctx,
                                 "Failed to capture 'show running-config' - ({}): {}".format(e.errno, e.strerror))
 
-        log_and_post_status(self.ctx, "Loading the migrated Calvados configuration.")
+        # The steps completed by the previous failed run are skipped if their inputs are not changed
+        journal = StepJournal(self.ctx)
+
+        def load_admin_config():
+            log_and_post_status(self.ctx, "Loading the migrated Calvados configuration.")
+            self._copy_file_from_eusb_to_harddisk(FINAL_CAL_CONFIG)
+            self._load_admin_config(FINAL_CAL_CONFIG)
+
         self.ctx.send("admin")
-        self._copy_file_from_eusb_to_harddisk(FINAL_CAL_CONFIG)
-        self._load_admin_config(FINAL_CAL_CONFIG)
+        # the config is loaded again if the file was replaced since the previous run
+        journal.run("load admin config", load_admin_config,
+                    inputs=[FINAL_CAL_CONFIG, self._eusb_file_checksum(FINAL_CAL_CONFIG), self.ctx.os_version])
 
         try:
             # This is still in admin mode
@@ -234,7 +249,7 @@ class Plugin(CSMPlugin):
 
         self.ctx.send("exit")
 
-        self._check_fpds_for_upgrade()
+        journal.run("fpd upgrade", self._check_fpds_for_upgrade)
 
         try:
             self.ctx.custom_commands = ["show platform"]
@@ -247,3 +262,5 @@ class Plugin(CSMPlugin):
         # Refresh package and inventory information
         get_package(self.ctx)
         get_inventory(self.ctx)
+
+        journal.clear()
@@ -28,12 +28,12 @@
 import csv
 import os
 import re
+import shutil
 import subprocess
 
-import pexpect
-
 from csmpe.plugins import CSMPlugin
 from csmpe.context import PluginError
+from csmpe.journal import StepJournal, hash_file
 from csmpe.core_plugins.csm_install_operations.utils import ServerType, is_empty, concatenate_dirs
 from simple_server_helper import TFTPServer, FTPServer, SFTPServer
 from hardware_audit import Plugin as HardwareAuditPlugin
@@ -79,11 +79,19 @@ CONVERTED_ADMIN_XR_CONFIG_IN_CSM = "admin.iox"
 FINAL_CAL_CONFIG = "cXR_admin_plane_converted_eXR.cfg"
 FINAL_XR_CONFIG = "cXR_xr_plane_converted_eXR.cfg"
 
+# The rows of 'show configuration commit list', i.e. "1    1000000123    cisco    vty0   CLI   Mon May 16 ..."
+COMMIT_ID_RE = re.compile(r"^\s*\d+\s+(\S+)", re.MULTILINE)
+
 # XR_CONFIG_ON_DEVICE = "iosxr.cfg"
 # ADMIN_CAL_CONFIG_ON_DEVICE = "admin_calvados.cfg"
 # ADMIN_XR_CONFIG_ON_DEVICE = "admin_iosxr.cfg"
 
 
+def parse_commit_ids(output):
+    """Returns the list of commit IDs from the output of 'show configuration commit list'."""
+    return COMMIT_ID_RE.findall(output)
+
+
 class Plugin(CSMPlugin):
     """
     A plugin for preparing device for migration from
@@ -657,11 +665,13 @@ class Plugin(CSMPlugin):
 
             PROMPT = self.ctx.prompt
             TIMEOUT = self.ctx.TIMEOUT
+            step = "fpd upgrade {}".format(fpdtype)
+            fpd_timeout = self.ctx.step_timeout(step, TIMEOUT_FOR_FPD_UPGRADE)
 
             events = [PROMPT, CONFIRM_CONTINUE, CONFIRM_SECOND_TIME, UPGRADE_END, TIMEOUT]
             transitions = [
-                (CONFIRM_CONTINUE, [0], 1, send_newline, TIMEOUT_FOR_FPD_UPGRADE),
-                (CONFIRM_SECOND_TIME, [0, 1], 2, send_yes, TIMEOUT_FOR_FPD_UPGRADE),
+                (CONFIRM_CONTINUE, [0], 1, send_newline, fpd_timeout),
+                (CONFIRM_SECOND_TIME, [0, 1], 2, send_yes, fpd_timeout),
                 (UPGRADE_END, [1, 2], 3, None, 120),
                 (PROMPT, [3], -1, None, 0),
                 (PROMPT, [1, 2], -1, error, 0),
@@ -669,10 +679,11 @@ class Plugin(CSMPlugin):
 
             ]
 
-            if not self.ctx.run_fsm("Upgrade FPD",
-                                    "admin upgrade hw-module fpd {} force location all".format(fpdtype),
-                                    events, transitions, timeout=30):
-                self.ctx.error("Error while upgrading FPD subtype {}. Please check session.log".format(fpdtype))
+            with self.ctx.timed_step(step):
+                if not self.ctx.run_fsm("Upgrade FPD",
+                                        "admin upgrade hw-module fpd {} force location all".format(fpdtype),
+                                        events, transitions, timeout=30):
+                    self.ctx.error("Error while upgrading FPD subtype {}. Please check session.log".format(fpdtype))
 
             fpd_log = self.ctx.send("show log | include fpd")
 
@@ -760,19 +771,24 @@ class Plugin(CSMPlugin):
         :return: None
         """
 
+        cmd = "admin show run" if admin else "show run"
         try:
-            cmd = "admin show run" if admin else "show run"
-            output = self.ctx.send(cmd, timeout=TIMEOUT_FOR_COPY_CONFIG)
-            ind = output.rfind('Building configuration...\n')
-
-        except pexpect.TIMEOUT:
+            # file = '../../csm_data/migration/<hostname>' + filename
+            self.ctx.send_to_file(cmd, files[0], timeout=TIMEOUT_FOR_COPY_CONFIG,
+                                  start_at='Building configuration...')
+        except self.ctx.CommandTimeoutError:
             self.ctx.error("CLI '{}' timed out after 1 hour.".format(cmd))
+        except self.ctx.CommandError:
+            # the whole output is saved if it does not contain the start line
+            self.ctx.warning("No 'Building configuration...' in the output of '{}'. "
+                             "Saving the whole output.".format(cmd))
+            try:
+                self.ctx.send_to_file(cmd, files[0], timeout=TIMEOUT_FOR_COPY_CONFIG)
+            except self.ctx.CommandError as e:
+                self.ctx.error("Unable to save the output of '{}': {}".format(cmd, e))
 
-        for file_path in files:
-            # file = '../../csm_data/migration/<hostname>' + filename
-            file_to_write = open(file_path, 'w+')
-            file_to_write.write(output[(ind + 1):])
-            file_to_write.close()
+        for file_path in files[1:]:
+            shutil.copyfile(files[0], file_path)
 
     def _handle_configs(self, hostname, server, repo_url, fileloc, nox_to_use, config_filename):
         """
@@ -813,15 +829,9 @@ class Plugin(CSMPlugin):
 
         log_and_post_status(self.ctx, "Saving the current configurations on device into server repository and csm_data")
 
-        self._save_config_to_csm_data([os.path.join(fileloc, ADMIN_CONFIG_IN_CSM),
-                                       os.path.join(self.ctx.log_directory,
-                                       self.ctx.normalize_filename("admin show running-config"))
-                                       ], admin=True)
+        self._save_config_to_csm_data([os.path.join(fileloc, ADMIN_CONFIG_IN_CSM)], admin=True)
 
-        self._save_config_to_csm_data([os.path.join(fileloc, XR_CONFIG_IN_CSM),
-                                       os.path.join(self.ctx.log_directory,
-                                       self.ctx.normalize_filename("show running-config"))
-                                       ], admin=False)
+        self._save_config_to_csm_data([os.path.join(fileloc, XR_CONFIG_IN_CSM)], admin=False)
 
         log_and_post_status(self.ctx, "Converting admin configuration file with configuration migration tool")
         self._run_migration_on_config(fileloc, ADMIN_CONFIG_IN_CSM, nox_to_use, hostname)
@@ -868,6 +878,32 @@ class Plugin(CSMPlugin):
                                         for config_name in config_names_on_device],
                                        timeout=TIMEOUT_FOR_COPY_CONFIG)
 
+    def _copy_configs_to_log_directory(self, fileloc):
+        """Copy the admin and XR configs saved in csm_data to session log directory for comparisons."""
+        for config_name, cmd in [(ADMIN_CONFIG_IN_CSM, "admin show running-config"),
+                                 (XR_CONFIG_IN_CSM, "show running-config")]:
+            shutil.copyfile(os.path.join(fileloc, config_name),
+                            os.path.join(self.ctx.log_directory, self.ctx.normalize_filename(cmd)))
+
+    def _config_artifacts(self, fileloc, config_filename):
+        """The local files produced by _handle_configs"""
+        config_names = [ADMIN_CONFIG_IN_CSM, XR_CONFIG_IN_CSM, CONVERTED_ADMIN_CAL_CONFIG_IN_CSM]
+        if not config_filename:
+            config_names.append(FINAL_XR_CONFIG)
+        return [os.path.join(fileloc, config_name) for config_name in config_names]
+
+    def _last_config_commits(self):
+        """
+        The IDs of the last configuration commits. The configurations are converted again if they change.
+        Only the IDs are returned, as the output starts with the current time.
+        """
+        return [parse_commit_ids(self.ctx.send("show configuration commit list 1")),
+                parse_commit_ids(self.ctx.send("admin show configuration commit list 1"))]
+
+    def _image_on_device(self, exr_image):
+        output = self.ctx.send("dir {}{}".format(IMAGE_LOCATION, exr_image))
+        return exr_image in output and "No such file" not in output
+
     def _get_exr_tar_package(self, packages):
         """Find out which version of eXR we are migrating to from the name of tar file"""
         image_pattern = re.compile("asr9k.*\.tar.*")
@@ -944,13 +980,17 @@ class Plugin(CSMPlugin):
         if not os.path.exists(fileloc):
             os.makedirs(fileloc)
 
+        # The steps completed by the previous failed run are skipped if their inputs are not changed
+        journal = StepJournal(self.ctx)
+
         self.ctx.save_data('hardware_audit_software_version', exr_version)
         # this is necessary because override_hw_req data field is used for frontend too,
         # hardware_audit will need to reset this new data field hardware_audit_override_hw_req
         # every time so as to not take an older value and also not affect the frontend.
         self.ctx.save_data('hardware_audit_override_hw_req', override_hw_req)
         hardware_audit_plugin = HardwareAuditPlugin(self.ctx)
-        hardware_audit_plugin.run()
+        journal.run("hardware audit", hardware_audit_plugin.run,
+                    inputs=[exr_version, override_hw_req, self.ctx.os_version])
 
         fpd_relevant_nodes = None
         if self.ctx.load_data('fpd_relevant_nodes'):
@@ -988,19 +1028,31 @@ class Plugin(CSMPlugin):
         self._save_show_platform()
 
         log_and_post_status(self.ctx, "Partition check and disk clean-up.")
-        self._resize_eusb()
+        journal.run("resize eusb", self._resize_eusb)
+
+        journal.run("configs",
+                    lambda: self._handle_configs(hostname_for_filename, server,
+                                                 server_repo_url, fileloc, nox_to_use, config_filename),
+                    inputs=[hostname_for_filename, server_repo_url, config_filename, hash_file(nox_to_use),
+                            self._last_config_commits()],
+                    artifacts=self._config_artifacts(fileloc, config_filename))
+        self._copy_configs_to_log_directory(fileloc)
 
-        self._handle_configs(hostname_for_filename, server,
-                             server_repo_url, fileloc, nox_to_use, config_filename)
+        def copy_image():
+            log_and_post_status(self.ctx, "Copying the ASR9K-X64 image from server repository to device.")
+            with self.ctx.timed_step("copy image"):
+                self._copy_files_to_device(server, server_repo_url, [exr_image], [IMAGE_LOCATION + exr_image],
+                                           timeout=self.ctx.step_timeout("copy image", TIMEOUT_FOR_COPY_IMAGE))
 
-        log_and_post_status(self.ctx, "Copying the ASR9K-X64 image from server repository to device.")
-        self._copy_files_to_device(server, server_repo_url, [exr_image],
-                                   [IMAGE_LOCATION + exr_image], timeout=TIMEOUT_FOR_COPY_IMAGE)
+        journal.run("copy image", copy_image, inputs=[server_repo_url, exr_image],
+                    verify=lambda ctx: self._image_on_device(exr_image))
 
-        self._ensure_updated_fpd(fpd_relevant_nodes, version, pie_packages)
+        journal.run("fpd upgrade", lambda: self._ensure_updated_fpd(fpd_relevant_nodes, version, pie_packages),
+                    inputs=[fpd_relevant_nodes, version, pie_packages])
 
         # Refresh package and inventory information
         get_package(self.ctx)
         get_inventory(self.ctx)
 
+        journal.clear()
         return True
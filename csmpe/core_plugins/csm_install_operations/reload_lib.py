@@ -0,0 +1,185 @@
+# =============================================================================
+# Reload Wait
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The device reload wait shared by the install operations. The device is probed over TCP until it goes
+down and comes back, so the full login is attempted only when the device accepts the connections.
+The node states are polled with the exponential backoff with jitter until all nodes are in the valid state.
+The valid state reported right after the login is confirmed again once the settle time passes.
+
+The timings are configured per operating system type in RELOAD_TIMINGS and per platform
+in PLATFORM_RELOAD_TIMINGS.
+"""
+
+import random
+import socket
+import urlparse
+from time import time
+
+DEFAULT_RELOAD_TIMINGS = {
+    # The maximum time to wait for the device to stop accepting connections after the reload
+    'down_timeout': 60,
+    # The maximum time to wait for the device to be reachable and to log in again
+    'up_timeout': 1500,
+    # The initial and maximum interval between the TCP probes
+    'probe_interval': 5,
+    'probe_max_interval': 30,
+    # The initial and maximum interval between the node state checks
+    'poll_interval': 10,
+    'poll_max_interval': 60,
+    # The maximum time to wait for all nodes to reach the valid state after login
+    'nodes_timeout': 3600,
+    # The minimum time after login before the valid node states are accepted
+    'settle_time': 100,
+    # The random part of each interval
+    'jitter': 0.2,
+}
+
+RELOAD_TIMINGS = {
+    'XE': {
+        'down_timeout': 180,
+        'nodes_timeout': 600,
+        'settle_time': 30,
+    },
+}
+
+PLATFORM_RELOAD_TIMINGS = {}
+
+DEFAULT_PORTS = {
+    'telnet': 23,
+    'ssh': 22,
+}
+
+
+def get_reload_timings(os_type=None, platform=None, timings=None):
+    """
+    Returns the reload timings for the operating system type and the platform. The timings
+    passed explicitly take precedence.
+    """
+    result = dict(DEFAULT_RELOAD_TIMINGS)
+    result.update(RELOAD_TIMINGS.get(os_type, {}))
+    result.update(PLATFORM_RELOAD_TIMINGS.get(platform, {}))
+    result.update(timings or {})
+    return result
+
+
+def backoff(interval, max_interval, jitter=0.0, factor=2):
+    """
+    Yields the exponentially growing intervals limited by max_interval. Each interval
+    is randomly changed by up to the jitter part, so many devices are not polled in lockstep.
+    """
+    while True:
+        yield interval * random.uniform(1 - jitter, 1 + jitter)
+        interval = min(interval * factor, max_interval)
+
+
+def probe_address(urls):
+    """
+    Returns the (host, port) tuple of the device connected directly or None if the device is connected
+    over the jumphost, so the TCP probe from here is not possible.
+    """
+    chain = urls[0] if isinstance(urls[0], list) else urls
+    if len(chain) != 1:
+        return None
+    url = urlparse.urlparse(chain[0])
+    port = url.port or DEFAULT_PORTS.get(url.scheme)
+    if not url.hostname or not port:
+        return None
+    return url.hostname, port
+
+
+def is_reachable(address, timeout=5):
+    """
+    Returns True if the TCP connection to the (host, port) address could be established.
+    """
+    try:
+        sock = socket.create_connection(address, timeout)
+    except (socket.error, socket.timeout):
+        return False
+    sock.close()
+    return True
+
+
+def _wait_for_reachable(ctx, address, reachable, timeout, timings):
+    """
+    Probes the address until it is reachable or not reachable. Returns True if the expected state was reached.
+    """
+    deadline = time() + timeout
+    for interval in backoff(timings['probe_interval'], timings['probe_max_interval'], timings['jitter']):
+        if is_reachable(address) == reachable:
+            return True
+        if time() + interval >= deadline:
+            return False
+        ctx.sleep(interval)
+
+
+def wait_for_device_reload(ctx, nodes_ready, timings=None):
+    """
+    Waits for the device to reload, logs in again and waits until all nodes are in the valid state.
+
+    :param ctx: The plugin context
+    :param nodes_ready: callable(ctx) returning the (ready, output) tuple for the current node states
+    :param timings: The optional timings overriding the platform specific ones
+    :return: True if all nodes are in the valid state, otherwise ctx.error is called
+    """
+    timings = get_reload_timings(ctx.os_type, ctx.family, timings)
+    # the terminal server accepts the connections while the device reloads
+    address = None if ctx.is_console else probe_address(ctx.host_urls)
+    ctx.disconnect()
+
+    if address is None:
+        ctx.sleep(timings['down_timeout'])
+    else:
+        ctx.info("Waiting for the device to go down")
+        if not _wait_for_reachable(ctx, address, False, timings['down_timeout'], timings):
+            ctx.warning("The device still accepts the connections")
+        ctx.info("Waiting for the device to be reachable")
+        if _wait_for_reachable(ctx, address, True, timings['up_timeout'], timings):
+            ctx.info("The device is reachable")
+
+    ctx.reconnect(max_timeout=timings['up_timeout'])
+
+    ctx.info("Waiting for all nodes to come up")
+    ctx.post_status("Waiting for all nodes to come up")
+    settled = time() + timings['settle_time']
+    deadline = time() + timings['nodes_timeout']
+    for interval in backoff(timings['poll_interval'], timings['poll_max_interval'], timings['jitter']):
+        ready, output = nodes_ready(ctx)
+        if ready and time() >= settled:
+            ctx.info("All nodes in desired state")
+            return True
+        if ready:
+            # the nodes not discovered yet are missing in the output right after the login
+            interval = settled - time()
+        if time() + interval >= deadline:
+            break
+        ctx.sleep(interval)
+
+    # Some nodes did not come to run state
+    ctx.error("Not all nodes have came up: {}".format(output))
+    # this will never be executed
+    return False
@@ -1,5 +1,11 @@
 import sys
 import importlib
+from contextlib import contextmanager
+
+from csmpe.context import PluginError
+
+# The storage key of the install operation being executed on the device
+INSTALL_OPERATION_KEY = "install_operation"
 
 
 class ServerType:
@@ -51,3 +57,56 @@ def update_device_info_udi(ctx):
     ctx._connection._update_udi()
     ctx._csm.save_data("device_info", ctx._connection.device_info)
     ctx._csm.save_data("udi", ctx._connection.udi)
+
+
+def save_install_operation(ctx, op_id, cmd, reload=False):
+    """
+    Stores the install operation being executed on the device before waiting for it, so the next run
+    can resume watching it if this process dies or the connection drops.
+    """
+    operation = {'op_id': op_id, 'command': cmd, 'phase': ctx.phase, 'reload': reload}
+    ctx.save_data(INSTALL_OPERATION_KEY, operation)
+    ctx.flush_data()
+
+
+def clear_install_operation(ctx):
+    ctx.save_data(INSTALL_OPERATION_KEY, None)
+    ctx.flush_data()
+
+
+@contextmanager
+def install_operation(ctx):
+    """
+    Clears the stored install operation when the block finishes or fails with the plugin error.
+    The operation stays stored if the connection is lost, so it can be resumed.
+    """
+    try:
+        yield
+    except PluginError:
+        clear_install_operation(ctx)
+        raise
+    clear_install_operation(ctx)
+
+
+def resume_install_operation(ctx, attach):
+    """
+    Continues the install operation started by the previous run in the same phase if resume is requested.
+
+    :param ctx: The plugin context
+    :param attach: The platform specific callable(ctx, operation) watching the operation until it is finished
+    :return: The resumed operation or None. If resumed the install command must not be issued again.
+    """
+    if not ctx.resume:
+        return None
+
+    operation, _ = ctx.load_data(INSTALL_OPERATION_KEY)
+    # the key never stored is loaded as the (None, None) tuple
+    if not isinstance(operation, dict) or operation.get('phase') != ctx.phase:
+        ctx.info("No install operation to resume")
+        return None
+
+    ctx.info("Resuming the install operation {} started by '{}'".format(operation['op_id'], operation['command']))
+    ctx.post_status("Resuming the install operation {}".format(operation['op_id']))
+    with install_operation(ctx):
+        attach(ctx, operation)
+    return operation
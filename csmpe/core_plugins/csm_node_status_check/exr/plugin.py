@@ -34,6 +34,8 @@ class Plugin(CSMPlugin):
     platforms = {'ASR9K', 'NCS1K', 'NCS5K', 'NCS5500', 'NCS6K'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
     os = {'eXR'}
+    read_only = True
+    provides = {'node_status'}
 
     def run(self):
         output = self.ctx.send("show platform")
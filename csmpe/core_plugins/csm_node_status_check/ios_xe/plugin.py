@@ -33,6 +33,8 @@ class Plugin(CSMPlugin):
     name = "Node Status Check Plugin"
     platforms = {'ASR900'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
+    read_only = True
+    provides = {'node_status'}
 
     def run(self):
         output = self.ctx.send("show platform")
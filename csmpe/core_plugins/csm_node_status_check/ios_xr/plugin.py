@@ -34,6 +34,8 @@ class Plugin(CSMPlugin):
     platforms = {'ASR9K', 'CRS'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
     os = {'XR'}
+    read_only = True
+    provides = {'node_status'}
 
     def run(self):
         output = self.ctx.send("admin show platform")
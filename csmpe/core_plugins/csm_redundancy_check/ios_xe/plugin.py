@@ -38,6 +38,7 @@ class Plugin(CSMPlugin):
     name = "Node Redundancy Check Plugin"
     platforms = {'ASR900'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
+    read_only = True
 
     def run(self):
         """
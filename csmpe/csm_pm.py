@@ -27,12 +27,11 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
 
-import pkginfo
-from condoor import ConnectionError
-from stevedore.dispatch import DispatchExtensionManager
-from stevedore.exception import NoMatches
-
+# The connection library, pkg_resources, stevedore and pkginfo are imported when needed,
+# so the commands which do not dispatch the plugins start fast.
 from context import PluginContext
+from manifest import get_manifest, plugin_matches, PluginIndex, NAMESPACE
+from scheduler import dependencies, run_graph
 
 install_phases = ['Pre-Upgrade', 'Pre-Add', 'Add', 'Pre-Activate', 'Activate', 'Pre-Deactivate',
                   'Deactivate', 'Pre-Remove', 'Remove', 'Commit', 'Get-Inventory',
@@ -43,88 +42,213 @@ auto_pre_phases = ["Add", "Activate", "Deactivate"]
 
 class CSMPluginManager(object):
 
-    def __init__(self, ctx=None, invoke_on_load=True):
-        self._ctx = PluginContext(ctx)
-        # The context contains device information after discovery phase
-        # There is no need to load plugins which does not match the family and os
-        try:
-            self._platform = self._ctx.family
-        except AttributeError:
-            self._platform = None
-        try:
-            self._os = self._ctx.os_type
-        except AttributeError:
-            self._os = None
+    def __init__(self, ctx=None, invoke_on_load=True, plugin_ctx=None):
+        # The device discovery starts in the background and the plugins are loaded in the meantime.
+        # The platform and os filters wait for the discovery only when the plugins are dispatched.
+        # The plugin context connected by the previous run for the same device can be reused.
+        if plugin_ctx is not None:
+            plugin_ctx.rebind(ctx)
+            self._ctx = plugin_ctx
+        else:
+            self._ctx = PluginContext(ctx)
+        self._device = ctx is not None
+        # The device stays connected after the dispatch if set
+        self.keep_connected = False
+        self._platform = None
+        self._os = None
+        # The filters taken from the device are updated for every phase
+        self._device_platform = False
+        self._device_os = False
 
         self._phase = None
         self._name = None
         self._vm = "xr"
         self.load(invoke_on_load=invoke_on_load)
 
-    def load(self, invoke_on_load=True):
-        self._manager = DispatchExtensionManager(
-            "csm.plugin",
-            self._check_plugin,
-            invoke_on_load=invoke_on_load,
-            invoke_args=(self._ctx,),
-            propagate_map_exceptions=True,
-            on_load_failure_callback=self._on_load_failure,
+    @property
+    def plugin_ctx(self):
+        return self._ctx
+
+    def _device_filters(self):
+        """
+        Sets the platform and os filters from the discovered device unless set explicitly.
+        The device filters are read again for every phase, as i.e. Migrate changes the os type from XR to eXR.
+        """
+        if self._device:
+            self._device = False
+            self._device_platform = self._platform is None
+            self._device_os = self._os is None
+        if self._device_platform:
+            self._platform = self._ctx.family
+        if self._device_os:
+            self._os = self._ctx.os_type
+
+    def load(self, invoke_on_load=True, rebuild_manifest=False):
+        """
+        Loads the plugin entries from the manifest. Only the entries matching the current filters are kept.
+        The plugin code is imported and instantiated during the dispatch and only if the plugin is
+        going to be executed.
+        """
+        self._invoke_on_load = invoke_on_load
+        self._extensions = {}
+        entries = get_manifest(
+            rebuild=rebuild_manifest,
+            on_load_failure=self._on_load_failure,
+            on_invalid_plugin=self._on_invalid_plugin,
         )
+        self._entries = [entry for entry in entries if self._match_entry(entry)]
+        self._index = PluginIndex(self._entries)
         self._build_plugin_list()
 
     def __getitem__(self, item):
-        return self._manager.__getitem__(item)
+        for entry in self._entries:
+            if item in (entry['id'], entry['entry_point']):
+                ext = self._get_extension(entry)
+                if ext is not None:
+                    return ext
+        raise KeyError(item)
 
     def _build_plugin_list(self):
         self.plugins = {}
-        for ext in self._manager:
-            self.plugins[ext.name] = {
-                #  'package_name': ext.entry_point.dist.project_name,
-                'package_name': ext.entry_point.module_name.split(".")[0],
-                'name': ext.plugin.name,
-                'description': ext.plugin.__doc__,
-                'phases': ext.plugin.phases,
-                'platforms': ext.plugin.platforms,
-                'os': ext.plugin.os
+        for entry in self._entries:
+            self.plugins[entry['id']] = {
+                'id': entry['id'],
+                'entry_point': entry['entry_point'],
+                'package_name': entry['package_name'],
+                'name': entry['name'],
+                'description': entry['description'],
+                'phases': entry['phases'],
+                'platforms': entry['platforms'],
+                'os': entry['os'],
+                'read_only': entry.get('read_only', False),
             }
 
-    def _filter_func(self, ext, *args, **kwargs):
-        if self._platform and self._platform not in ext.plugin.platforms:
-            return False
-        if self._phase and self._phase not in ext.plugin.phases:
-            return False
-        if self._name and ext.plugin.name not in self._name:
-            return False
-        # if detected os is set and plugin os set is not empty and detected os is not in plugin os then
-        # plugin does not match
-        if self._os and bool(ext.plugin.os) and self._os not in ext.plugin.os:
+    def _get_extension(self, entry):
+        """
+        Imports the plugin class and creates the plugin object on the first use.
+        Returns None if plugin could not be loaded.
+        """
+        import pkg_resources
+        from stevedore.extension import Extension
+        name = entry['entry_point']
+        ext = self._extensions.get(entry['id'])
+        if ext is None:
+            entry_point = pkg_resources.EntryPoint(name, entry['module_name'], attrs=tuple(entry['attrs']))
+            try:
+                plugin = entry_point.resolve()
+                obj = plugin(self._ctx) if self._invoke_on_load else None
+            except Exception as exc:
+                self._on_load_failure(self, entry_point, exc)
+                return None
+            ext = Extension(name, entry_point, plugin, obj)
+            self._extensions[entry['id']] = ext
+        return ext
+
+    def _match_entry(self, entry):
+        if self._name and entry['name'] not in self._name:
             return False
-        return True
+        return plugin_matches(entry, self._phase, self._platform, self._os)
+
+    def _get_entries(self):
+        """
+        Returns the plugin entries matching the current filters using the dispatch index.
+        """
+        self._device_filters()
+        entries = self._index.lookup(self._phase, self._platform, self._os)
+        if self._name:
+            entries = [entry for entry in entries if entry['name'] in self._name]
+        return entries
+
+    def lookup(self, phase=None, platform=None, os_type=None):
+        """
+        Returns the list of plugin names dispatched for the phase, platform and os type.
+        The device connection is not required, so the plugin manager created without the context
+        can be used to check which plugins are going to be executed on the devices.
+
+        :param phase: The install phase (i.e. Pre-Upgrade)
+        :param platform: The platform family (i.e. ASR9K)
+        :param os_type: The operating system type (i.e. XR, eXR, XE)
+        :return: The list of plugin names in the dispatch order
+        """
+        return [entry['name'] for entry in self._index.lookup(phase, platform, os_type)]
+
+    def _dispatch(self, ext, ctx=None):
+        ctx = ctx or self._ctx
+        ctx.current_plugin = None
+        ctx.info("Dispatching: '{}'".format(ext.plugin.name))
+        ctx.post_status(ext.plugin.name)
+        ctx.current_plugin = ext.plugin.name
+
+    def _map_method(self, func):
+        """
+        Calls the func method of all plugins matching the current filters. The exceptions are propagated.
+        """
+        from stevedore.exception import NoMatches
+        if not self._entries:
+            raise NoMatches("No {} plugins found".format(NAMESPACE))
+
+        plugins = []
+        for entry in self._get_entries():
+            ext = self._get_extension(entry)
+            if ext is not None:
+                plugins.append((entry, ext))
+
+        if self._ctx.max_sessions > 1 and len(plugins) > 1:
+            return self._map_method_parallel(func, plugins)
+
+        results = []
+        for entry, ext in plugins:
+            with self._ctx.sessions.lease(session=self._ctx):
+                self._dispatch(ext)
+                try:
+                    results.append(getattr(ext.obj, func)())
+                finally:
+                    self._ctx.flush_data()
+        return results
 
-    def _dispatch(self, ext, *args, **kwargs):
-        if self._filter_func(ext):
+    def _map_method_parallel(self, func, plugins):
+        """
+        Calls the func method of the plugins running the independent read-only plugins concurrently
+        over the sessions leased from the device session pool. The other plugins run alone on the main session.
+        The log records of each plugin are written when the plugin and all the plugins before it are finished.
+        """
+        records = {}
+
+        def run(position):
+            entry, ext = plugins[position]
+            with self._ctx.sessions.lease(session=None if entry.get('read_only') else self._ctx) as ctx:
+                previous = ctx.start_log_buffer()
+                try:
+                    self._dispatch(ext, ctx)
+                    obj = ext.obj if ctx is self._ctx else ext.plugin(ctx)
+                    try:
+                        return getattr(obj, func)()
+                    finally:
+                        ctx.flush_data()
+                finally:
+                    records[position] = ctx.stop_log_buffer(previous)
+
+        def replay(position):
+            self._ctx.replay_log(records.pop(position, []))
+
+        if self._ctx._loaded_data is None:
+            self._ctx.prefetch_data()
+        depends = dependencies([entry for entry, ext in plugins])
+        self._ctx.info("Running {} plugin(s) over up to {} session(s)".format(len(plugins), self._ctx.max_sessions))
+        try:
+            return run_graph(depends, run, self._ctx.max_sessions, on_done=replay)
+        finally:
             self._ctx.current_plugin = None
-            self._ctx.info("Dispatching: '{}'".format(ext.plugin.name))
-            self._ctx.post_status(ext.plugin.name)
-            self._ctx.current_plugin = ext.plugin.name
-            return True
-        return False
 
     def _on_load_failure(self, manager, entry_point, exc):
         self._ctx.warning("Plugin load error: {}".format(entry_point))
         self._ctx.warning("Exception: {}".format(exc))
 
-    def _check_plugin(self, ext, *args, **kwargs):
-        attributes = ['name', 'phases', 'platforms', 'os']
-        plugin = ext.plugin
-        for attribute in attributes:
-            if not hasattr(plugin, attribute):
-                self._ctx.warning("Attribute '{}' missing in plugin class: {}".format(
-                    attribute, ext.entry_point.module_name))
-                return False
-        return self._filter_func(ext)
+    def _on_invalid_plugin(self, attribute, module_name):
+        self._ctx.warning("Attribute '{}' missing in plugin class: {}".format(attribute, module_name))
 
     def get_package_metadata(self, name):
+        import pkginfo
         try:
             meta = pkginfo.Installed(name)
         except ValueError as e:
@@ -135,22 +259,76 @@ class CSMPluginManager(object):
     def _get_package_names(self):
         return self.get_package_metadata().keys()
 
-    def dispatch(self, func):
+    def _connect(self):
+        from condoor import ConnectionError
         try:
-            self._ctx.connect()
+            self._ctx.wait_for_discovery()
+            # the session is normally connected in the background already
+            if not self._ctx.is_connected:
+                self._ctx.connect()
         except ConnectionError as e:
             self._ctx.post_status(e.message)
             self._ctx.error(e.message)
             return False
+        return True
+
+    def _finish(self):
+        self._ctx.current_plugin = None
+        self._ctx.success = True
+        self._ctx.info("CSM Plugin Manager finished")
+        if not self.keep_connected:
+            self._ctx.disconnect()
+
+    def dispatch(self, func):
+        if not self._connect():
+            return False
+
+        try:
+            results = self._dispatch_phase(func, self._ctx.phase)
+        finally:
+            self._ctx.close_sessions()
+        self._finish()
+        return results
+
+    def dispatch_phases(self, func, phases):
+        """
+        Calls the func method of the plugins for each phase in order over the same device connection.
+        The execution stops on the first failing phase and the exception is propagated.
+
+        :param func: The plugin method name (i.e. "run")
+        :param phases: The list of the install phases (i.e. ["Pre-Upgrade", "Add", "Activate"])
+        :return: The list of the plugin results for each phase or False if the device could not be connected
+        """
+        if not self._connect():
+            return False
 
         results = []
-        current_phase = self._ctx.phase
-        if self._ctx.phase in auto_pre_phases:
-            phase = "Pre-{}".format(self._ctx.phase)
+        try:
+            for phase in phases:
+                # the plugin objects are not shared between the phases
+                self._extensions = {}
+                self._ctx.phase = phase
+                try:
+                    results.append(self._dispatch_phase(func, phase))
+                except Exception:
+                    self._ctx.current_plugin = None
+                    self._ctx.post_status("Phase {} failed".format(phase))
+                    self._ctx.warning("Phase {} failed. The remaining phases are not executed.".format(phase))
+                    raise
+        finally:
+            self._ctx.close_sessions()
+        self._finish()
+        return results
+
+    def _dispatch_phase(self, func, current_phase):
+        from stevedore.exception import NoMatches
+        results = []
+        if current_phase in auto_pre_phases:
+            phase = "Pre-{}".format(current_phase)
             self.set_phase_filter(phase)
             self._ctx.info("Phase: {}".format(self._phase))
             try:
-                results = self._manager.map_method(self._dispatch, func)
+                results = self._map_method(func)
             except NoMatches:
                 self._ctx.warning("No {} plugins found".format(phase))
             self._ctx.current_plugin = None
@@ -158,25 +336,30 @@ class CSMPluginManager(object):
         self.set_phase_filter(current_phase)
         self._ctx.info("Phase: {}".format(self._phase))
         try:
-            results += self._manager.map_method(self._dispatch, func)
+            results += self._map_method(func)
         except NoMatches:
             self._ctx.post_status("No plugins found for phase {}".format(self._phase))
             self._ctx.error("No plugins found for phase {}".format(self._phase))
 
         self._ctx.current_plugin = None
-        self._ctx.success = True
-        self._ctx.info("CSM Plugin Manager finished")
-        self._ctx.disconnect()
         return results
 
+    def cancel(self):
+        """
+        Cancels the plugin execution. Can be called from the other thread.
+        """
+        self._ctx.cancel()
+
     def set_platform_filter(self, platform):
         self._platform = platform
+        self._device_platform = False
 
     def set_phase_filter(self, phase):
         self._phase = phase
 
     def set_os_filter(self, os):
         self._os = os
+        self._device_os = False
 
     def set_name_filter(self, name):
         if isinstance(name, str) or isinstance(name, unicode):
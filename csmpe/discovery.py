@@ -0,0 +1,166 @@
+# =============================================================================
+# Discovery Cache
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The device discovery cache. The device information detected by condoor discovery is stored in the cache
+directory and reused by the consecutive plugin engine runs for the same device. The cache entry is
+identified by the hostname and the connection URL chain and expires after the TTL.
+The plugin context uses the cache only if the TTL is set by the CSM (i.e. csmpe run --discovery_cache).
+"""
+
+import hashlib
+import json
+import os
+import re
+from time import time
+
+from utils import get_cache_dir, read_json, write_json
+
+DISCOVERY_DIR = "discovery"
+DISCOVERY_TTL = 3600
+
+# The condoor 0.x internals needed to restore the connection state without the discovery
+LEGACY_ATTRIBUTES = ['_init_driver', '_get_driver_name', '_driver']
+
+# The connection attributes detected during the discovery
+CONNECTION_ATTRIBUTES = ['hostname', 'family', 'platform', 'os_type', 'os_version', 'prompt', 'udi', 'is_console']
+
+
+def get_discovery_path(hostname, urls, cache_dir=None):
+    """
+    Returns the path to the cache file for the hostname and the URL chain. The file name is the hash
+    of both, so no credentials from the URLs are exposed in the file system.
+    """
+    key = hashlib.sha1(json.dumps([hostname, urls], sort_keys=True)).hexdigest()
+    return os.path.join(cache_dir or get_cache_dir(), DISCOVERY_DIR, "{}.json".format(key))
+
+
+def load_discovery(path, ttl=DISCOVERY_TTL):
+    """
+    Returns the cached device information or None if not cached or expired.
+    """
+    data = read_json(path)
+    if not isinstance(data, dict):
+        return None
+    timestamp = data.get('timestamp', 0)
+    if not 0 <= time() - timestamp < ttl:
+        return None
+    info = data.get('info')
+    if not isinstance(info, dict) or any(attribute not in info for attribute in CONNECTION_ATTRIBUTES):
+        return None
+    return info
+
+
+def save_discovery(path, info):
+    """
+    Stores the device information in the cache. Returns True if successful.
+    """
+    return write_json(path, {'timestamp': time(), 'info': info})
+
+
+def invalidate_discovery(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def get_connection_info(connection):
+    """
+    Returns the dictionary with the device information detected by the discovery. Only the public
+    connection properties are used. The condoor description record is included if supported.
+    """
+    info = {
+        'hostname': connection.hostname,
+        'family': connection.family,
+        'platform': connection.platform,
+        'os_type': connection.os_type,
+        'os_version': connection.os_version,
+        'prompt': connection.prompt,
+        'udi': dict(connection.udi or {}),
+        'is_console': connection.is_console,
+    }
+    try:
+        description_record = connection.description_record
+    except Exception:
+        # not supported by condoor 0.x or no connection chains
+        description_record = None
+    if description_record is not None:
+        info['description_record'] = description_record
+    return info
+
+
+def restore_connection(connection, info):
+    """
+    Sets the connection to the state after the discovery using the cached device information.
+    Returns False if the installed condoor does not support it.
+
+    The condoor 1.x keeps its own description record cache read on connect, so nothing is restored,
+    and the connection state is checked by connection_matches after connecting.
+    """
+    if 'description_record' in info:
+        return True
+    if not all(hasattr(connection, attribute) for attribute in LEGACY_ATTRIBUTES):
+        return False
+
+    connection._hostname = info['hostname']
+    connection._family = info['family']
+    connection._platform = info['platform']
+    connection._os_type = info['os_type']
+    connection._os_version = info['os_version']
+    connection._prompt = info['prompt']
+    connection._udi = dict(info['udi'])
+    connection._is_console = info['is_console']
+    connection._init_driver(connection._get_driver_name())
+    connection._driver.determine_hostname(info['prompt'])
+    return True
+
+
+def connection_matches(connection, info):
+    """
+    Returns True if the connected session detected the same device as the cached device information.
+    """
+    return all(getattr(connection, attribute) == info[attribute]
+               for attribute in ['family', 'platform', 'os_type', 'os_version'])
+
+
+def matches_show_version(info, show_version):
+    """
+    Returns True if the output of 'show version' matches the operating system type
+    and version of the cached device information.
+    """
+    match = re.search("System version: (.*)", show_version, re.MULTILINE)  # NX-OS
+    if not match:
+        match = re.search(r"Version (.*?)(?:\[| |$)", show_version, re.MULTILINE)
+    if not match or match.group(1).strip() != (info['os_version'] or "").strip():
+        return False
+
+    match = re.search("(XR|XE|NX-OS)", show_version)
+    os_type = match.group(1) if match else "IOS"
+    if os_type == "XR" and info['os_type'] == "eXR":
+        return True
+    return os_type == info['os_type']
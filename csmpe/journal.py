@@ -0,0 +1,139 @@
+# =============================================================================
+# Step Journal
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The journal of the completed steps of the long running phases (i.e. Pre-Migrate, Post-Migrate).
+Each completed step is recorded with the hash of its inputs and the hashes of the local files it produced.
+The record is written to the plugin data storage immediately, so when the phase is run again after
+the failure, the steps completed by the previous run are skipped unless their inputs or artifacts changed.
+The step which runs invalidates all the steps after it. The journal is cleared when the phase completes.
+"""
+
+import hashlib
+import json
+from time import time
+
+JOURNAL_KEY = "step_journal"
+
+
+def hash_inputs(inputs):
+    """
+    Returns the hash of the JSON serializable step inputs.
+    """
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True)).hexdigest()
+
+
+def hash_file(path):
+    """
+    Returns the hash of the file content or None if the file does not exist.
+    """
+    digest = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+def hash_artifacts(paths):
+    return {path: hash_file(path) for path in paths}
+
+
+class StepJournal(object):
+    """
+    The completed steps of the phase. The steps recorded for the other phase are ignored.
+    """
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.phase = ctx.phase
+        self.replaying = True
+        journal, _ = ctx.load_data(JOURNAL_KEY)
+        if isinstance(journal, dict) and journal.get('phase') == self.phase:
+            self.steps = journal.get('steps') or {}
+        else:
+            self.steps = {}
+
+    def _save(self):
+        self.ctx.save_data(JOURNAL_KEY, {'phase': self.phase, 'steps': self.steps})
+        self.ctx.flush_data()
+
+    def completed(self, step, inputs=None, artifacts=None, verify=None):
+        """
+        Returns True if the step was completed by the previous run with the same inputs,
+        its artifacts are not changed and the optional verify(ctx) callable returns True.
+        """
+        if not self.replaying:
+            return False
+        entry = self.steps.get(step)
+        if not entry or entry.get('inputs') != hash_inputs(inputs):
+            return False
+        recorded = entry.get('artifacts') or {}
+        if set(recorded) != set(artifacts or []):
+            return False
+        if any(digest is None or hash_file(path) != digest for path, digest in recorded.items()):
+            return False
+        if verify is not None and not verify(self.ctx):
+            return False
+        return True
+
+    def record(self, step, inputs=None, artifacts=None, result=None):
+        self.steps[step] = {
+            'inputs': hash_inputs(inputs),
+            'artifacts': hash_artifacts(artifacts or []),
+            'result': result,
+            'timestamp': time(),
+        }
+        self._save()
+
+    def run(self, step, func, inputs=None, artifacts=None, verify=None):
+        """
+        Calls func() and records the step when it returns. The call is skipped and the result
+        recorded by the previous run is returned if the step is already completed.
+
+        :param step: The step name unique in the phase
+        :param func: The callable executing the step. The result must be JSON serializable.
+        :param inputs: The JSON serializable values the step depends on
+        :param artifacts: The paths of the local files produced by the step
+        :param verify: The optional callable(ctx) checking the step effect on the device
+        :return: The result of func
+        """
+        if self.completed(step, inputs, artifacts, verify):
+            self.ctx.info("Step '{}' completed by the previous run. Skipping.".format(step))
+            return self.steps[step].get('result')
+
+        # the steps after this one depend on the state it produces
+        self.replaying = False
+        result = func()
+        self.record(step, inputs, artifacts, result)
+        return result
+
+    def clear(self):
+        self.steps = {}
+        self.ctx.save_data(JOURNAL_KEY, None)
+        self.ctx.flush_data()
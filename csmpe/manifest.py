@@ -0,0 +1,238 @@
+# =============================================================================
+# Plugin Manifest
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The plugin manifest is the on-disk snapshot of the metadata of all plugins registered
+in the `csm.plugin` entry point namespace. The manifest is keyed by the names and versions
+of the installed distributions, so it gets rebuilt automatically when any package
+is installed, upgraded or removed.
+"""
+
+import hashlib
+import os
+import sys
+from uuid import UUID, uuid5
+
+from utils import get_cache_dir, read_json, write_json
+
+NAMESPACE = "csm.plugin"
+MANIFEST_FILENAME = "plugin_manifest.json"
+MANIFEST_VERSION = 3
+
+# The namespace of the plugin identifiers. The setup.py uses the same value to name the entry points.
+PLUGIN_ID_NAMESPACE = UUID('506cf106-ad92-402c-a1ad-6ec84048866a')
+
+PLUGIN_ATTRIBUTES = ['name', 'phases', 'platforms', 'os']
+
+# The distribution metadata found on the import path. The names include the versions except the development installs.
+METADATA_SUFFIXES = ('.dist-info', '.egg-info', '.egg', '.egg-link')
+
+# The index key used for plugins which run regardless of the detected operating system
+ANY_OS = None
+
+# The manifests already loaded by this process keyed by the manifest path and the distributions key.
+# The long running process reads the manifest file only once.
+_loaded = {}
+
+
+def get_manifest_path(cache_dir=None):
+    return os.path.join(cache_dir or get_cache_dir(), MANIFEST_FILENAME)
+
+
+def distributions_key():
+    """
+    Returns the hash of the metadata of all installed distributions. The metadata is listed
+    from the import path directories, as importing pkg_resources takes longer than the whole command.
+    The modification times catch the metadata rewritten by the development installs.
+    """
+    distributions = []
+    # the current directory is skipped, as it changes with every file created there
+    for directory in filter(None, sys.path):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            if not name.endswith(METADATA_SUFFIXES):
+                continue
+            path = os.path.join(directory, name)
+            for metadata in [path, os.path.join(path, "entry_points.txt")]:
+                try:
+                    distributions.append("{}={}".format(metadata, os.stat(metadata).st_mtime))
+                except OSError:
+                    pass
+    return hashlib.sha1("\n".join(sorted(distributions))).hexdigest()
+
+
+def plugin_id(module_name, attrs):
+    """
+    Returns the stable plugin identifier derived from the module path and the class name.
+    The identifier does not change between the installations and upgrades of the package,
+    so it can be used as a key of the data persisted per plugin.
+    """
+    target = "{}:{}".format(module_name, ".".join(attrs))
+    return str(uuid5(PLUGIN_ID_NAMESPACE, target))
+
+
+def _entry_from_extension(ext):
+    plugin = ext.plugin
+    return {
+        'id': plugin_id(ext.entry_point.module_name, ext.entry_point.attrs),
+        'entry_point': ext.name,
+        'module_name': ext.entry_point.module_name,
+        'attrs': list(ext.entry_point.attrs),
+        'package_name': ext.entry_point.module_name.split(".")[0],
+        'name': plugin.name,
+        'description': plugin.__doc__,
+        'phases': sorted(plugin.phases),
+        'platforms': sorted(plugin.platforms),
+        'os': sorted(plugin.os),
+        'read_only': bool(getattr(plugin, 'read_only', False)),
+        'requires': sorted(getattr(plugin, 'requires', [])),
+        'provides': sorted(getattr(plugin, 'provides', [])),
+    }
+
+
+def build_manifest(on_load_failure=None, on_invalid_plugin=None):
+    """
+    Imports all the plugins registered in the namespace and returns the list of plugin entries.
+
+    :param on_load_failure: callback(manager, entry_point, exception) called when plugin fails to load
+    :param on_invalid_plugin: callback(attribute, module_name) called when plugin misses the mandatory attribute
+    :return: list of dictionaries describing the plugins
+    """
+    # importing stevedore only when manifest needs to be rebuilt
+    from stevedore.extension import ExtensionManager
+
+    manager = ExtensionManager(
+        NAMESPACE,
+        invoke_on_load=False,
+        on_load_failure_callback=on_load_failure,
+    )
+
+    entries = []
+    for ext in manager:
+        for attribute in PLUGIN_ATTRIBUTES:
+            if not hasattr(ext.plugin, attribute):
+                if on_invalid_plugin:
+                    on_invalid_plugin(attribute, ext.entry_point.module_name)
+                break
+        else:
+            entries.append(_entry_from_extension(ext))
+    return entries
+
+
+def load_manifest(key=None, cache_dir=None):
+    """
+    Returns the list of plugin entries from the manifest file or None if the manifest does not exist
+    or it was built for a different set of installed distributions.
+    """
+    data = read_json(get_manifest_path(cache_dir))
+    if not isinstance(data, dict):
+        return None
+    if data.get('version') != MANIFEST_VERSION:
+        return None
+    if data.get('key') != (key or distributions_key()):
+        return None
+    return data.get('plugins')
+
+
+def save_manifest(entries, key=None, cache_dir=None):
+    """
+    Stores the plugin entries in the manifest file. Returns True if successful.
+    """
+    data = {
+        'version': MANIFEST_VERSION,
+        'key': key or distributions_key(),
+        'plugins': entries,
+    }
+    return write_json(get_manifest_path(cache_dir), data)
+
+
+def get_manifest(rebuild=False, cache_dir=None, on_load_failure=None, on_invalid_plugin=None):
+    """
+    Returns the list of plugin entries. The manifest is read from the cache directory. If it does not exist
+    or it is outdated, the plugins are imported, and the new manifest is stored for the consecutive runs.
+    """
+    key = distributions_key()
+    loaded_key = (get_manifest_path(cache_dir), key)
+    entries = None if rebuild else _loaded.get(loaded_key) or load_manifest(key, cache_dir)
+    if entries is None:
+        entries = build_manifest(on_load_failure=on_load_failure, on_invalid_plugin=on_invalid_plugin)
+        save_manifest(entries, key, cache_dir)
+    _loaded[loaded_key] = entries
+    return entries
+
+
+def plugin_matches(entry, phase=None, platform=None, os_type=None):
+    """
+    Returns True if plugin entry matches the phase, platform and os type. None matches any value.
+    """
+    if platform and platform not in entry['platforms']:
+        return False
+    if phase and phase not in entry['phases']:
+        return False
+    # if os type is set and plugin os set is not empty and os type is not in plugin os then
+    # plugin does not match
+    if os_type and bool(entry['os']) and os_type not in entry['os']:
+        return False
+    return True
+
+
+class PluginIndex(object):
+    """
+    The (phase, platform, os type) -> ordered plugin entries lookup table.
+    The order of the plugin entries is the same as in the manifest.
+    """
+    def __init__(self, entries):
+        self._entries = list(entries)
+        self._index = {}
+        self._lookups = {}
+        for position, entry in enumerate(self._entries):
+            for phase in entry['phases']:
+                for platform in entry['platforms']:
+                    for os_type in entry['os'] or [ANY_OS]:
+                        self._index.setdefault((phase, platform, os_type), []).append(position)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, phase=None, platform=None, os_type=None):
+        """
+        Returns the list of plugin entries matching the phase, platform and os type.
+        None matches any value. The result is calculated once for each combination.
+        """
+        key = (phase, platform, os_type)
+        if key not in self._lookups:
+            if phase and platform and os_type:
+                positions = set(self._index.get(key, []))
+                positions.update(self._index.get((phase, platform, ANY_OS), []))
+            else:
+                positions = [position for position, entry in enumerate(self._entries)
+                             if plugin_matches(entry, phase, platform, os_type)]
+            self._lookups[key] = [self._entries[position] for position in sorted(positions)]
+        return self._lookups[key]
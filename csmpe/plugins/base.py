@@ -57,6 +57,17 @@ class CSMPlugin(object):
     #: Empty set means plugin will be executed regardless of the detected operating system.
     os = set()
 
+    #: True if the plugin does not change the device state observed by the other plugins.
+    #: The read-only plugins of the same phase can be executed concurrently over separate device sessions.
+    read_only = False
+
+    #: The set of the storage keys loaded by the plugin which are saved by the other plugins in the same phase.
+    #: The plugin is executed after all the plugins providing any of these keys.
+    requires = set()
+
+    #: The set of the storage keys saved by the plugin.
+    provides = set()
+
     def __init__(self, ctx):
         """ This is a constructor of a plugin object. The constructor can be overridden by the plugin code.
         The CSM Plugin Engine passes the :class:`csmpe.InstallContext` object
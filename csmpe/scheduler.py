@@ -0,0 +1,135 @@
+# =============================================================================
+# Plugin Scheduler
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+Runs the plugins of a single phase concurrently. The plugin entries declare whether they are read-only
+and which storage keys they require and provide. Two plugins can run at the same time only if both are
+read-only and neither depends on the data of the other. Otherwise the manifest order is kept.
+"""
+
+import Queue
+import sys
+from multiprocessing.pool import ThreadPool
+
+import six
+
+
+def conflicts(first, second):
+    """
+    Returns True if the plugin entries must not be executed at the same time.
+    """
+    if not (first.get('read_only') and second.get('read_only')):
+        return True
+    first_provides = set(first.get('provides', []))
+    second_provides = set(second.get('provides', []))
+    if first_provides & (second_provides | set(second.get('requires', []))):
+        return True
+    return bool(second_provides & set(first.get('requires', [])))
+
+
+def dependencies(entries):
+    """
+    Returns the list of sets. The set contains the positions of the entries which must be finished
+    before the entry at the same position is started.
+    """
+    return [set(before for before in range(position) if conflicts(entries[before], entry))
+            for position, entry in enumerate(entries)]
+
+
+def run_graph(depends, run, workers, on_done=None):
+    """
+    Calls run(position) for each position in the dependency list using up to workers threads.
+    The positions are started in order as soon as all their dependencies are finished.
+
+    :param depends: The list of dependency sets returned by dependencies()
+    :param run: The function called for each position. Executed in the worker thread.
+    :param workers: The maximum number of positions running at the same time
+    :param on_done: Optional callback(position) called in the calling thread for the finished positions
+        in the position order, so the output produced by the concurrent plugins can be replayed deterministically
+    :return: The list of the results in the position order. If any call raised the exception, no new positions
+        are started and the exception of the first failed position is re-raised after the running ones finish.
+    """
+    count = len(depends)
+    results = [None] * count
+    errors = {}
+    finished = Queue.Queue()
+    done = set()
+    pending = list(range(count))
+    running = 0
+    reported = 0
+
+    def call(position):
+        try:
+            finished.put((position, run(position), None))
+        except BaseException:
+            finished.put((position, None, sys.exc_info()))
+
+    pool = ThreadPool(max(min(workers, count), 1))
+    try:
+        while pending or running:
+            if not errors:
+                for position in list(pending):
+                    if running >= workers:
+                        break
+                    if depends[position] <= done:
+                        pending.remove(position)
+                        running += 1
+                        pool.apply_async(call, (position,))
+            if not running:
+                break
+
+            position, result, error = _wait(finished)
+            running -= 1
+            done.add(position)
+            results[position] = result
+            if error is not None:
+                errors[position] = error
+            while reported < count and reported in done:
+                if on_done:
+                    on_done(reported)
+                reported += 1
+    finally:
+        pool.close()
+        pool.join()
+
+    # the positions finished after the failed one are reported as well
+    for position in sorted(done):
+        if position >= reported and on_done:
+            on_done(position)
+
+    if errors:
+        six.reraise(*errors[min(errors)])
+    return results
+
+
+def _wait(finished):
+    while True:
+        try:
+            # the timeout keeps the calling thread responsive to KeyboardInterrupt
+            return finished.get(timeout=1)
+        except Queue.Empty:
+            pass
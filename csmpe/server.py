@@ -0,0 +1,355 @@
+# =============================================================================
+# Plugin Worker Server
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The resident worker running the plugins for the jobs submitted to the spool directory::
+
+    <spool>/incoming/<job id>.json - the jobs waiting for the worker
+    <spool>/running/<job id>.json  - the jobs being executed
+    <spool>/done/<job id>.json     - the job results
+    <spool>/status.json            - the worker status
+
+The job is the host dictionary in the same format as the fleet inventory entry. The jobs are
+executed in the submission order. The spool directory is owned by a single worker process,
+so the jobs left in the running directory by the stopped worker are queued again on start.
+
+The plugin manifest and the plugin code are loaded only once by the worker. The device connection
+is kept open after the job for the idle timeout and reused by the next job for the same device,
+so no login and device discovery is needed. The device session log stays in the log directory
+of the job which opened the connection.
+"""
+
+import BaseHTTPServer
+import json
+import os
+import SocketServer
+import threading
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+from time import time
+from uuid import uuid4
+
+from fleet import InventoryError, THREAD_STACK_SIZE, cancel_all, normalize_host, run_host
+from utils import make_dirs, read_json, write_json
+
+INCOMING = "incoming"
+RUNNING = "running"
+DONE = "done"
+STATUS_FILENAME = "status.json"
+
+IDLE_TIMEOUT = 300
+POLL_INTERVAL = 1
+
+
+def submit_job(spool_dir, job):
+    """
+    Stores the job in the spool directory and returns the job id.
+    """
+    job_id = "{}-{}".format(datetime.utcnow().strftime("%Y%m%d%H%M%S%f"), uuid4().hex[:8])
+    if not write_json(os.path.join(spool_dir, INCOMING, "{}.json".format(job_id)), job):
+        raise IOError("Unable to store the job in the spool directory: {}".format(spool_dir))
+    return job_id
+
+
+def _disconnect(ctx):
+    try:
+        ctx.disconnect()
+    except Exception:
+        pass
+    ctx._close_logging()
+
+
+class WarmConnections(object):
+    """
+    The connected plugin contexts kept between the jobs. The context is used by a single job
+    at a time and it is disconnected when not used for the idle timeout.
+    """
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._contexts = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._contexts)
+
+    @staticmethod
+    def _key(host):
+        return json.dumps([host['hostname'], host['urls']])
+
+    def take(self, host):
+        """
+        Returns the connected context for the host or None. The context must be put back after use.
+        """
+        with self._lock:
+            item = self._contexts.pop(self._key(host), None)
+        return item[0] if item else None
+
+    def put(self, host, ctx):
+        if self.idle_timeout <= 0 or not ctx.is_connected:
+            _disconnect(ctx)
+            return
+
+        # the idle context does not log, so the log file of the finished job is closed
+        ctx._close_logging()
+        with self._lock:
+            previous = self._contexts.pop(self._key(host), None)
+            self._contexts[self._key(host)] = (ctx, time())
+        if previous:
+            _disconnect(previous[0])
+
+    def expire(self, now=None):
+        """
+        Disconnects the contexts not used for the idle timeout. Returns the number of disconnected contexts.
+        """
+        now = time() if now is None else now
+        with self._lock:
+            keys = [key for key, (_, last_used) in self._contexts.items() if now - last_used >= self.idle_timeout]
+            expired = [self._contexts.pop(key)[0] for key in keys]
+        for ctx in expired:
+            _disconnect(ctx)
+        return len(expired)
+
+    def close(self):
+        with self._lock:
+            contexts, self._contexts = self._contexts, {}
+        for ctx, _ in contexts.values():
+            _disconnect(ctx)
+
+    def hostnames(self):
+        with self._lock:
+            return sorted(json.loads(key)[0] for key in self._contexts)
+
+
+class Server(object):
+    """
+    Executes the jobs from the spool directory in the pool of worker threads.
+    """
+    def __init__(self, spool_dir, log_dir, workers=4, idle_timeout=IDLE_TIMEOUT, options=None,
+                 poll_interval=POLL_INTERVAL):
+        self.spool_dir = spool_dir
+        self.log_dir = log_dir
+        self.workers = max(workers, 1)
+        self.options = options or {}
+        self.poll_interval = poll_interval
+        self.connections = WarmConnections(idle_timeout)
+        self._running = {}
+        self._finished = 0
+        self._failed = 0
+        self._started = time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        for directory in [INCOMING, RUNNING, DONE]:
+            make_dirs(os.path.join(spool_dir, directory))
+
+    def _path(self, directory, job_id):
+        return os.path.join(self.spool_dir, directory, "{}.json".format(job_id))
+
+    def _job_ids(self, directory):
+        names = os.listdir(os.path.join(self.spool_dir, directory))
+        return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+    def pending(self):
+        return self._job_ids(INCOMING)
+
+    def requeue(self):
+        """
+        Moves the jobs left in the running directory back to the incoming directory.
+        Returns the number of jobs moved.
+        """
+        job_ids = self._job_ids(RUNNING)
+        for job_id in job_ids:
+            os.rename(self._path(RUNNING, job_id), self._path(INCOMING, job_id))
+        return len(job_ids)
+
+    def claim(self):
+        """
+        Moves the oldest pending job to the running directory and returns its id or None if no job is pending.
+        """
+        for job_id in self.pending():
+            try:
+                os.rename(self._path(INCOMING, job_id), self._path(RUNNING, job_id))
+            except OSError:
+                continue
+            return job_id
+        return None
+
+    def result(self, job_id):
+        """
+        Returns the result of the finished job or None.
+        """
+        if os.path.basename(job_id) != job_id or job_id.startswith("."):
+            return None
+        return read_json(self._path(DONE, job_id))
+
+    def _execute(self, host):
+        return run_host(host, self.log_dir, self.options, connections=self.connections)
+
+    def run_job(self, job_id):
+        """
+        Executes the running job and stores the result in the done directory.
+        """
+        path = self._path(RUNNING, job_id)
+        result = None
+        # the worker slot is released even if the job could not be executed
+        try:
+            job = read_json(path)
+            try:
+                host = normalize_host(job)
+                if not host['phase']:
+                    raise InventoryError("Job has no phase defined")
+            except InventoryError as e:
+                hostname = job.get('hostname') if isinstance(job, dict) else None
+                result = {'hostname': hostname, 'success': False, 'error': str(e), 'results': [], 'duration': 0}
+            else:
+                result = self._execute(host)
+
+            result['job_id'] = job_id
+            result['job'] = job
+            result['finished'] = time()
+            write_json(self._path(DONE, job_id), result)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return result
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+                self._finished += 1
+                if result is None or not result['success']:
+                    self._failed += 1
+            self.write_status()
+
+    def status(self):
+        with self._lock:
+            running = sorted(self._running)
+            finished, failed = self._finished, self._failed
+        return {
+            'pid': os.getpid(),
+            'started': self._started,
+            'uptime': time() - self._started,
+            'workers': self.workers,
+            'pending': len(self.pending()),
+            'running': running,
+            'finished': finished,
+            'failed': failed,
+            'connections': self.connections.hostnames(),
+            'idle_timeout': self.connections.idle_timeout,
+        }
+
+    def write_status(self):
+        return write_json(os.path.join(self.spool_dir, STATUS_FILENAME), self.status())
+
+    def poll(self, pool):
+        """
+        Starts the pending jobs on the free workers. Returns the number of jobs started.
+        """
+        started = 0
+        while len(self._running) < self.workers:
+            job_id = self.claim()
+            if job_id is None:
+                break
+            with self._lock:
+                self._running[job_id] = time()
+            pool.apply_async(self.run_job, (job_id,))
+            started += 1
+        return started
+
+    def serve_forever(self):
+        """
+        Executes the jobs until stopped. The plugins being executed are cancelled on KeyboardInterrupt.
+        """
+        previous = threading.stack_size(THREAD_STACK_SIZE)
+        try:
+            pool = ThreadPool(self.workers)
+        finally:
+            threading.stack_size(previous)
+
+        self.requeue()
+        try:
+            while not self._stop.is_set():
+                self.poll(pool)
+                self.connections.expire()
+                self.write_status()
+                self._stop.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            cancel_all()
+            raise
+        finally:
+            self._stop.set()
+            pool.close()
+            pool.join()
+            self.connections.close()
+            self.write_status()
+
+    def stop(self):
+        self._stop.set()
+
+
+class StatusHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serves the worker status on /status and the job results on /jobs/<job id>.
+    """
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path in ["", "/status"]:
+            data = self.server.worker.status()
+        elif path.startswith("/jobs/"):
+            data = self.server.worker.result(path[len("/jobs/"):])
+        else:
+            data = None
+
+        if data is None:
+            self.send_error(404)
+            return
+
+        body = json.dumps(data, indent=1, sort_keys=True)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # the requests are not logged to the console
+        pass
+
+
+class StatusServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def start_status_server(worker, port, address="127.0.0.1"):
+    """
+    Starts the HTTP status endpoint of the worker in the background thread and returns the HTTP server.
+    """
+    httpd = StatusServer((address, port), StatusHandler)
+    httpd.worker = worker
+    thread = threading.Thread(target=httpd.serve_forever, name="status-server")
+    thread.daemon = True
+    thread.start()
+    return httpd
@@ -0,0 +1,219 @@
+# =============================================================================
+# Session Pool
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The pool of the sessions to a single device. The first session is the main plugin context connection.
+The additional sessions are opened on demand up to the pool size reusing the device discovery result.
+"""
+
+import Queue
+import threading
+from contextlib import contextmanager
+
+from scheduler import run_graph
+
+
+class SessionPool(object):
+    def __init__(self, ctx, size=1):
+        self._ctx = ctx
+        self.size = max(size, 1)
+        self._sessions = [ctx]
+        self._idle = [ctx]
+        self._opening = 0
+        self._opened = 1
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def acquire(self, block=True, session=None):
+        """
+        Returns the idle session marking it busy. The new session is opened if no session is idle
+        and the pool is not full.
+
+        :param block: If False None is returned instead of waiting for the idle session
+        :param session: The specific session to acquire
+        :return: The plugin context of the session or None
+        """
+        with self._condition:
+            while True:
+                if session is not None:
+                    if session in self._idle:
+                        self._idle.remove(session)
+                        return session
+                elif self._idle:
+                    return self._idle.pop(0)
+                elif len(self._sessions) + self._opening < self.size:
+                    self._opening += 1
+                    self._opened += 1
+                    session_id = self._opened
+                    break
+                if not block:
+                    return None
+                # the timeout keeps the waiting thread responsive to KeyboardInterrupt
+                self._condition.wait(1)
+
+        # the session is opened outside of the lock, so the other sessions can be leased in the meantime
+        try:
+            new_session = self._ctx.clone(session_id)
+        finally:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify_all()
+        with self._condition:
+            self._sessions.append(new_session)
+        return new_session
+
+    def release(self, session):
+        with self._condition:
+            self._idle.append(session)
+            self._condition.notify_all()
+
+    @contextmanager
+    def lease(self, block=True, session=None):
+        """
+        The context manager acquiring and releasing the session::
+
+            with ctx.sessions.lease() as session:
+                output = session.send("show version")
+        """
+        session = self.acquire(block=block, session=session)
+        try:
+            yield session
+        finally:
+            if session is not None:
+                self.release(session)
+
+    def map(self, ctx, func, items):
+        """
+        Calls func(session, item) for each item using the ctx session and the idle sessions from the pool,
+        so the items are processed concurrently if the pool allows. The log records of each item
+        are written by ctx in the item order when all items are finished.
+
+        :return: The list of the results in the item order. The exception of the first failed item
+            is re-raised. No new items are started after the failure.
+        """
+        available = Queue.Queue()
+        available.put(ctx)
+        # the ctx session is normally held by the caller already
+        leased = [session for session in [self.acquire(block=False, session=ctx)] if session is not None]
+        records = {}
+
+        def run(position):
+            try:
+                session = available.get_nowait()
+            except Queue.Empty:
+                session = self.acquire(block=False)
+                if session is None:
+                    session = available.get()
+                else:
+                    leased.append(session)
+                    session.current_plugin = ctx.current_plugin
+
+            previous = session.start_log_buffer()
+            try:
+                return func(session, items[position])
+            finally:
+                records[position] = session.stop_log_buffer(previous)
+                available.put(session)
+
+        try:
+            return run_graph([set()] * len(items), run, min(self.size, len(items)))
+        finally:
+            for session in leased:
+                self.release(session)
+            for position in sorted(records):
+                ctx.replay_log(records[position])
+
+    def close(self):
+        """
+        Disconnects the additional sessions. The main session is not disconnected.
+        """
+        with self._condition:
+            sessions, self._sessions = self._sessions[1:], self._sessions[:1]
+            self._idle = [session for session in self._idle if session not in sessions]
+        for session in sessions:
+            try:
+                session.disconnect()
+            except Exception as e:
+                self._ctx.warning("Session disconnect failed: {}".format(e))
+
+
+class AdminSession(object):
+    """
+    The session kept in the admin (Calvados) mode for the whole plugin execution, so the admin commands
+    do not switch the mode of the main session back and forth. If the additional session can not be opened,
+    i.e. the device is connected over the console, the admin mode is toggled on the calling session.
+    """
+    def __init__(self, ctx, enabled=True):
+        self._ctx = ctx
+        self.enabled = enabled
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._ctx._connection.is_console:
+            # the console does not allow the second session
+            self.enabled = False
+            return None
+        try:
+            session = self._ctx.clone("admin")
+            session._connection.send("admin")
+        except Exception as e:
+            self._ctx.warning("Unable to open the admin session. Switching the admin mode instead: {}".format(e))
+            self.enabled = False
+            return None
+        self._ctx.info("Admin session opened")
+        return session
+
+    def send(self, ctx, cmd, timeout=300, wait_for_string=None, **kwargs):
+        """
+        Sends the command in the admin mode and returns the output.
+        """
+        with self._lock:
+            if self._session is None and self.enabled:
+                self._session = self._open()
+            if self._session is not None:
+                return self._session._connection.send(cmd, timeout=timeout, wait_for_string=wait_for_string, **kwargs)
+
+        ctx._connection.send("admin")
+        try:
+            return ctx._connection.send(cmd, timeout=timeout, wait_for_string=wait_for_string, **kwargs)
+        finally:
+            ctx._connection.send("exit")
+
+    def close(self):
+        """
+        Disconnects the admin session. The session is opened again on the next command.
+        """
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            try:
+                session.disconnect()
+            except Exception as e:
+                self._ctx.warning("Admin session disconnect failed: {}".format(e))
@@ -0,0 +1,114 @@
+# =============================================================================
+# Step Statistics
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The durations of the long running steps (i.e. image copy, FPD upgrade) observed on the devices.
+The durations are kept per step name, platform and software release in the SQLite database in the cache
+directory. The timeouts and the initial poll delays of the consecutive runs are derived from them,
+and the static values are used until enough durations are recorded.
+"""
+
+import math
+import os
+from time import time
+
+from storage import SQLiteDatabase
+from utils import get_cache_dir
+
+STATS_FILENAME = "step_stats.sqlite"
+
+# The number of the durations needed before the learned values are used
+MIN_SAMPLES = 5
+# The number of the most recent durations the learned values are derived from
+MAX_SAMPLES = 100
+# The learned timeout is the 95th percentile of the durations multiplied by the safety factor
+SAFETY_FACTOR = 2.0
+MIN_TIMEOUT = 60
+
+
+def get_stats_path(cache_dir=None):
+    return os.path.join(cache_dir or get_cache_dir(), STATS_FILENAME)
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest rank percentile of the values, i.e. fraction 0.95 is the 95th percentile.
+    """
+    values = sorted(values)
+    rank = max(int(math.ceil(fraction * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class StepStats(SQLiteDatabase):
+    """
+    The durations of the steps. The durations for the platform and release are used if there are enough
+    of them, otherwise the durations for the platform regardless of the release.
+    """
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS durations ("
+        "step TEXT NOT NULL, platform TEXT, release TEXT, duration REAL NOT NULL, timestamp REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS durations_step ON durations (step, platform, release, timestamp)",
+    ]
+
+    def record(self, step, platform, release, duration):
+        with self._connection as connection:
+            connection.execute("INSERT INTO durations (step, platform, release, duration, timestamp) "
+                               "VALUES (?, ?, ?, ?, ?)", (step, platform, release, duration, time()))
+
+    def durations(self, step, platform, release=None):
+        """
+        Returns the list of the most recent durations of the step.
+        """
+        if release is not None:
+            rows = self._connection.execute(
+                "SELECT duration FROM durations WHERE step = ? AND platform = ? AND release = ? "
+                "ORDER BY timestamp DESC LIMIT ?", (step, platform, release, MAX_SAMPLES)).fetchall()
+            if len(rows) >= MIN_SAMPLES:
+                return [duration for duration, in rows]
+        rows = self._connection.execute(
+            "SELECT duration FROM durations WHERE step = ? AND platform = ? "
+            "ORDER BY timestamp DESC LIMIT ?", (step, platform, MAX_SAMPLES)).fetchall()
+        return [duration for duration, in rows]
+
+    def timeout(self, step, platform, release, default, factor=SAFETY_FACTOR):
+        """
+        Returns the timeout of the step learned from the recorded durations or default.
+        """
+        durations = self.durations(step, platform, release)
+        if len(durations) < MIN_SAMPLES:
+            return default
+        return max(int(percentile(durations, 0.95) * factor), MIN_TIMEOUT)
+
+    def poll_delay(self, step, platform, release, default):
+        """
+        Returns the time after which the step is likely finished, which is the median
+        of the recorded durations, or default.
+        """
+        durations = self.durations(step, platform, release)
+        if len(durations) < MIN_SAMPLES:
+            return default
+        return int(percentile(durations, 0.5))
@@ -0,0 +1,188 @@
+# =============================================================================
+# Storage
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+The storage backends of InstallContext.save_data and load_data. The data is namespaced per host,
+so the same key saved for different devices never collides.
+"""
+
+import cPickle as pickle
+import os
+import sqlite3
+import threading
+from time import time
+
+from utils import make_dirs
+
+
+class MemoryStorage(object):
+    """
+    Keeps the data in the process memory. The data is lost when the process exits.
+    """
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, host, key, default=None):
+        with self._lock:
+            value, timestamp = self._data.get(host, {}).get(key, (default, None))
+        return value
+
+    def put(self, host, key, value):
+        self.put_many(host, {key: value})
+
+    def get_many(self, host, keys=None):
+        """
+        Returns the key -> value dictionary of the keys stored for the host. If keys is None
+        all the keys of the host are returned.
+        """
+        with self._lock:
+            data = self._data.get(host, {})
+            if keys is None:
+                keys = data.keys()
+            return {key: data[key][0] for key in keys if key in data}
+
+    def put_many(self, host, items):
+        timestamp = time()
+        with self._lock:
+            data = self._data.setdefault(host, {})
+            for key, value in items.items():
+                data[key] = (value, timestamp)
+
+    def delete(self, host, key=None):
+        """
+        Deletes the key of the host or all the host data if key is None.
+        """
+        with self._lock:
+            if key is None:
+                self._data.pop(host, None)
+            else:
+                self._data.get(host, {}).pop(key, None)
+
+    def close(self):
+        pass
+
+
+class SQLiteDatabase(object):
+    """
+    The SQLite database file used by many processes and threads at the same time.
+    Each thread uses its own database connection. The SCHEMA statements are executed on open.
+    """
+    SCHEMA = []
+
+    def __init__(self, path, timeout=60):
+        directory = os.path.dirname(path)
+        if directory:
+            make_dirs(directory)
+        self._path = path
+        self._timeout = timeout
+        self._local = threading.local()
+        with self._connection as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=self._timeout)
+            connection.text_factory = str
+            # the readers do not block the writer
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class SQLiteStorage(SQLiteDatabase):
+    """
+    Keeps the data in the SQLite database file.
+    """
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS data ("
+        "host TEXT NOT NULL, key TEXT NOT NULL, value BLOB, timestamp REAL NOT NULL, "
+        "PRIMARY KEY (host, key))",
+        "CREATE INDEX IF NOT EXISTS data_timestamp ON data (host, timestamp)",
+    ]
+
+    def get(self, host, key, default=None):
+        return self.get_many(host, [key]).get(key, default)
+
+    def put(self, host, key, value):
+        self.put_many(host, {key: value})
+
+    def get_many(self, host, keys=None):
+        """
+        Returns the key -> value dictionary of the keys stored for the host. If keys is None
+        all the keys of the host are returned.
+        """
+        if keys is None:
+            rows = self._connection.execute("SELECT key, value FROM data WHERE host = ?", (host,))
+        else:
+            keys = list(keys)
+            if not keys:
+                return {}
+            rows = self._connection.execute(
+                "SELECT key, value FROM data WHERE host = ? AND key IN ({})".format(", ".join("?" * len(keys))),
+                [host] + keys)
+        return {key: pickle.loads(str(value)) for key, value in rows}
+
+    def put_many(self, host, items):
+        """
+        Stores the key -> value dictionary for the host in a single transaction.
+        """
+        timestamp = time()
+        rows = [(host, key, sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)), timestamp)
+                for key, value in items.items()]
+        with self._connection as connection:
+            connection.executemany("INSERT OR REPLACE INTO data (host, key, value, timestamp) VALUES (?, ?, ?, ?)",
+                                   rows)
+
+    def delete(self, host, key=None):
+        """
+        Deletes the key of the host or all the host data if key is None.
+        """
+        with self._connection as connection:
+            if key is None:
+                connection.execute("DELETE FROM data WHERE host = ?", (host,))
+            else:
+                connection.execute("DELETE FROM data WHERE host = ? AND key = ?", (host, key))
+
+
+def get_storage(location=None):
+    """
+    Returns the storage backend. None or 'memory' is the in memory storage
+    otherwise location is the path of the SQLite database file.
+    """
+    if location in (None, "memory"):
+        return MemoryStorage()
+    return SQLiteStorage(location)
@@ -0,0 +1,159 @@
+# =============================================================================
+# Output Streaming
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""
+Streams the command output from the device session to the file as it arrives, so the large outputs
+(i.e. show running-config) are never kept in memory as a whole.
+"""
+
+import hashlib
+from collections import namedtuple
+from time import time
+
+CHUNK_SIZE = 65536
+READ_TIMEOUT = 5
+# The number of characters kept in the buffer to detect the prompt split between the chunks
+HOLDBACK = 512
+
+
+# The connected session of the device the output is streamed from
+StreamingSession = namedtuple("StreamingSession", "ctrl send_command prompt_re more_re syntax_re disconnect")
+
+
+class OutputSyntaxError(Exception):
+    pass
+
+
+class OutputStartError(Exception):
+    """The output does not contain the start marker"""
+    pass
+
+
+class OutputWriter(object):
+    """
+    Writes the output to the file object and calculates the output summary.
+    """
+    def __init__(self, fd):
+        self._fd = fd
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        self.lines = 0
+
+    def write(self, data):
+        if data:
+            self._fd.write(data)
+            self._sha256.update(data)
+            self.size += len(data)
+            self.lines += data.count("\n")
+
+    @property
+    def summary(self):
+        return {'size': self.size, 'lines': self.lines, 'sha256': self._sha256.hexdigest()}
+
+
+def _find_prompt(prompt_re, buf, offset):
+    """
+    Returns the position of the prompt if the buffer ends with the prompt otherwise None.
+    """
+    position = None
+    for match in prompt_re.finditer(buf, offset):
+        position = match.start() if not buf[match.end():].strip() else None
+    return position
+
+
+def stream_output(ctrl, fd, prompt_re, timeout=60, more_re=None, syntax_re=None, start_at=None, cmd=None):
+    """
+    Reads the command output from the session controller and writes it to fd until the prompt is received.
+
+    :param ctrl: The session controller providing read_nonblocking(size, timeout) and send(string)
+    :param fd: The file object the output is written to
+    :param prompt_re: The compiled regular expression of the device prompt ending the output
+    :param timeout: The maximum time in seconds for the whole output
+    :param more_re: The compiled regular expression of the pager prompt answered with space
+    :param syntax_re: The compiled regular expression of the command syntax error at the beginning of the output
+    :param start_at: If provided the output starts from the first line containing this string
+    :param cmd: If provided the first line echoing the command is not written
+    :return: The dictionary with the size, number of lines and sha256 hash of the written output
+    :raises OutputSyntaxError: if the device rejected the command
+    :raises OutputStartError: if the output does not contain start_at
+    :raises pexpect.TIMEOUT: if the prompt is not received within timeout
+    :raises pexpect.EOF: if the session is disconnected
+    """
+    # imported here, as the session library is not needed unless connected
+    import pexpect
+
+    writer = OutputWriter(fd)
+    deadline = time() + timeout
+    started = start_at is None
+    echo = cmd.strip() if cmd else None
+    buf = ""
+
+    while True:
+        remaining = deadline - time()
+        if remaining <= 0:
+            raise pexpect.TIMEOUT("Timeout waiting for prompt")
+        try:
+            chunk = ctrl.read_nonblocking(CHUNK_SIZE, min(READ_TIMEOUT, remaining))
+        except pexpect.TIMEOUT:
+            continue
+
+        buf += chunk.replace("\r", "")
+        if echo:
+            index = buf.find("\n")
+            if index < 0:
+                # the whole echo line is needed
+                continue
+            if echo in buf[:index]:
+                buf = buf[index + 1:]
+            echo = None
+
+        if more_re is not None:
+            match = more_re.search(buf)
+            if match:
+                buf = buf[:match.start()] + buf[match.end():]
+                ctrl.send(" ")
+
+        if syntax_re is not None and writer.size == 0 and syntax_re.search(buf):
+            raise OutputSyntaxError(buf)
+
+        if not started:
+            index = buf.find(start_at)
+            if index >= 0:
+                started = True
+                buf = buf[buf.rfind("\n", 0, index) + 1:]
+
+        offset = max(len(buf) - HOLDBACK, 0)
+        end = _find_prompt(prompt_re, buf, offset)
+        if end is not None:
+            if not started:
+                raise OutputStartError(start_at)
+            writer.write(buf[:end])
+            return writer.summary
+
+        if started:
+            writer.write(buf[:offset])
+        buf = buf[offset:]
@@ -0,0 +1,83 @@
+# =============================================================================
+# utils
+#
+# Copyright (c)  2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import json
+import os
+import threading
+
+CACHE_DIR_ENV = "CSMPE_CACHE_DIR"
+
+
+def get_cache_dir():
+    """
+    Returns the directory where the plugin engine keeps the data persisted between runs.
+    The CSMPE_CACHE_DIR environment variable overrides the default ~/.csmpe directory.
+    """
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.expanduser("~"), ".csmpe")
+
+
+def make_dirs(directory):
+    """
+    Creates the directory including the intermediate ones. Returns True if the directory exists.
+    """
+    try:
+        os.makedirs(directory)
+    except OSError:
+        # Other process could create it in the meantime
+        pass
+    return os.path.isdir(directory)
+
+
+def read_json(path):
+    """
+    Loads the JSON document from path. Returns None if the file does not exist or is corrupted.
+    """
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_json(path, data):
+    """
+    Writes the JSON document to path. The data is written to the temporary file first and then
+    renamed, so the concurrent readers never see the partially written file.
+    Returns True if successful otherwise False.
+    """
+    directory = os.path.dirname(path)
+    if directory and not make_dirs(directory):
+        return False
+
+    tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.current_thread().ident)
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        return False
+    return True
@@ -29,7 +29,7 @@
 
 from setuptools import setup, find_packages
 import re
-from uuid import uuid4
+from uuid import UUID, uuid5
 
 
 install_requires = [
@@ -42,6 +42,15 @@ install_requires = [
 ]
 
 
+# The namespace of the plugin identifiers. Must be the same as csmpe.manifest.PLUGIN_ID_NAMESPACE
+PLUGIN_ID_NAMESPACE = UUID('506cf106-ad92-402c-a1ad-6ec84048866a')
+
+
+def plugin(target):
+    """Returns the csm.plugin entry point for target (module:class) named by the stable plugin identifier."""
+    return '{} = {}'.format(uuid5(PLUGIN_ID_NAMESPACE, target), target)
+
+
 def version():
     pyfile = 'csmpe/__init__.py'
     with open(pyfile) as fp:
@@ -66,67 +75,67 @@ setup(
             'csmpe = csmpe.__main__:cli',
         ],
         'csm.plugin': [
-            '{} = csmpe.core_plugins.csm_get_inventory.ios_xr.plugin:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_get_inventory.ios_xe.plugin:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_get_inventory.nx_os.plugin:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_get_inventory.exr.plugin:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_config_capture.plugin:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_custom_commands_capture.plugin:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_failed_config_startup_check.ios_xr.plugin:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_check_config_filesystem.ios_xr.plugin:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_node_status_check.ios_xr.plugin:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_node_status_check.exr.plugin:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_node_status_check.ios_xe.plugin:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_redundancy_check.ios_xr.plugin:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_redundancy_check.ios_xe.plugin:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_error_core_check.ios_xr.plugin:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_check_isis_neighbors.ios_xr.plugin:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_filesystem_check.ios_xr.disk_space_check:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_filesystem_check.ios_xr.filesystem_rw_check:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.basic:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.issu:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.su:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.oir:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.negative:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.add:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.activate:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.commit:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.deactivate:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.remove:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.hardware_audit:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.pre_migrate:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.migrate:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xr.post_migrate:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_install_operations.exr.basic:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.issu:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.su:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.oir:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.negative:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.add:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.activate:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.commit:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.deactivate:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.exr.remove:Plugin'.format(uuid4()),
-
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.basic:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.issu:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.su:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.oir:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.negative:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.add:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.pre_activate:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.activate:Plugin'.format(uuid4()),
-            '{} = csmpe.core_plugins.csm_install_operations.ios_xe.remove:Plugin'.format(uuid4()),
+            plugin('csmpe.core_plugins.csm_get_inventory.ios_xr.plugin:Plugin'),
+            plugin('csmpe.core_plugins.csm_get_inventory.ios_xe.plugin:Plugin'),
+            plugin('csmpe.core_plugins.csm_get_inventory.nx_os.plugin:Plugin'),
+            plugin('csmpe.core_plugins.csm_get_inventory.exr.plugin:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_config_capture.plugin:Plugin'),
+            plugin('csmpe.core_plugins.csm_custom_commands_capture.plugin:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_failed_config_startup_check.ios_xr.plugin:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_check_config_filesystem.ios_xr.plugin:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_node_status_check.ios_xr.plugin:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_node_status_check.exr.plugin:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_node_status_check.ios_xe.plugin:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_redundancy_check.ios_xr.plugin:Plugin'),
+            plugin('csmpe.core_plugins.csm_redundancy_check.ios_xe.plugin:Plugin'),
+            plugin('csmpe.core_plugins.csm_error_core_check.ios_xr.plugin:Plugin'),
+            plugin('csmpe.core_plugins.csm_check_isis_neighbors.ios_xr.plugin:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_filesystem_check.ios_xr.disk_space_check:Plugin'),
+            plugin('csmpe.core_plugins.csm_filesystem_check.ios_xr.filesystem_rw_check:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.basic:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.issu:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.su:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.oir:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.negative:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.add:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.activate:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.commit:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.deactivate:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.remove:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.hardware_audit:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.pre_migrate:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.migrate:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xr.post_migrate:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_install_operations.exr.basic:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.issu:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.su:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.oir:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.negative:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.add:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.activate:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.commit:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.deactivate:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.exr.remove:Plugin'),
+
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.basic:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.issu:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.su:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.oir:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.negative:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.add:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.pre_activate:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.activate:Plugin'),
+            plugin('csmpe.core_plugins.csm_install_operations.ios_xe.remove:Plugin'),
         ],
     },
     classifiers=[
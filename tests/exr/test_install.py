@@ -0,0 +1,273 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import json
+import random
+import re
+import threading
+import time
+from unittest import TestCase
+
+from csmpe.core_plugins.csm_install_operations.exr import install
+from csmpe.core_plugins.csm_install_operations.utils import INSTALL_OPERATION_KEY
+
+
+class PluginError(Exception):
+    pass
+
+
+class Controller(object):
+    def __init__(self, before):
+        self.before = before
+
+
+class FSMContext(object):
+    def __init__(self, before):
+        self.ctrl = Controller(before)
+
+
+class DeviceContext(object):
+    """
+    The simulated device. The install operation started by the command either continues
+    in the background and finishes successfully or is aborted.
+    """
+    CommandTimeoutError = Exception
+
+    def __init__(self, name, op_id, aborted=False):
+        self.name = name
+        self.op_id = op_id
+        self.aborted = aborted
+        self.messages = []
+        self.phase = "Activate"
+        self.resume = False
+        self.data = {}
+        self.flushed = {}
+
+    def save_data(self, key, value):
+        self.data[key] = value
+
+    def load_data(self, key):
+        if key not in self.flushed:
+            # as PluginContext returns the key never stored in the CSM storage
+            return (None, None), None
+        return self.flushed[key], None
+
+    def flush_data(self):
+        self.flushed.update(self.data)
+
+    def _yield(self):
+        # give the other threads the chance to run in the middle of the operation
+        time.sleep(random.random() / 1000)
+
+    def run_fsm(self, name, cmd, events, transitions, timeout):
+        self._yield()
+        before = "{}\nInstall operation {} started by root:\n".format(cmd, self.op_id)
+        event = "aborted" if self.aborted else "Install operation will continue in the background"
+        for pattern, states, next_state, callback, event_timeout in transitions:
+            if pattern.search(event):
+                return callback(FSMContext(before))
+        return False
+
+    def send(self, cmd, timeout=60, wait_for_string=None, cache=True):
+        self._yield()
+        if wait_for_string:
+            return wait_for_string
+        if cmd == "show install request":
+            return "No install operation in progress"
+        match = re.match(r"show install log (\d+) detail", cmd)
+        if match:
+            state = "aborted" if self.aborted else "finished successfully"
+            return "Install operation {} {}".format(match.group(1), state)
+        return ""
+
+    def sleep(self, seconds):
+        self._yield()
+
+    def info(self, message):
+        self.messages.append(message)
+
+    def warning(self, message):
+        self.messages.append(message)
+
+    def post_status(self, message):
+        pass
+
+    def error(self, message):
+        self.messages.append(message)
+        raise PluginError(message)
+
+
+class TestActivateDeactivateReentrant(TestCase):
+    def test_concurrent_devices(self):
+        devices = [DeviceContext("R{}".format(n), op_id=str(100 + n), aborted=n % 3 == 0) for n in range(50)]
+        errors = {}
+
+        def worker(device):
+            try:
+                install.install_activate_deactivate(device, "install activate id {}".format(device.op_id))
+            except PluginError as e:
+                errors[device.name] = str(e)
+
+        threads = [threading.Thread(target=worker, args=(device,)) for device in devices]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for device in devices:
+            if device.aborted:
+                self.assertEqual(errors.get(device.name), "Operation {} failed".format(device.op_id))
+            else:
+                self.assertNotIn(device.name, errors)
+                self.assertIn("Operation {} finished successfully".format(device.op_id), device.messages)
+            # no messages of the other devices
+            for message in device.messages:
+                for op_id in re.findall(r"\d+", message):
+                    self.assertEqual(op_id, device.op_id)
+
+
+class CommandTimeoutError(Exception):
+    pass
+
+
+class ProgressDeviceContext(DeviceContext):
+    """
+    The simulated device reporting the install progress for each poll. The completion message
+    is printed after the last progress report.
+    """
+    CommandTimeoutError = CommandTimeoutError
+
+    def __init__(self, progress, message=True):
+        DeviceContext.__init__(self, "R1", "17")
+        self.progress = list(progress)
+        self.message = message
+        self.waits = []
+        self.commands = []
+        self.files = {}
+
+    def send(self, cmd, timeout=60, wait_for_string=None, cache=True):
+        if wait_for_string:
+            self.waits.append(timeout)
+            if self.progress or not self.message:
+                raise CommandTimeoutError("Timeout waiting for string")
+            return ""
+        self.commands.append(cmd)
+        if cmd == "show install request":
+            if not self.progress:
+                return "No install operation in progress"
+            return "The install add operation 17 is {}% complete".format(self.progress.pop(0))
+        return DeviceContext.send(self, cmd, timeout)
+
+    def save_to_file(self, name, data, extension=".txt"):
+        self.files[name + extension] = data
+        return name
+
+
+class TestWatchOperation(TestCase):
+    def test_completion_message(self):
+        device = ProgressDeviceContext([0, 0, 0, 50])
+        install.watch_operation(device, "17")
+        self.assertEqual(device.waits, [5, 5, 10, 20, 5])
+        self.assertEqual(device.commands.count("show install request"), 4)
+        progress = json.loads(device.files["install_operation_17_progress.json"])
+        self.assertEqual([percent for _, percent in progress['timeline']], [0, 50])
+        self.assertIn("Operation 17 finished successfully", device.messages)
+
+    def test_no_operation_in_progress(self):
+        device = ProgressDeviceContext([30, 60], message=False)
+        install.watch_operation(device, "17")
+        self.assertEqual(device.commands.count("show install request"), 3)
+        self.assertIn("Operation 17 finished successfully", device.messages)
+
+    def test_next_wait(self):
+        self.assertEqual(install.next_watch_wait([], 5, False), 10)
+        self.assertEqual(install.next_watch_wait([(0, 0)], 40, False), install.WATCH_MAX_WAIT)
+        self.assertEqual(install.next_watch_wait([(0, 0)], 5, True), 5)
+        # 10% per 10 seconds, so 80 seconds remaining
+        self.assertEqual(install.next_watch_wait([(0, 10), (10, 20)], 5, True), 40)
+        self.assertEqual(install.next_watch_wait([(0, 10), (100, 20)], 5, True), install.WATCH_MAX_WAIT)
+        self.assertEqual(install.next_watch_wait([(0, 10), (1, 90)], 40, True), install.WATCH_MIN_WAIT)
+
+
+class ResumeDeviceContext(DeviceContext):
+    """
+    The simulated device restarted by the new run while the install operation stored by the previous run
+    is in progress or already finished.
+    """
+    def __init__(self, operation, in_progress=False):
+        DeviceContext.__init__(self, "R1", operation['op_id'])
+        self.resume = True
+        self.flushed = {INSTALL_OPERATION_KEY: operation}
+        self.in_progress = in_progress
+        self.commands = []
+
+    def run_fsm(self, name, cmd, events, transitions, timeout):
+        self.commands.append(cmd)
+        return DeviceContext.run_fsm(self, name, cmd, events, transitions, timeout)
+
+    def send(self, cmd, timeout=60, wait_for_string=None, cache=True):
+        if not wait_for_string:
+            self.commands.append(cmd)
+        if cmd == "show install request" and self.in_progress:
+            self.in_progress = False
+            return "The install operation {} is 50% complete".format(self.op_id)
+        return DeviceContext.send(self, cmd, timeout, wait_for_string)
+
+
+class TestResumeOperation(TestCase):
+    operation = {'op_id': '17', 'command': 'install activate id 16', 'phase': 'Activate', 'reload': False}
+
+    def test_operation_stored_and_cleared(self):
+        device = DeviceContext("R1", "17")
+        install.install_activate_deactivate(device, "install activate id 16")
+        self.assertEqual(device.data, {INSTALL_OPERATION_KEY: None})
+        self.assertEqual(device.flushed, {INSTALL_OPERATION_KEY: None})
+
+    def test_finished_operation(self):
+        device = ResumeDeviceContext(self.operation)
+        install.install_activate_deactivate(device, "install activate id 16")
+        self.assertEqual(device.commands, ["show install request", "show install log 17 detail"])
+        self.assertIn("Operation 17 finished successfully", device.messages)
+        self.assertIsNone(device.flushed[INSTALL_OPERATION_KEY])
+
+    def test_operation_in_progress(self):
+        device = ResumeDeviceContext(self.operation, in_progress=True)
+        install.install_activate_deactivate(device, "install activate id 16")
+        self.assertNotIn("install activate id 16", device.commands)
+        self.assertIn("Operation 17 finished successfully", device.messages)
+
+    def test_other_phase(self):
+        device = ResumeDeviceContext(dict(self.operation, phase="Add"))
+        install.install_activate_deactivate(device, "install activate id 16")
+        self.assertEqual(device.commands[0], "install activate id 16")
+
+    def test_nothing_stored(self):
+        device = DeviceContext("R1", "17")
+        device.resume = True
+        install.install_activate_deactivate(device, "install activate id 16")
+        self.assertIn("No install operation to resume", device.messages)
+        self.assertIn("Operation 17 finished successfully", device.messages)
@@ -0,0 +1,116 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+from contextlib import contextmanager
+from unittest import TestCase
+
+import condoor
+
+from csmpe.core_plugins.csm_install_operations.ios_xr import install
+
+
+class PluginError(Exception):
+    pass
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class WatchContext(object):
+    """
+    The device with the install operation finished after finish_at seconds of the fake clock.
+    """
+    CommandTimeoutError = condoor.CommandTimeoutError
+
+    def __init__(self, clock, finish_at, learned=None):
+        self.clock = clock
+        self.start = clock.now
+        self.finish_at = finish_at
+        self.learned = learned
+        self.timeouts = []
+        self.recorded = []
+
+    def send(self, cmd, timeout=60, wait_for_string=None):
+        self.clock.now += 20
+        if wait_for_string is not None:
+            raise condoor.CommandTimeoutError("Command timeout", "R1", command=cmd)
+        if self.clock.now - self.start >= self.finish_at:
+            return "There are no install requests in operation."
+        return "Install operation 5 'install add' started\nThe operation is 10% complete"
+
+    def step_timeout(self, step, default):
+        self.timeouts.append((step, default))
+        return self.learned or default
+
+    @contextmanager
+    def timed_step(self, step):
+        yield
+        self.recorded.append(step)
+
+    def info(self, message):
+        pass
+
+    def post_status(self, message):
+        pass
+
+    def error(self, message):
+        raise PluginError(message)
+
+
+class TestWatchStep(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self._time = install.time
+        install.time = self.clock
+        self.step = install.install_step("admin install add source tftp://server/dir/ asr9k-px.pie")
+
+    def tearDown(self):
+        install.time = self._time
+
+    def test_operation_timed(self):
+        ctx = WatchContext(self.clock, finish_at=300)
+        install.watch_step(ctx, "5", self.step)
+        self.assertEqual(self.step, "admin install add operation")
+        self.assertEqual(ctx.timeouts, [(self.step, None)])
+        self.assertEqual(ctx.recorded, [self.step])
+
+    def test_learned_timeout(self):
+        ctx = WatchContext(self.clock, finish_at=3600, learned=600)
+        self.assertRaises(PluginError, install.watch_step, ctx, "5", self.step)
+        self.assertLess(self.clock.now - ctx.start, 700)
+        self.assertEqual(ctx.recorded, [])
+
+    def test_resumed_operation_not_timed(self):
+        ctx = WatchContext(self.clock, finish_at=300, learned=60)
+        install.watch_step(ctx, "5")
+        self.assertEqual(ctx.timeouts, [])
+        self.assertEqual(ctx.recorded, [])
@@ -0,0 +1,42 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+from unittest import TestCase
+
+from csmpe.core_plugins.csm_install_operations.ios_xr import migration_lib
+
+
+class TestParseMd5sum(TestCase):
+    def test_checksum(self):
+        output = ("md5sum /eusbb/backup_config/cXR_admin_plane_converted_eXR.cfg\n"
+                  "3b5d5c3712955042212316173ccf37be  /eusbb/backup_config/cXR_admin_plane_converted_eXR.cfg\n")
+        self.assertEqual(migration_lib.parse_md5sum(output), "3b5d5c3712955042212316173ccf37be")
+
+    def test_missing_file(self):
+        output = ("md5sum /eusbb/backup_config/cXR_admin_plane_converted_eXR.cfg\n"
+                  "md5sum: /eusbb/backup_config/cXR_admin_plane_converted_eXR.cfg: No such file or directory\n")
+        self.assertIsNone(migration_lib.parse_md5sum(output))
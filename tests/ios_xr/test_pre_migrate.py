@@ -0,0 +1,100 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import condoor
+
+from csmpe.core_plugins.csm_install_operations.ios_xr import pre_migrate
+
+
+COMMIT_LIST = """
+{}
+SNo. Label/ID              User      Line                Client      Time Stamp
+~~~~ ~~~~~~~~              ~~~~      ~~~~                ~~~~~~      ~~~~~~~~~~
+1    1000000123            cisco     vty0:node0_RSP0_CPU0 CLI         Mon May 16 10:00:00 2016
+"""
+
+
+class TestParseCommitIds(TestCase):
+    def test_time_ignored(self):
+        first = pre_migrate.parse_commit_ids(COMMIT_LIST.format("Tue May 17 09:56:43.720 UTC"))
+        second = pre_migrate.parse_commit_ids(COMMIT_LIST.format("Tue May 17 10:12:01.004 UTC"))
+        self.assertEqual(first, ["1000000123"])
+        self.assertEqual(first, second)
+
+    def test_no_commits(self):
+        self.assertEqual(pre_migrate.parse_commit_ids("Tue May 17 09:56:43.720 UTC\nNo commits found\n"), [])
+
+
+class ConfigContext(object):
+    CommandError = condoor.CommandError
+    CommandTimeoutError = condoor.CommandTimeoutError
+
+    def __init__(self, output):
+        self.output = output
+        self.warnings = []
+
+    def send_to_file(self, cmd, path, timeout=60, start_at=None):
+        if start_at is not None:
+            if start_at not in self.output:
+                raise condoor.CommandError("Output start '{}' not found".format(start_at), "R1", command=cmd)
+            self.output = self.output[self.output.find(start_at):]
+        with open(path, "w") as f:
+            f.write(self.output)
+
+    def warning(self, message):
+        self.warnings.append(message)
+
+
+class TestSaveConfig(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.files = [os.path.join(self.directory, name) for name in ["admin.cfg", "admin-show-running-config.txt"]]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def save(self, output):
+        ctx = ConfigContext(output)
+        pre_migrate.Plugin(ctx)._save_config_to_csm_data(self.files, admin=True)
+        for file_path in self.files:
+            with open(file_path) as f:
+                self.assertEqual(f.read(), ctx.output)
+        return ctx
+
+    def test_start_line(self):
+        ctx = self.save("Tue May 17 09:56:43.720 UTC\nBuilding configuration...\nend\n")
+        self.assertEqual(ctx.output, "Building configuration...\nend\n")
+        self.assertEqual(ctx.warnings, [])
+
+    def test_whole_output_without_start_line(self):
+        ctx = self.save("!! Last configuration change\nusername root\nend\n")
+        self.assertEqual(len(ctx.warnings), 1)
@@ -0,0 +1,106 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from csmpe import artifacts
+from csmpe.utils import read_json
+
+
+DATA = "Building configuration...\n" + "interface GigabitEthernet0/0/0/0\n shutdown\n!\n" * 1000
+
+
+class TestArtifactStore(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.job1 = os.path.join(self.root, "job1")
+        self.job2 = os.path.join(self.root, "job2")
+        os.makedirs(self.job1)
+        os.makedirs(self.job2)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_plain(self):
+        store = artifacts.get_artifact_store()
+        self.assertEqual(store.save(self.job1, "show-run.txt", DATA), "show-run.txt")
+        with open(os.path.join(self.job1, "show-run.txt")) as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertEqual(artifacts.load_artifact(os.path.join(self.job1, "show-run.txt")), DATA)
+
+    def test_gzip_deduplicated(self):
+        store = artifacts.get_artifact_store("gzip", self.objects_dir)
+        self.assertEqual(store.save(self.job1, "show-run.txt", DATA), "show-run.txt.gz")
+        store.save(self.job2, "show-run.txt", DATA)
+        path1 = os.path.join(self.job1, "show-run.txt.gz")
+        path2 = os.path.join(self.job2, "show-run.txt.gz")
+        self.assertTrue(os.path.samefile(path1, path2))
+        self.assertLess(os.path.getsize(path1), len(DATA))
+        self.assertEqual(artifacts.load_artifact(os.path.join(self.job2, "show-run.txt")), DATA)
+        self.assertEqual(artifacts.load_artifact(path2), DATA)
+
+    def test_overwrite_does_not_change_object(self):
+        store = artifacts.get_artifact_store("gzip", self.objects_dir)
+        store.save(self.job1, "show-run.txt", DATA)
+        store.save(self.job2, "show-run.txt", DATA)
+        store.save(self.job1, "show-run.txt", "changed")
+        self.assertEqual(artifacts.load_artifact(os.path.join(self.job1, "show-run.txt")), "changed")
+        self.assertEqual(artifacts.load_artifact(os.path.join(self.job2, "show-run.txt")), DATA)
+
+    def test_manifest(self):
+        store = artifacts.get_artifact_store("compressed", self.objects_dir)
+        stored_name = store.save(self.job1, "show-run.txt", DATA)
+        manifest = read_json(os.path.join(self.job1, artifacts.ARTIFACTS_MANIFEST))
+        record = manifest["show-run.txt"]
+        self.assertEqual(record["file"], stored_name)
+        self.assertEqual(record["size"], len(DATA))
+        self.assertEqual(record["compression"], store.name)
+        self.assertEqual(len(record["sha256"]), 64)
+
+    def test_missing(self):
+        self.assertRaises(IOError, artifacts.load_artifact, os.path.join(self.job1, "missing.txt"))
+
+    def test_save_file(self):
+        store = artifacts.get_artifact_store("gzip", self.objects_dir)
+        store.save(self.job1, "show-run.txt", DATA)
+        source = os.path.join(self.job2, "show-run.txt.tmp")
+        with open(source, "w") as f:
+            f.write(DATA)
+        self.assertEqual(store.save_file(self.job2, "show-run.txt", source), "show-run.txt.gz")
+        self.assertFalse(os.path.exists(source))
+        self.assertTrue(os.path.samefile(os.path.join(self.job1, "show-run.txt.gz"),
+                                         os.path.join(self.job2, "show-run.txt.gz")))
+        record = read_json(os.path.join(self.job2, artifacts.ARTIFACTS_MANIFEST))["show-run.txt"]
+        self.assertEqual(record["size"], len(DATA))
+        self.assertEqual(artifacts.load_artifact(os.path.join(self.job2, "show-run.txt")), DATA)
+
+    def test_compressed_store_is_abstract(self):
+        self.assertRaises(TypeError, artifacts.CompressedStore, self.objects_dir)
@@ -0,0 +1,91 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+from unittest import TestCase
+
+from csmpe.command_cache import CommandCache
+from csmpe.context import PluginContext
+
+
+class Connection(object):
+    def __init__(self):
+        self.sent = []
+        self.calls = []
+
+    def send(self, cmd, timeout=300, wait_for_string=None, password=False):
+        self.sent.append(cmd)
+        self.calls.append((cmd, timeout, password))
+        return "output of {} #{}".format(cmd, len(self.sent))
+
+    def disconnect(self):
+        pass
+
+
+class TestCommandCache(TestCase):
+    def setUp(self):
+        # PluginContext without the device discovery
+        self.ctx = PluginContext()
+        self.ctx._command_cache = CommandCache()
+        self.ctx._connection = self.connection = Connection()
+
+    def test_read_only_commands_cached(self):
+        first = self.ctx.send("show platform")
+        self.assertEqual(self.ctx.send("show  platform"), first)
+        self.assertEqual(self.ctx.send("dir harddisk:"), self.ctx.send("dir harddisk:"))
+        self.assertEqual(self.connection.sent, ["show platform", "dir harddisk:"])
+
+    def test_mutating_command_invalidates(self):
+        first = self.ctx.send("show install active summary")
+        self.ctx.send("install commit")
+        self.assertNotEqual(self.ctx.send("show install active summary"), first)
+        self.assertEqual(len(self.connection.sent), 3)
+
+    def test_not_whitelisted_commands_not_cached(self):
+        self.ctx.send("show install request")
+        self.ctx.send("show install request")
+        self.assertEqual(len(self.connection.sent), 2)
+
+    def test_cache_bypass(self):
+        self.ctx.send("show platform")
+        self.ctx.send("show platform", cache=False)
+        self.assertEqual(len(self.connection.sent), 2)
+
+    def test_disabled_by_default(self):
+        ctx = PluginContext()
+        ctx._connection = connection = Connection()
+        ctx.send("show platform")
+        ctx.send("show platform")
+        self.assertEqual(len(connection.sent), 2)
+
+    def test_connection_arguments_passed(self):
+        for ctx in (self.ctx, PluginContext()):
+            ctx._connection = connection = Connection()
+            ctx.send("show platform")
+            ctx.send("secret", password=True)
+            ctx.send("secret", password=True)
+            self.assertEqual(connection.calls, [("show platform", 300, False),
+                                                ("secret", 300, True), ("secret", 300, True)])
@@ -25,3 +25,164 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from time import sleep, time
+from unittest import TestCase
+
+import condoor
+
+from csmpe.context import InstallContext, PluginContext, PluginError
+
+
+class CountingContext(InstallContext):
+    def __init__(self):
+        super(CountingContext, self).__init__()
+        self.calls = []
+
+    def save_data(self, key, value):
+        self.calls.append("save_data")
+        super(CountingContext, self).save_data(key, value)
+
+    def load_data(self, key):
+        self.calls.append("load_data")
+        return super(CountingContext, self).load_data(key)
+
+    def save_data_many(self, items):
+        self.calls.append("save_data_many")
+        super(CountingContext, self).save_data_many(items)
+
+    def load_data_many(self, keys=None):
+        self.calls.append("load_data_many")
+        return super(CountingContext, self).load_data_many(keys)
+
+
+class TestPluginContextStorage(TestCase):
+    def setUp(self):
+        self.csm = CountingContext()
+        self.csm.hostname = "test_context"
+        self.csm.storage.delete(self.csm.hostname)
+        self.csm.save_data_many({"xe_rsp_count": ["2", 1.0], "xe_boot_mode": ["install", 1.0]})
+        self.csm.calls = []
+        # PluginContext without the device discovery
+        self.ctx = PluginContext()
+        self.ctx._csm = self.csm
+
+    def test_prefetch(self):
+        self.assertEqual(self.ctx.load_data("xe_rsp_count"), ("2", 1.0))
+        self.assertEqual(self.ctx.load_data("xe_boot_mode"), ("install", 1.0))
+        self.assertEqual(self.ctx.load_data("xe_rsp_count"), ("2", 1.0))
+        self.assertEqual(self.csm.calls, ["load_data_many"])
+
+    def test_write_behind(self):
+        self.ctx.save_data("xe_activate_pkg", "pkg.bin")
+        self.ctx.save_data("xe_install_folder", "bootflash:")
+        self.assertEqual(self.ctx.load_data("xe_activate_pkg")[0], "pkg.bin")
+        self.assertEqual(self.csm.load_data("xe_activate_pkg"), (None, None))
+        self.ctx.flush_data()
+        self.ctx.flush_data()
+        self.assertEqual(self.csm.load_data("xe_activate_pkg")[0], "pkg.bin")
+        self.assertEqual(self.csm.calls.count("save_data_many"), 1)
+        self.assertNotIn("save_data", self.csm.calls)
+
+
+class TestPluginContextCancel(TestCase):
+    def test_sleep(self):
+        ctx = PluginContext()
+        start = time()
+        ctx.sleep(0.05)
+        self.assertGreaterEqual(time() - start, 0.04)
+        self.assertFalse(ctx.cancelled)
+
+    def test_cancel_interrupts_sleep(self):
+        ctx = PluginContext()
+        threading.Timer(0.05, ctx.cancel).start()
+        start = time()
+        self.assertRaises(PluginError, ctx.sleep, 30)
+        self.assertLess(time() - start, 5)
+        self.assertTrue(ctx.cancelled)
+
+
+class TestPluginContextLogBuffer(TestCase):
+    def test_replay(self):
+        ctx = PluginContext()
+        logged = []
+        ctx._logger = logging.getLogger("test_context.plugin_manager")
+        ctx._logger.setLevel(logging.INFO)
+        ctx._logger.handle = logged.append
+        ctx.current_plugin = "Test Plugin"
+        ctx.start_log_buffer()
+        ctx.info("first")
+        ctx.warning("second")
+        self.assertEqual(logged, [])
+        records = ctx.stop_log_buffer()
+        ctx.replay_log(records)
+        self.assertEqual([record.getMessage() for record in logged], ["[Test Plugin] first", "[Test Plugin] second"])
+        self.assertEqual([record.created for record in logged], [record[2] for record in records])
+
+
+class DiscoveredConnection(object):
+    family = "ASR9K"
+    os_type = "XR"
+    is_connected = False
+    device_info = {'family': "ASR9K"}
+    udi = {'name': "Rack 0"}
+
+
+class SlowDiscoveryContext(PluginContext):
+    def _device_detect(self):
+        sleep(0.2)
+        if self._csm.hostname == "unreachable":
+            raise condoor.ConnectionError("Unable to connect to the device")
+        self._connection = DiscoveredConnection()
+
+    def connect(self):
+        self.connected = True
+
+
+class TestBackgroundDiscovery(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.csm = InstallContext()
+        self.csm.host_urls = ["telnet://R1"]
+        self.csm.log_directory = self.log_dir
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    def test_discovery_runs_in_background(self):
+        self.csm.hostname = "R1"
+        start = time()
+        ctx = SlowDiscoveryContext(self.csm)
+        self.assertLess(time() - start, 0.1)
+        self.assertEqual(ctx.family, "ASR9K")
+        self.assertEqual(ctx.os_type, "XR")
+        self.assertGreaterEqual(time() - start, 0.15)
+        self.assertTrue(ctx.connected)
+
+    def test_discovery_error_raised_on_wait(self):
+        self.csm.hostname = "unreachable"
+        ctx = SlowDiscoveryContext(self.csm)
+        self.assertRaises(condoor.ConnectionError, ctx.wait_for_discovery)
+        self.assertRaises(condoor.ConnectionError, getattr, ctx, "family")
+
+    def test_rebind(self):
+        self.csm.hostname = "R1"
+        ctx = SlowDiscoveryContext(self.csm)
+        ctx.info("first run")
+        csm = InstallContext()
+        csm.hostname = "R1"
+        csm.host_urls = ["telnet://R1"]
+        csm.log_directory = os.path.join(self.log_dir, "next")
+        ctx.rebind(csm)
+        ctx.info("second run")
+        self.assertEqual(ctx.family, "ASR9K")
+        self.assertEqual(csm.load_data("udi"), {'name': "Rack 0"})
+        with open(os.path.join(self.log_dir, "plugins.log")) as f:
+            self.assertNotIn("second run", f.read())
+        with open(os.path.join(csm.log_directory, "plugins.log")) as f:
+            self.assertIn("second run", f.read())
@@ -0,0 +1,187 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+from unittest import TestCase
+
+from csmpe import csm_pm
+from csmpe.csm_pm import CSMPluginManager
+
+
+def make_entry(entry_point, module_name, platforms, phases, os_types=()):
+    return {
+        'id': entry_point,
+        'entry_point': entry_point,
+        'module_name': module_name,
+        'attrs': ['Plugin'],
+        'package_name': module_name.split(".")[0],
+        'name': entry_point,
+        'description': None,
+        'phases': list(phases),
+        'platforms': list(platforms),
+        'os': list(os_types),
+    }
+
+
+ENTRIES = [
+    make_entry('xe-pre-activate', 'csmpe.core_plugins.csm_install_operations.ios_xe.pre_activate',
+               ['ASR900'], ['Pre-Activate'], ['XE']),
+    make_entry('xr-pre-migrate', 'csmpe.not_existing_module', ['ASR9K'], ['Pre-Migrate'], ['XR']),
+    make_entry('any-os-capture', 'csmpe.core_plugins.csm_config_capture.plugin',
+               ['ASR900', 'ASR9K'], ['Pre-Upgrade']),
+]
+
+
+class PluginManager(CSMPluginManager):
+    def __init__(self):
+        self.load_failures = []
+        self.dispatched = []
+        super(PluginManager, self).__init__(None, invoke_on_load=False)
+
+    def _on_load_failure(self, manager, entry_point, exc):
+        self.load_failures.append(entry_point.name)
+
+    def _dispatch(self, ext):
+        self.dispatched.append(ext.name)
+
+
+class TestCSMPluginManager(TestCase):
+    def setUp(self):
+        self._get_manifest = csm_pm.get_manifest
+        csm_pm.get_manifest = lambda **kwargs: ENTRIES
+
+    def tearDown(self):
+        csm_pm.get_manifest = self._get_manifest
+
+    def test_plugin_list_filtered_by_metadata(self):
+        pm = PluginManager()
+        pm.set_platform_filter("ASR900")
+        pm.set_os_filter("XE")
+        pm.load(invoke_on_load=False)
+        self.assertEqual(sorted(pm.plugins.keys()), ['any-os-capture', 'xe-pre-activate'])
+        self.assertEqual(pm._extensions, {})
+
+    def test_only_matching_plugins_imported(self):
+        pm = PluginManager()
+        pm.set_platform_filter("ASR900")
+        pm.load(invoke_on_load=False)
+        pm.set_phase_filter("Pre-Activate")
+        pm._map_method("__repr__")
+        self.assertEqual(pm.dispatched, ['xe-pre-activate'])
+        self.assertEqual(pm.load_failures, [])
+
+    def test_load_failure_reported(self):
+        pm = PluginManager()
+        pm.set_phase_filter("Pre-Migrate")
+        pm.load(invoke_on_load=False)
+        self.assertEqual(pm._map_method("__repr__"), [])
+        self.assertEqual(pm.load_failures, ['xr-pre-migrate'])
+
+    def test_lookup_without_device(self):
+        pm = PluginManager()
+        self.assertEqual(pm.lookup('Pre-Upgrade', 'ASR9K', 'XR'), ['any-os-capture'])
+        self.assertEqual(pm.lookup('Pre-Activate', 'ASR900', 'XE'), ['xe-pre-activate'])
+        self.assertEqual(pm.lookup('Pre-Activate', 'ASR9K', 'XR'), [])
+
+
+class PhaseContext(object):
+    """
+    The connected device context recording the plugin manager calls.
+    """
+    def __init__(self):
+        self.phase = None
+        self.success = False
+        self.current_plugin = None
+        self.is_connected = True
+        self.family = "ASR9K"
+        self.os_type = "XR"
+        self.calls = []
+
+    def wait_for_discovery(self):
+        pass
+
+    def info(self, message):
+        pass
+
+    def warning(self, message):
+        self.calls.append(message)
+
+    def post_status(self, message):
+        pass
+
+    def close_sessions(self):
+        self.calls.append("close_sessions")
+
+    def disconnect(self):
+        self.calls.append("disconnect")
+
+
+class TestDispatchPhases(TestCase):
+    def setUp(self):
+        self._get_manifest = csm_pm.get_manifest
+        csm_pm.get_manifest = lambda **kwargs: ENTRIES
+        self.pm = PluginManager()
+        self.pm._ctx = PhaseContext()
+        self.pm._map_method = self.map_method
+        self.failing_phase = None
+
+    def tearDown(self):
+        csm_pm.get_manifest = self._get_manifest
+
+    def map_method(self, func):
+        if self.pm._phase == self.failing_phase:
+            raise ValueError(self.pm._phase)
+        return ["{}:{}".format(self.pm._ctx.phase, self.pm._phase)]
+
+    def test_phases_in_order(self):
+        results = self.pm.dispatch_phases("run", ["Pre-Upgrade", "Add", "Commit"])
+        self.assertEqual(results, [["Pre-Upgrade:Pre-Upgrade"], ["Add:Pre-Add", "Add:Add"], ["Commit:Commit"]])
+        self.assertTrue(self.pm._ctx.success)
+        self.assertEqual(self.pm._ctx.calls, ["close_sessions", "disconnect"])
+
+    def test_stop_on_failing_phase(self):
+        self.failing_phase = "Add"
+        self.assertRaises(ValueError, self.pm.dispatch_phases, "run", ["Pre-Upgrade", "Add", "Commit"])
+        self.assertEqual(self.pm._ctx.phase, "Add")
+        self.assertFalse(self.pm._ctx.success)
+        self.assertEqual(self.pm._ctx.calls, ["Phase Add failed. The remaining phases are not executed.",
+                                              "close_sessions"])
+
+    def test_device_filters_updated_for_each_phase(self):
+        filters = []
+
+        def map_method(func):
+            self.pm._get_entries()
+            filters.append((self.pm._phase, self.pm._platform, self.pm._os))
+            if self.pm._phase == "Migrate":
+                self.pm._ctx.os_type = "eXR"
+            return []
+
+        self.pm._device = True
+        self.pm._map_method = map_method
+        self.pm.dispatch_phases("run", ["Pre-Migrate", "Migrate", "Post-Migrate"])
+        self.assertEqual(filters, [("Pre-Migrate", "ASR9K", "XR"), ("Migrate", "ASR9K", "XR"),
+                                   ("Post-Migrate", "ASR9K", "eXR")])
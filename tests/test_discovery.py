@@ -0,0 +1,132 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import shutil
+import tempfile
+from time import time
+from unittest import TestCase
+
+from csmpe import discovery
+
+
+INFO = {
+    'hostname': 'R1',
+    'family': 'ASR9K',
+    'platform': 'ASR-9904',
+    'os_type': 'XR',
+    'os_version': '5.3.3',
+    'prompt': 'RP/0/RSP0/CPU0:R1#',
+    'udi': {'name': 'Rack 0', 'description': 'ASR-9904 AC Chassis', 'pid': 'ASR-9904-AC', 'vid': 'V01', 'sn': 'X'},
+    'is_console': False,
+}
+
+XR_SHOW_VERSION = """
+Cisco IOS XR Software, Version 5.3.3[Default]
+Copyright (c) 2016 by Cisco Systems, Inc.
+"""
+
+EXR_SHOW_VERSION = """
+Cisco IOS XR Software, Version 6.1.2
+Copyright (c) 2013-2016 by Cisco Systems, Inc.
+
+Build Information:
+"""
+
+
+class TestDiscoveryCache(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = discovery.get_discovery_path("R1", ["telnet://user:pass@R1"], self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_path_does_not_expose_urls(self):
+        self.assertNotIn("pass", self.path)
+        self.assertNotEqual(self.path, discovery.get_discovery_path("R1", ["telnet://user:pass@R2"], self.cache_dir))
+
+    def test_save_and_load(self):
+        self.assertTrue(discovery.save_discovery(self.path, INFO))
+        self.assertEqual(discovery.load_discovery(self.path), INFO)
+
+    def test_expired(self):
+        discovery.write_json(self.path, {'timestamp': time() - 60, 'info': INFO})
+        self.assertIsNone(discovery.load_discovery(self.path, ttl=30))
+        self.assertEqual(discovery.load_discovery(self.path, ttl=120), INFO)
+
+    def test_invalidate(self):
+        discovery.save_discovery(self.path, INFO)
+        discovery.invalidate_discovery(self.path)
+        self.assertIsNone(discovery.load_discovery(self.path))
+
+    def test_matches_show_version(self):
+        self.assertTrue(discovery.matches_show_version(INFO, XR_SHOW_VERSION))
+        self.assertFalse(discovery.matches_show_version(INFO, XR_SHOW_VERSION.replace("5.3.3", "6.1.2")))
+        self.assertFalse(discovery.matches_show_version(INFO, ""))
+        self.assertTrue(discovery.matches_show_version(dict(INFO, os_type='eXR', os_version='6.1.2'),
+                                                       EXR_SHOW_VERSION))
+
+
+class PublicConnection(object):
+    """
+    The connection exposing only the public properties as condoor 1.x does.
+    """
+    hostname = 'R1'
+    family = 'ASR9K'
+    platform = 'ASR-9904'
+    os_type = 'XR'
+    os_version = '5.3.3'
+    prompt = 'RP/0/RSP0/CPU0:R1#'
+    udi = INFO['udi']
+    is_console = False
+
+    def __init__(self, description_record=None):
+        self._description_record = description_record
+
+    @property
+    def description_record(self):
+        if self._description_record is None:
+            raise Exception("Device not connected")
+        return self._description_record
+
+
+class TestConnectionInfo(TestCase):
+    def test_public_properties(self):
+        self.assertEqual(discovery.get_connection_info(PublicConnection()), INFO)
+
+    def test_description_record(self):
+        record = {'connections': [], 'last_chain': 0}
+        info = discovery.get_connection_info(PublicConnection(record))
+        self.assertEqual(info['description_record'], record)
+        self.assertTrue(discovery.restore_connection(PublicConnection(), info))
+
+    def test_restore_not_supported(self):
+        self.assertFalse(discovery.restore_connection(PublicConnection(), INFO))
+
+    def test_connection_matches(self):
+        self.assertTrue(discovery.connection_matches(PublicConnection(), INFO))
+        self.assertFalse(discovery.connection_matches(PublicConnection(), dict(INFO, os_version='6.1.2')))
@@ -0,0 +1,144 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from unittest import TestCase
+
+from csmpe import fleet
+
+
+def make_host(hostname, jumphost=None):
+    urls = ["telnet://user:pass@{}".format(hostname)]
+    if jumphost:
+        urls.insert(0, "ssh://user:pass@{}".format(jumphost))
+    return {'hostname': hostname, 'urls': urls}
+
+
+def crashing_run_host(host, log_dir, options=None):
+    if host['hostname'] == "R1":
+        # the worker process killed in the middle of the run
+        os._exit(1)
+    return {'hostname': host['hostname'], 'success': True, 'error': None, 'duration': 0}
+
+
+class ThreadFleetRunner(fleet.FleetRunner):
+    def _create_pool(self, started=None):
+        return ThreadPool(self.workers)
+
+
+class TestInventory(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "inventory.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, data):
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+    def test_load(self):
+        self.write([make_host("R1", "jump"), {'urls': "telnet://R2", 'phase': 'Post-Upgrade'}])
+        hosts = fleet.load_inventory(self.path, phase="Pre-Upgrade")
+        self.assertEqual([host['hostname'] for host in hosts], ["R1", "r2"])
+        self.assertEqual([host['phase'] for host in hosts], ["Pre-Upgrade", "Post-Upgrade"])
+        self.assertEqual(hosts[1]['urls'], ["telnet://R2"])
+        self.assertEqual(hosts[1]['packages'], [])
+
+    def test_invalid(self):
+        self.write({'hosts': [{'hostname': 'R1'}]})
+        self.assertRaises(fleet.InventoryError, fleet.load_inventory, self.path)
+        self.write([make_host("R1"), make_host("R1")])
+        self.assertRaises(fleet.InventoryError, fleet.load_inventory, self.path)
+
+    def test_jumphost(self):
+        self.assertEqual(fleet.jumphost_of(make_host("R1", "jump")['urls']), "jump")
+        self.assertIsNone(fleet.jumphost_of(make_host("R1")['urls']))
+        self.assertEqual(fleet.jumphost_of([make_host("R1", "ts1")['urls'], make_host("R1", "ts2")['urls']]), "ts1")
+
+
+class TestFleetRunner(TestCase):
+    def setUp(self):
+        self._run_host = fleet.run_host
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.max_sessions = {}
+        fleet.run_host = self.run_host
+
+    def tearDown(self):
+        fleet.run_host = self._run_host
+
+    def run_host(self, host, log_dir, options=None):
+        jumphost = fleet.jumphost_of(host['urls'])
+        with self.lock:
+            for key in [jumphost, "all"]:
+                self.sessions[key] = self.sessions.get(key, 0) + 1
+                self.max_sessions[key] = max(self.max_sessions.get(key, 0), self.sessions[key])
+        time.sleep(0.01)
+        with self.lock:
+            for key in [jumphost, "all"]:
+                self.sessions[key] -= 1
+        return {'hostname': host['hostname'], 'success': host['hostname'] != "R3", 'error': None, 'duration': 0}
+
+    def test_concurrency_limits(self):
+        hosts = [make_host("R{}".format(n), "jump1" if n % 2 else "jump2") for n in range(20)]
+        hosts += [make_host("D{}".format(n)) for n in range(5)]
+        runner = ThreadFleetRunner("/tmp", workers=6, per_jumphost=2)
+        results = runner.run(hosts)
+        self.assertEqual([result['hostname'] for result in results], [host['hostname'] for host in hosts])
+        self.assertLessEqual(self.max_sessions["all"], 6)
+        self.assertLessEqual(self.max_sessions["jump1"], 2)
+        self.assertLessEqual(self.max_sessions["jump2"], 2)
+
+        succeeded, failed = fleet.summary(results)
+        self.assertEqual([result['hostname'] for result in failed], ["R3"])
+        self.assertEqual(len(succeeded), 24)
+
+    def test_thread_pool(self):
+        hosts = [make_host("R{}".format(n), "jump1") for n in range(10)]
+        runner = fleet.FleetRunner("/tmp", workers=4, per_jumphost=4, threads=True)
+        results = runner.run(hosts)
+        self.assertEqual([result['hostname'] for result in results], [host['hostname'] for host in hosts])
+        self.assertLessEqual(self.max_sessions["all"], 4)
+
+    def test_worker_process_died(self):
+        fleet.run_host = crashing_run_host
+        hosts = [make_host("R{}".format(n)) for n in range(4)]
+        runner = fleet.FleetRunner("/tmp", workers=2)
+        results = runner.run(hosts)
+        self.assertEqual([result['hostname'] for result in results], [host['hostname'] for host in hosts])
+        self.assertFalse(results[1]['success'])
+        self.assertIn("died", results[1]['error'])
+        succeeded, failed = fleet.summary(results)
+        self.assertEqual(len(succeeded), 3)
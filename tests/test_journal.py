@@ -0,0 +1,128 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from csmpe import journal
+
+
+class StorageContext(object):
+    """
+    The plugin context keeping the flushed data in the storage shared by the consecutive runs.
+    """
+    def __init__(self, storage, phase="Pre-Migrate"):
+        self.storage = storage
+        self.phase = phase
+        self.pending = {}
+        self.messages = []
+
+    def save_data(self, key, value):
+        self.pending[key] = value
+
+    def load_data(self, key):
+        return self.storage.get(key), None
+
+    def flush_data(self):
+        self.storage.update(self.pending)
+        self.pending = {}
+
+    def info(self, message):
+        self.messages.append(message)
+
+
+class Failure(Exception):
+    pass
+
+
+class TestStepJournal(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.artifact = os.path.join(self.directory, "xr.iox")
+        self.storage = {}
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def step(self, name, fail=False):
+        def func():
+            self.calls.append(name)
+            if name == "configs":
+                with open(self.artifact, "w") as f:
+                    f.write("hostname R1\n")
+            if fail:
+                raise Failure(name)
+            return name
+        return func
+
+    def run_phase(self, fail_at=None, inputs="5.3.3", phase="Pre-Migrate"):
+        self.calls = []
+        steps = journal.StepJournal(StorageContext(self.storage, phase))
+        steps.run("audit", self.step("audit"), inputs=[inputs])
+        steps.run("configs", self.step("configs"), artifacts=[self.artifact])
+        steps.run("fpd upgrade", self.step("fpd upgrade", fail=fail_at == "fpd upgrade"))
+        steps.clear()
+
+    def test_skip_completed_steps(self):
+        self.assertRaises(Failure, self.run_phase, fail_at="fpd upgrade")
+        self.assertEqual(self.calls, ["audit", "configs", "fpd upgrade"])
+        self.run_phase()
+        self.assertEqual(self.calls, ["fpd upgrade"])
+
+    def test_cleared_when_completed(self):
+        self.run_phase()
+        self.assertIsNone(self.storage[journal.JOURNAL_KEY])
+        self.run_phase()
+        self.assertEqual(self.calls, ["audit", "configs", "fpd upgrade"])
+
+    def test_changed_inputs_invalidate_following_steps(self):
+        self.assertRaises(Failure, self.run_phase, fail_at="fpd upgrade")
+        self.run_phase(inputs="6.1.2")
+        self.assertEqual(self.calls, ["audit", "configs", "fpd upgrade"])
+
+    def test_changed_artifact(self):
+        self.assertRaises(Failure, self.run_phase, fail_at="fpd upgrade")
+        with open(self.artifact, "a") as f:
+            f.write("interface Loopback0\n")
+        self.run_phase()
+        self.assertEqual(self.calls, ["configs", "fpd upgrade"])
+
+    def test_other_phase(self):
+        self.assertRaises(Failure, self.run_phase, fail_at="fpd upgrade")
+        self.run_phase(phase="Post-Migrate")
+        self.assertEqual(self.calls, ["audit", "configs", "fpd upgrade"])
+
+    def test_verify_and_result(self):
+        ctx = StorageContext(self.storage)
+        journal.StepJournal(ctx).run("copy image", lambda: ["image"])
+        steps = journal.StepJournal(ctx)
+        self.assertEqual(steps.run("copy image", self.step("copy image")), ["image"])
+        self.assertFalse(steps.completed("copy image", verify=lambda ctx: False))
+        self.assertEqual(self.calls, [])
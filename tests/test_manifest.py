@@ -0,0 +1,110 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import shutil
+import tempfile
+from unittest import TestCase
+from uuid import uuid5
+
+from csmpe import manifest
+
+
+ENTRIES = [
+    {
+        'id': 'node-status',
+        'entry_point': 'node-status',
+        'module_name': 'csmpe.core_plugins.csm_node_status_check.ios_xr.plugin',
+        'attrs': ['Plugin'],
+        'package_name': 'csmpe',
+        'name': 'Node Status Check Plugin',
+        'description': 'This plugin checks the states of all nodes',
+        'phases': ['Post-Upgrade', 'Pre-Upgrade'],
+        'platforms': ['ASR9K', 'CRS'],
+        'os': ['XR'],
+    },
+]
+
+
+class TestManifest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_save_and_load(self):
+        self.assertTrue(manifest.save_manifest(ENTRIES, key="key1", cache_dir=self.cache_dir))
+        self.assertEqual(manifest.load_manifest(key="key1", cache_dir=self.cache_dir), ENTRIES)
+
+    def test_invalidated_by_key(self):
+        manifest.save_manifest(ENTRIES, key="key1", cache_dir=self.cache_dir)
+        self.assertIsNone(manifest.load_manifest(key="key2", cache_dir=self.cache_dir))
+
+    def test_missing_manifest(self):
+        self.assertIsNone(manifest.load_manifest(key="key1", cache_dir=self.cache_dir))
+
+    def test_distributions_key_is_stable(self):
+        self.assertEqual(manifest.distributions_key(), manifest.distributions_key())
+
+    def test_plugin_id_is_deterministic(self):
+        module_name = 'csmpe.core_plugins.csm_node_status_check.ios_xr.plugin'
+        self.assertEqual(manifest.plugin_id(module_name, ['Plugin']),
+                         '{}'.format(uuid5(manifest.PLUGIN_ID_NAMESPACE, module_name + ':Plugin')))
+        self.assertEqual(manifest.plugin_id(module_name, ('Plugin',)), manifest.plugin_id(module_name, ['Plugin']))
+        self.assertNotEqual(manifest.plugin_id(module_name, ['Plugin']),
+                            manifest.plugin_id(module_name.replace('ios_xr', 'exr'), ['Plugin']))
+
+
+class TestPluginIndex(TestCase):
+    def setUp(self):
+        self.entries = [
+            dict(ENTRIES[0], name='xr'),
+            dict(ENTRIES[0], name='any-os', os=[]),
+            dict(ENTRIES[0], name='exr', os=['eXR']),
+            dict(ENTRIES[0], name='crs', platforms=['CRS'], phases=['Add']),
+        ]
+        self.index = manifest.PluginIndex(self.entries)
+
+    def names(self, *args):
+        return [entry['name'] for entry in self.index.lookup(*args)]
+
+    def test_exact_lookup_keeps_order(self):
+        self.assertEqual(self.names('Pre-Upgrade', 'ASR9K', 'XR'), ['xr', 'any-os'])
+        self.assertEqual(self.names('Pre-Upgrade', 'ASR9K', 'eXR'), ['any-os', 'exr'])
+        self.assertEqual(self.names('Add', 'ASR9K', 'XR'), [])
+
+    def test_wildcard_lookup(self):
+        self.assertEqual(self.names('Add'), ['crs'])
+        self.assertEqual(self.names(None, 'CRS', 'XR'), ['xr', 'any-os', 'crs'])
+        self.assertEqual(len(self.names()), len(self.entries))
+
+    def test_lookup_matches_filter(self):
+        for phase in ['Pre-Upgrade', 'Add', None]:
+            for platform in ['ASR9K', 'CRS', None]:
+                for os_type in ['XR', 'eXR', None]:
+                    expected = [entry['name'] for entry in self.entries
+                                if manifest.plugin_matches(entry, phase, platform, os_type)]
+                    self.assertEqual(self.names(phase, platform, os_type), expected)
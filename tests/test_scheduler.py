@@ -0,0 +1,99 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import threading
+import time
+from unittest import TestCase
+
+from csmpe import scheduler
+
+
+def entry(name, read_only=True, requires=(), provides=()):
+    return {'name': name, 'read_only': read_only, 'requires': list(requires), 'provides': list(provides)}
+
+
+class TestDependencies(TestCase):
+    def test_read_only_plugins_are_independent(self):
+        entries = [entry('node'), entry('isis'), entry('config')]
+        self.assertEqual(scheduler.dependencies(entries), [set(), set(), set()])
+
+    def test_not_read_only_plugin_is_barrier(self):
+        entries = [entry('node'), entry('install', read_only=False), entry('config')]
+        self.assertEqual(scheduler.dependencies(entries), [set(), {0}, {1}])
+
+    def test_data_dependency(self):
+        entries = [entry('node', provides=['node_status']), entry('isis'), entry('check', requires=['node_status'])]
+        self.assertEqual(scheduler.dependencies(entries), [set(), set(), {0}])
+        entries = [entry('check', requires=['node_status']), entry('node', provides=['node_status'])]
+        self.assertEqual(scheduler.dependencies(entries), [set(), {0}])
+
+
+class TestRunGraph(TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.started = []
+
+    def run_position(self, position, fail=None):
+        with self.lock:
+            self.started.append(position)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        # the later positions finish first
+        time.sleep(0.05 / (position + 1))
+        with self.lock:
+            self.running -= 1
+        if position == fail:
+            raise ValueError(position)
+        return position * 10
+
+    def test_concurrent(self):
+        done = []
+        results = scheduler.run_graph([set()] * 4, self.run_position, 4, on_done=done.append)
+        self.assertEqual(results, [0, 10, 20, 30])
+        self.assertEqual(done, [0, 1, 2, 3])
+        self.assertEqual(self.max_running, 4)
+
+    def test_dependencies_respected(self):
+        finished = []
+
+        def run(position):
+            finished.append(position)
+            return self.run_position(position)
+
+        scheduler.run_graph([set(), set(), {0, 1}, set()], run, 2)
+        self.assertLess(finished.index(0), finished.index(2))
+        self.assertLess(finished.index(1), finished.index(2))
+        self.assertLessEqual(self.max_running, 2)
+
+    def test_failure(self):
+        done = []
+        self.assertRaises(ValueError, scheduler.run_graph, [set(), set(), {1}], lambda position:
+                          self.run_position(position, fail=1), 2, on_done=done.append)
+        self.assertEqual(sorted(done), [0, 1])
+        self.assertNotIn(2, self.started)
@@ -0,0 +1,278 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import urllib2
+from unittest import TestCase
+
+from csmpe import csm_pm, server
+from csmpe.context import PluginContext
+
+
+class FakeContext(object):
+    def __init__(self):
+        self.is_connected = True
+        self.logging_closed = False
+
+    def disconnect(self):
+        self.is_connected = False
+
+    def _close_logging(self):
+        self.logging_closed = True
+
+
+class LoggingContext(PluginContext):
+    """
+    The plugin context logging to plugins.log in the job log directory without the device connection.
+    """
+    is_connected = True
+
+    def __init__(self, csm):
+        PluginContext.__init__(self)
+        self.rebind(csm)
+
+    def rebind(self, csm):
+        self._csm = csm
+        self._close_logging()
+        self._set_logging(hostname=csm.hostname, log_dir=csm.log_directory, log_level=logging.DEBUG)
+
+    def disconnect(self):
+        pass
+
+
+class FakePluginManager(object):
+    def __init__(self, ctx=None, plugin_ctx=None):
+        if plugin_ctx is not None:
+            plugin_ctx.rebind(ctx)
+            self.plugin_ctx = plugin_ctx
+        else:
+            self.plugin_ctx = LoggingContext(ctx)
+        self.keep_connected = False
+
+    def set_name_filter(self, name):
+        pass
+
+    def dispatch(self, func):
+        self.plugin_ctx.info("job for {}".format(self.plugin_ctx._csm.log_directory))
+        self.plugin_ctx._csm.success = True
+        return []
+
+
+class FakeServer(server.Server):
+    def _execute(self, host):
+        self.executed.append(host)
+        return {'hostname': host['hostname'], 'success': host['phase'] != 'Add', 'error': None,
+                'results': [], 'duration': 0}
+
+
+class FakePool(object):
+    """
+    The pool executing the jobs on request.
+    """
+    def __init__(self):
+        self.tasks = []
+
+    def apply_async(self, func, args):
+        self.tasks.append((func, args))
+
+    def run(self):
+        while self.tasks:
+            func, args = self.tasks.pop(0)
+            func(*args)
+
+
+def make_job(hostname, phase="Pre-Upgrade"):
+    return {'hostname': hostname, 'urls': ["telnet://user:pass@{}".format(hostname)], 'phase': phase}
+
+
+class TestWarmConnections(TestCase):
+    def test_take_and_put(self):
+        connections = server.WarmConnections(idle_timeout=10)
+        host = make_job("R1")
+        self.assertIsNone(connections.take(host))
+        ctx = FakeContext()
+        connections.put(host, ctx)
+        self.assertEqual(connections.hostnames(), ["R1"])
+        self.assertIs(connections.take(host), ctx)
+        self.assertIsNone(connections.take(host))
+        self.assertTrue(ctx.is_connected)
+
+    def test_expire(self):
+        connections = server.WarmConnections(idle_timeout=10)
+        first, second = FakeContext(), FakeContext()
+        connections.put(make_job("R1"), first)
+        connections.put(make_job("R2"), second)
+        self.assertEqual(connections.expire(), 0)
+        self.assertEqual(connections.expire(now=server.time() + 11), 2)
+        self.assertFalse(first.is_connected)
+        self.assertFalse(second.is_connected)
+        self.assertEqual(len(connections), 0)
+
+    def test_not_kept(self):
+        connections = server.WarmConnections(idle_timeout=0)
+        ctx = FakeContext()
+        connections.put(make_job("R1"), ctx)
+        self.assertFalse(ctx.is_connected)
+        self.assertTrue(ctx.logging_closed)
+        self.assertEqual(len(connections), 0)
+
+
+class TestServer(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = FakeServer(os.path.join(self.directory, "spool"), os.path.join(self.directory, "logs"),
+                                 workers=2, poll_interval=0.01)
+        self.server.executed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_jobs_in_submission_order(self):
+        first = server.submit_job(self.server.spool_dir, make_job("R1"))
+        second = server.submit_job(self.server.spool_dir, make_job("R2", "Add"))
+        self.assertEqual(self.server.pending(), [first, second])
+        self.assertEqual(self.server.claim(), first)
+        self.assertEqual(self.server.pending(), [second])
+
+        result = self.server.run_job(first)
+        self.assertTrue(result['success'])
+        self.assertEqual(self.server.result(first)['hostname'], "R1")
+        self.assertEqual(self.server.executed[0]['packages'], [])
+
+        self.server.run_job(self.server.claim())
+        self.assertIsNone(self.server.claim())
+        status = self.server.status()
+        self.assertEqual((status['finished'], status['failed'], status['pending']), (2, 1, 0))
+
+    def test_invalid_job(self):
+        job_id = server.submit_job(self.server.spool_dir, {'hostname': "R1", 'urls': ["telnet://R1"]})
+        result = self.server.run_job(self.server.claim())
+        self.assertFalse(result['success'])
+        self.assertIn("phase", result['error'])
+        self.assertEqual(self.server.executed, [])
+        self.assertIsNotNone(self.server.result(job_id))
+
+    def test_slot_released_on_error(self):
+        def failing_execute(host):
+            raise RuntimeError("Unexpected error")
+        self.server._execute = failing_execute
+
+        server.submit_job(self.server.spool_dir, make_job("R1"))
+        pool = FakePool()
+        self.assertEqual(self.server.poll(pool), 1)
+        self.assertRaises(RuntimeError, pool.run)
+        status = self.server.status()
+        self.assertEqual((status['running'], status['finished'], status['failed']), ([], 1, 1))
+
+    def test_requeue(self):
+        job_id = server.submit_job(self.server.spool_dir, make_job("R1"))
+        self.server.claim()
+        self.assertEqual(self.server.requeue(), 1)
+        self.assertEqual(self.server.pending(), [job_id])
+
+    def test_result_path(self):
+        self.assertIsNone(self.server.result("../status"))
+        self.assertIsNone(self.server.result("unknown"))
+
+    def test_serve_forever(self):
+        job_ids = [server.submit_job(self.server.spool_dir, make_job("R{}".format(index))) for index in range(3)]
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        try:
+            for _ in range(500):
+                if self.server.status()['finished'] == 3:
+                    break
+                threading.Event().wait(0.01)
+        finally:
+            self.server.stop()
+            thread.join()
+        self.assertEqual(sorted(host['hostname'] for host in self.server.executed), ["R0", "R1", "R2"])
+        self.assertTrue(all(self.server.result(job_id)['success'] for job_id in job_ids))
+        with open(os.path.join(self.server.spool_dir, server.STATUS_FILENAME)) as f:
+            self.assertEqual(json.load(f)['finished'], 3)
+
+    def test_status_endpoint(self):
+        job_id = server.submit_job(self.server.spool_dir, make_job("R1"))
+        self.server.run_job(self.server.claim())
+        httpd = server.start_status_server(self.server, 0)
+        try:
+            url = "http://127.0.0.1:{}".format(httpd.server_address[1])
+            self.assertEqual(json.load(urllib2.urlopen(url + "/status"))['finished'], 1)
+            self.assertEqual(json.load(urllib2.urlopen(url + "/jobs/" + job_id))['hostname'], "R1")
+            self.assertRaises(urllib2.HTTPError, urllib2.urlopen, url + "/jobs/unknown")
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+class TestServerLogging(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self._plugin_manager = csm_pm.CSMPluginManager
+        csm_pm.CSMPluginManager = FakePluginManager
+        self.logger = logging.getLogger("r1.plugin_manager")
+
+    def tearDown(self):
+        csm_pm.CSMPluginManager = self._plugin_manager
+        shutil.rmtree(self.directory)
+
+    def run_jobs(self, idle_timeout, jobs):
+        worker = server.Server(os.path.join(self.directory, "spool"), os.path.join(self.directory, "logs"),
+                               idle_timeout=idle_timeout)
+        for job in jobs:
+            server.submit_job(worker.spool_dir, job)
+        results = []
+        while True:
+            job_id = worker.claim()
+            if job_id is None:
+                break
+            results.append(worker.run_job(job_id))
+            self.assertEqual(self.logger.handlers, [])
+        worker.connections.close()
+        return results
+
+    def assertLoggedOnce(self, results):
+        # the jobs of the host share the log directory, so every job adds exactly one line
+        with open(os.path.join(results[0]['log_directory'], "plugins.log")) as f:
+            self.assertEqual(len(f.read().splitlines()), len(results))
+
+    def test_discarded_contexts(self):
+        results = self.run_jobs(0, [make_job("R1") for _ in range(3)])
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertLoggedOnce(results)
+
+    def test_warm_contexts(self):
+        job = make_job("R1")
+        other = dict(job, urls=["telnet://user:pass@R1:2001"])
+        results = self.run_jobs(60, [job, other, job, other])
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertLoggedOnce(results)
@@ -0,0 +1,169 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import copy
+import logging
+import threading
+import time
+from unittest import TestCase
+
+from csmpe.context import PluginContext
+from csmpe.session_pool import SessionPool, AdminSession
+
+
+class SessionContext(PluginContext):
+    """
+    The plugin context with the sessions opened without the device.
+    """
+    def __init__(self, size):
+        super(SessionContext, self).__init__()
+        self.size = size
+        self.session_id = 1
+        self.disconnected = False
+        self.logged = []
+        self._logger = logging.getLogger("test_session_pool.plugin_manager")
+        self._logger.setLevel(logging.INFO)
+        self._logger.handle = self.logged.append
+
+    @property
+    def max_sessions(self):
+        return self.size
+
+    def clone(self, session_id):
+        ctx = copy.copy(self)
+        ctx.session_id = session_id
+        ctx._log_records = None
+        return ctx
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+class TestSessionPool(TestCase):
+    def setUp(self):
+        self.ctx = SessionContext(3)
+
+    def test_lease_opens_sessions_on_demand(self):
+        pool = SessionPool(self.ctx, 2)
+        first = pool.acquire()
+        self.assertIs(first, self.ctx)
+        second = pool.acquire()
+        self.assertEqual(second.session_id, 2)
+        self.assertIsNone(pool.acquire(block=False))
+        pool.release(second)
+        with pool.lease() as session:
+            self.assertIs(session, second)
+        self.assertEqual(len(pool), 2)
+
+    def test_lease_specific_session(self):
+        pool = SessionPool(self.ctx, 2)
+        with pool.lease(session=self.ctx):
+            self.assertIsNone(pool.acquire(block=False, session=self.ctx))
+            with pool.lease() as session:
+                self.assertIsNot(session, self.ctx)
+
+    def test_close(self):
+        pool = SessionPool(self.ctx, 2)
+        with pool.lease():
+            with pool.lease() as session:
+                pass
+        pool.close()
+        self.assertTrue(session.disconnected)
+        self.assertFalse(self.ctx.disconnected)
+        self.assertEqual(len(pool), 1)
+
+    def test_map(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def capture(session, cmd):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            session.info("Capturing output of '{}'".format(cmd))
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return cmd.upper(), session.session_id
+
+        commands = ["show {}".format(n) for n in range(6)]
+        self.ctx.current_plugin = "Capture"
+        results = self.ctx.map_sessions(capture, commands)
+        self.assertEqual([result[0] for result in results], [cmd.upper() for cmd in commands])
+        self.assertEqual(running[1], 3)
+        self.assertEqual(len(set(result[1] for result in results)), 3)
+        self.assertEqual([record.getMessage() for record in self.ctx.logged],
+                         ["[Capture] Capturing output of '{}'".format(cmd) for cmd in commands])
+        # the sessions are returned to the pool
+        self.assertEqual(len(self.ctx.sessions._idle), 3)
+
+    def test_map_single_session(self):
+        ctx = SessionContext(1)
+        results = ctx.map_sessions(lambda session, item: session.session_id, range(3))
+        self.assertEqual(results, [1, 1, 1])
+
+
+class Connection(object):
+    def __init__(self, is_console=False):
+        self.is_console = is_console
+        self.commands = []
+
+    def send(self, cmd, timeout=60, wait_for_string=None):
+        self.commands.append(cmd)
+        return "output of {}".format(cmd)
+
+
+class AdminContext(SessionContext):
+    def __init__(self, is_console=False):
+        super(AdminContext, self).__init__(1)
+        self._connection = Connection(is_console)
+        self._admin_session = AdminSession(self)
+
+    def clone(self, session_id):
+        ctx = super(AdminContext, self).clone(session_id)
+        ctx._connection = Connection()
+        return ctx
+
+
+class TestAdminSession(TestCase):
+    def test_admin_commands_use_dedicated_session(self):
+        ctx = AdminContext()
+        self.assertEqual(ctx.send_admin("show install active"), "output of show install active")
+        ctx.send_admin("show platform")
+        self.assertEqual(ctx._connection.commands, [])
+        admin = ctx._admin_session._session
+        self.assertEqual(admin._connection.commands, ["admin", "show install active", "show platform"])
+        ctx.close_sessions()
+        self.assertTrue(admin.disconnected)
+        ctx.send_admin("show platform")
+        self.assertIsNot(ctx._admin_session._session, admin)
+
+    def test_console_toggles_admin_mode(self):
+        ctx = AdminContext(is_console=True)
+        ctx.send_admin("show platform")
+        self.assertEqual(ctx._connection.commands, ["admin", "show platform", "exit"])
+        self.assertIsNone(ctx._admin_session._session)
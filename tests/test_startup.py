@@ -0,0 +1,87 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+# The modules which must not be loaded unless the plugins are dispatched
+DEFERRED_MODULES = ['condoor', 'pexpect', 'pkginfo', 'pkg_resources', 'stevedore']
+
+# The maximum time in seconds of importing the command line interface. The budget is generous,
+# so only the heavy imports added back to the startup path exceed it.
+IMPORT_BUDGET = 1.0
+
+# Builds the plugin manifest in the cache directory as the first 'csmpe list' does
+BUILD_SCRIPT = """
+from csmpe.manifest import get_manifest
+get_manifest()
+"""
+
+SCRIPT = """
+import json
+import sys
+from time import time
+
+start = time()
+import csmpe.__main__
+duration = time() - start
+
+try:
+    csmpe.__main__.cli(["list"])
+except SystemExit:
+    pass
+print(json.dumps({'duration': duration, 'modules': sorted(sys.modules)}))
+"""
+
+
+class TestStartup(TestCase):
+    def setUp(self):
+        # the fresh interpreter, so the modules imported by the other tests do not count
+        self.cache_dir = tempfile.mkdtemp()
+        env = dict(os.environ, CSMPE_CACHE_DIR=self.cache_dir)
+        subprocess.check_call([sys.executable, "-c", BUILD_SCRIPT], env=env)
+        output = subprocess.check_output([sys.executable, "-c", SCRIPT], env=env)
+        self.plugins = output.splitlines()[:-1]
+        self.startup = json.loads(output.splitlines()[-1])
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_plugins_listed(self):
+        self.assertTrue(any("Config Filesystem Check Plugin" in line for line in self.plugins))
+
+    def test_heavy_modules_deferred(self):
+        loaded = [name for name in DEFERRED_MODULES if name in self.startup['modules']]
+        self.assertEqual(loaded, [])
+
+    def test_import_budget(self):
+        self.assertLess(self.startup['duration'], IMPORT_BUDGET)
@@ -0,0 +1,93 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from csmpe import stats
+from csmpe.context import PluginContext
+
+
+class StatsContext(PluginContext):
+    family = "ASR9K"
+    os_version = "6.1.2"
+
+
+class TestStepStats(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stats = stats.StepStats(os.path.join(self.directory, stats.STATS_FILENAME))
+
+    def tearDown(self):
+        self.stats.close()
+        shutil.rmtree(self.directory)
+
+    def record(self, durations, release="6.1.2"):
+        for duration in durations:
+            self.stats.record("copy image", "ASR9K", release, duration)
+
+    def test_percentile(self):
+        values = range(1, 21)
+        self.assertEqual(stats.percentile(values, 0.95), 19)
+        self.assertEqual(stats.percentile(values, 0.5), 10)
+        self.assertEqual(stats.percentile([7], 0.95), 7)
+
+    def test_default_until_enough_samples(self):
+        self.record([100] * (stats.MIN_SAMPLES - 1))
+        self.assertEqual(self.stats.timeout("copy image", "ASR9K", "6.1.2", 1800), 1800)
+        self.assertEqual(self.stats.poll_delay("copy image", "ASR9K", "6.1.2", 60), 60)
+        self.record([100])
+        self.assertEqual(self.stats.timeout("copy image", "ASR9K", "6.1.2", 1800), 200)
+        self.assertEqual(self.stats.poll_delay("copy image", "ASR9K", "6.1.2", 60), 100)
+        self.assertEqual(self.stats.timeout("copy image", "NCS6K", "6.1.2", 1800), 1800)
+
+    def test_release_fallback(self):
+        self.record([100] * stats.MIN_SAMPLES, release="6.1.1")
+        self.record([300, 300])
+        # not enough durations for the release, so all releases of the platform are used
+        self.assertEqual(self.stats.timeout("copy image", "ASR9K", "6.1.2", 1800), 600)
+        self.record([300] * stats.MIN_SAMPLES)
+        self.assertEqual(self.stats.poll_delay("copy image", "ASR9K", "6.1.2", 60), 300)
+        self.assertEqual(self.stats.poll_delay("copy image", "ASR9K", "6.1.1", 60), 100)
+
+    def test_minimum_timeout(self):
+        self.record([1] * stats.MIN_SAMPLES)
+        self.assertEqual(self.stats.timeout("copy image", "ASR9K", "6.1.2", 1800), stats.MIN_TIMEOUT)
+
+    def test_context(self):
+        ctx = StatsContext()
+        ctx._step_stats = self.stats
+        for _ in range(stats.MIN_SAMPLES):
+            with ctx.timed_step("fpd upgrade"):
+                pass
+        with self.assertRaises(ValueError):
+            with ctx.timed_step("fpd upgrade"):
+                raise ValueError()
+        self.assertEqual(len(self.stats.durations("fpd upgrade", "ASR9K", "6.1.2")), stats.MIN_SAMPLES)
+        self.assertEqual(ctx.step_timeout("fpd upgrade", 9600), stats.MIN_TIMEOUT)
@@ -0,0 +1,100 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from csmpe import storage
+from csmpe.context import InstallContext
+
+
+class StorageTests(object):
+    def test_namespaced_per_host(self):
+        self.storage.put("R1", "key", "value1")
+        self.storage.put("R2", "key", "value2")
+        self.assertEqual(self.storage.get("R1", "key"), "value1")
+        self.assertEqual(self.storage.get("R2", "key"), "value2")
+        self.assertEqual(self.storage.get("R3", "key", "default"), "default")
+
+    def test_get_put_many(self):
+        items = {"a": [1, 2.5], "b": {"node": "0/RSP0/CPU0"}, "c": ("tuple", None)}
+        self.storage.put_many("R1", items)
+        self.assertEqual(self.storage.get_many("R1"), items)
+        self.assertEqual(self.storage.get_many("R1", ["a", "missing"]), {"a": [1, 2.5]})
+        self.assertEqual(self.storage.get_many("R1", []), {})
+
+    def test_delete(self):
+        self.storage.put_many("R1", {"a": 1, "b": 2})
+        self.storage.delete("R1", "a")
+        self.assertEqual(self.storage.get_many("R1"), {"b": 2})
+        self.storage.delete("R1")
+        self.assertEqual(self.storage.get_many("R1"), {})
+
+    def test_install_context(self):
+        ctx = InstallContext(self.storage)
+        ctx.hostname = "R1"
+        ctx.save_data("key", ["value", 1.0])
+        self.assertEqual(ctx.load_data("key"), ["value", 1.0])
+        ctx.hostname = "R2"
+        self.assertEqual(ctx.load_data("key"), (None, None))
+
+
+class TestMemoryStorage(StorageTests, TestCase):
+    def setUp(self):
+        self.storage = storage.get_storage()
+
+
+class TestSQLiteStorage(StorageTests, TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "storage.db")
+        self.storage = storage.get_storage(self.path)
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.directory)
+
+    def test_persistent(self):
+        self.storage.put("R1", "key", "value")
+        self.storage.close()
+        self.assertEqual(storage.SQLiteStorage(self.path).get("R1", "key"), "value")
+
+    def test_concurrent_writers(self):
+        def worker(host):
+            for i in range(20):
+                self.storage.put(host, "key{}".format(i), i)
+
+        threads = [threading.Thread(target=worker, args=("R{}".format(n),)) for n in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for n in range(5):
+            self.assertEqual(len(self.storage.get_many("R{}".format(n))), 20)